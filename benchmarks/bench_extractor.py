@@ -0,0 +1,166 @@
+# benchmarks/bench_extractor.py
+"""
+Microbenchmarks for logwise/error_extractor.py on synthetic corpora.
+
+Usage:
+  python benchmarks/bench_extractor.py                       # full run, table on stdout
+  python benchmarks/bench_extractor.py --scale 0.1 -o new.json
+  python benchmarks/bench_extractor.py --compare old.json    # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from corpus import build
+from logwise.error_extractor import (
+    extract_error_from_text, extract_error_with_code, extract_error_from_stream, extract_error_from_file,
+    extract_error_events,
+)
+from logwise.parallel import scan_file_parallel, extract_error_events_parallel
+from logwise.rules import get_engine
+
+# name -> function(text) timed on every corpus
+BENCHMARKS = {
+    "extract_error_from_text": lambda text: extract_error_from_text(text),
+    "extract_error_with_code": lambda text: extract_error_with_code(1, "", text),
+    "extract_error_from_stream": lambda text: extract_error_from_stream(chunked(text)),
+    "extract_error_events": lambda text: extract_error_events(chunked(text)),
+    # classify every line of the corpus with the compiled rule sets
+    "rule_engine_scan": lambda text: get_engine().scan(text.splitlines()),
+}
+
+
+# name -> function(path) timed on every corpus written to a temporary file
+FILE_BENCHMARKS = {
+    "extract_error_from_file": extract_error_from_file,
+    # whole-file scans over 1 MB line ranges in a process pool (one worker per core)
+    "scan_file_parallel": lambda path: scan_file_parallel(path, chunk_size=1024 ** 2),
+    "extract_error_events_parallel": lambda path: extract_error_events_parallel(path, chunk_size=1024 ** 2),
+}
+
+
+def chunked(text: str, size: int = 64 * 1024):
+    """Feed text like a pipe would: fixed-size chunks, not a whole string."""
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def time_once(func, text) -> float:
+    start = time.perf_counter()
+    func(text)
+    return time.perf_counter() - start
+
+
+def peak_memory(func, text) -> int:
+    """Peak bytes allocated while func runs (tracemalloc, measured in a separate run)."""
+    tracemalloc.start()
+    try:
+        func(text)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(scale: float, repeat: int, only: list[str] = None) -> dict:
+    corpora = build(scale)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for corpus_name, text in corpora.items():
+            size = len(text.encode("utf-8"))
+            path = os.path.join(tmp, corpus_name + ".log")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            results[corpus_name] = {}
+            cases = [(name, func, text) for name, func in BENCHMARKS.items()]
+            cases += [(name, func, path) for name, func in FILE_BENCHMARKS.items()]
+            for bench_name, func, arg in cases:
+                if only and bench_name not in only:
+                    continue
+                func(arg)  # warm-up (regex compile cache, page cache)
+                times = [time_once(func, arg) for _ in range(repeat)]
+                median = statistics.median(times)
+                results[corpus_name][bench_name] = {
+                    "bytes": size,
+                    "median_s": median,
+                    "min_s": min(times),
+                    "mb_per_s": size / 1024 ** 2 / median if median > 0 else None,
+                    "peak_mb": peak_memory(func, arg) / 1024 ** 2,
+                }
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scale": scale,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(report: dict, baseline: dict = None, threshold: float = 0.10) -> int:
+    """Print a table; with a baseline, mark regressions and return how many there are."""
+    print(f"commit {report['commit']}  python {report['python']}  scale {report['scale']}")
+    if baseline:
+        print(f"baseline {baseline['commit']}  (regression threshold {threshold:.0%})")
+    print(f"{'corpus':<16} {'benchmark':<30} {'MB':>7} {'MB/s':>9} {'peak MB':>8}  vs baseline")
+    regressions = 0
+    for corpus_name, benches in report["results"].items():
+        for bench_name, r in benches.items():
+            note = ""
+            base = (baseline or {}).get("results", {}).get(corpus_name, {}).get(bench_name)
+            if base and base.get("mb_per_s") and r["mb_per_s"]:
+                speed = r["mb_per_s"] / base["mb_per_s"]
+                mem = r["peak_mb"] / base["peak_mb"] if base["peak_mb"] else 1.0
+                note = f"x{speed:.2f} speed, x{mem:.2f} memory"
+                if speed < 1 - threshold or mem > 1 + threshold:
+                    note += "  <-- REGRESSION"
+                    regressions += 1
+            print(f"{corpus_name:<16} {bench_name:<30} {r['bytes'] / 1024 ** 2:>7.2f} "
+                  f"{r['mb_per_s'] or 0:>9.1f} {r['peak_mb']:>8.2f}  {note}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark logwise error extractors.")
+    parser.add_argument("--scale", type=float, default=1.0, help="corpus size multiplier (default: 1.0)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (default: 5)")
+    parser.add_argument("--only", nargs="*", help="benchmark names to run")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report from another commit")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown / memory growth counted as regression (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    report = run(args.scale, args.repeat, args.only)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = print_report(report, baseline, args.threshold)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# benchmarks/bench_transport.py
+"""
+core <-> runner transport benchmark: TCP loopback vs Unix domain socket, and
+JSON vs gzip / zstd compressed JSON vs msgpack bodies.
+
+It starts a runner in this process (TCP on a free port + a Unix socket), runs a
+small, a medium and a large-output command once as jobs, then times fetching
+their results (GET /jobs/<id>/result: transport + serialization only, the
+command is not run again) and a full `echo ok` /run round trip per variant.
+
+Usage:
+  python benchmarks/bench_transport.py
+  python benchmarks/bench_transport.py --repeat 50 --large-mb 16 -o transport.json
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from logwise import transport
+from logwise.core import LogwiseClient
+
+# name -> request headers; zstd / msgpack only where the libraries are installed
+VARIANTS = {
+    "json": {"Accept-Encoding": "identity", "Accept": "application/json"},
+    "gzip": {"Accept-Encoding": "gzip", "Accept": "application/json"},
+    "zstd": {"Accept-Encoding": "zstd", "Accept": "application/json"},
+    "msgpack": {"Accept-Encoding": "identity", "Accept": transport.MSGPACK},
+    "negotiated": transport.request_headers(),   # what core sends by default
+}
+
+# log-like output: timestamps, step counters and random losses (compresses like a real training log)
+LOG_COMMAND = ("python3 -c \"import random; r = random.Random(0); "
+               "[print(f'2024-05-01 12:{i // 60 % 60:02d}:{i % 60:02d} INFO train step {i} "
+               "loss {r.random():.6f} lr 0.0003 grad_norm {r.random() * 10:.4f}') for i in range({n})]\"")
+LINE_BYTES = 85
+
+
+def available(name: str) -> bool:
+    if name == "zstd":
+        return "zstd" in transport.COMPRESSORS and "zstd" in transport.request_headers()["Accept-Encoding"]
+    if name == "msgpack":
+        return transport.msgpack is not None
+    return True
+
+
+def start_runner(socket_path: str) -> str:
+    """Import runner.py, serve it on TCP (free port) and on socket_path; returns the TCP /run URL."""
+    from werkzeug.serving import make_server
+    from logwise import runner
+
+    runner.initialize_shell()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, runner.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    runner.serve_unix_socket(socket_path)
+    transport.RUNNER_ENCODINGS[:] = ["zstd", "gzip"]   # let every variant ask for what it measures
+    return f"http://127.0.0.1:{server.server_port}/run"
+
+
+def run_job(client: LogwiseClient, cmd: str) -> str:
+    job_id = client.submit_job(cmd)
+    while client.job_status(job_id)["status"] != "done":
+        time.sleep(0.05)
+    return job_id
+
+
+def time_request(client: LogwiseClient, method: str, path: str, headers: dict, repeat: int, body=None) -> dict:
+    """Latency (request + decode) and body bytes on the wire of one endpoint."""
+    times, wire = [], 0
+    url = client._runner_endpoint(path)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.session.request(method, url, json=body, headers=headers, timeout=60)
+        transport.decode(response)
+        times.append(time.perf_counter() - start)
+        wire = int(response.headers.get("Content-Length", len(response.content)))
+    return {"p50_ms": statistics.median(times) * 1000, "mean_ms": statistics.fmean(times) * 1000,
+            "wire_bytes": wire, "encoding": response.headers.get("Content-Encoding", "identity"),
+            "content_type": response.headers.get("Content-Type")}
+
+
+def run(repeat: int, large_mb: float, socket_path: str) -> dict:
+    tcp_url = start_runner(socket_path)
+    clients = {
+        "tcp": LogwiseClient(runner_url=tcp_url, use_cache=False),
+        "unix": LogwiseClient(runner_url=f"unix://{socket_path}", use_cache=False),
+    }
+    payloads = {
+        "small": "echo ok",
+        "medium": LOG_COMMAND.replace("{n}", str(64 * 1024 // LINE_BYTES)),
+        "large": LOG_COMMAND.replace("{n}", str(int(large_mb * 1024 ** 2) // LINE_BYTES)),
+    }
+    jobs = {name: run_job(clients["tcp"], cmd) for name, cmd in payloads.items()}
+    variants = [v for v in VARIANTS if available(v)]
+
+    results = []
+    for name, job_id in jobs.items():
+        for conn, client in clients.items():
+            for variant in variants:
+                stats = time_request(client, "GET", f"/jobs/{job_id}/result", VARIANTS[variant], repeat)
+                results.append({"case": f"result:{name}", "transport": conn, "variant": variant, **stats})
+    for conn, client in clients.items():
+        for variant in variants:
+            stats = time_request(client, "POST", "/run", VARIANTS[variant], repeat,
+                                 body={"command": "echo ok", "session": "bench"})
+            results.append({"case": "run:echo", "transport": conn, "variant": variant, **stats})
+    return {"repeat": repeat, "large_mb": large_mb, "variants": variants, "results": results}
+
+
+def print_report(report: dict):
+    print(f"{'case':<14} {'transport':<9} {'variant':<11} {'p50 ms':>9} {'mean ms':>9} {'wire bytes':>12}  encoding")
+    for r in report["results"]:
+        print(f"{r['case']:<14} {r['transport']:<9} {r['variant']:<11} {r['p50_ms']:>9.2f} {r['mean_ms']:>9.2f} "
+              f"{r['wire_bytes']:>12}  {r['encoding']} / {r['content_type']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the core <-> runner transport and wire format.")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per case (default: 20)")
+    parser.add_argument("--large-mb", type=float, default=4, help="output size of the large case (default: 4)")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    # keep the whole large output in the result instead of head + tail
+    os.environ.setdefault("LOGWISE_CAPTURE_TAIL_KB", str(int(args.large_mb * 1024) + 1024))
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run(args.repeat, args.large_mb, os.path.join(tmp, "runner.sock"))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
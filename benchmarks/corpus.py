@@ -0,0 +1,106 @@
+# benchmarks/corpus.py
+"""
+Deterministic synthetic log corpora for the extractor benchmarks.
+Every generator takes a target size in bytes and a seed, so the same
+corpus is produced on every machine / commit.
+"""
+import random
+
+ANSI_COLORS = ["\x1b[31m", "\x1b[32m", "\x1b[33m", "\x1b[1;34m", "\x1b[0m", "\x1b[2K", "\x1b[?2004l"]
+
+
+def _fill(rng, size, make_line):
+    lines, total = [], 0
+    while total < size:
+        line = make_line(rng, len(lines))
+        lines.append(line)
+        total += len(line) + 1
+    return lines
+
+
+def _train_line(rng, i):
+    return (f"2024-05-01 12:{i // 3600 % 60:02d}:{i // 60 % 60:02d} INFO epoch {i // 1000} "
+            f"step {i} loss={rng.random() * 3:.4f} lr={rng.random() / 1000:.6f} "
+            f"grad_norm={rng.random() * 10:.3f} throughput={rng.randint(800, 1200)} samples/s")
+
+
+def _traceback(rng, depth):
+    frames = []
+    for d in range(depth):
+        frames.append(f'  File "/opt/project/src/module_{d % 17}.py", line {rng.randint(1, 900)}, in fn_{d % 23}')
+        frames.append(f"    result = fn_{(d + 1) % 23}(batch, state)")
+    return ["Traceback (most recent call last):"] + frames + [
+        "RuntimeError: CUDA out of memory. Tried to allocate 2.00 GiB (GPU 0; 23.65 GiB total capacity)"
+    ]
+
+
+def training_log(size=8 * 1024 ** 2, seed=1):
+    """Long training log ending in a CUDA OOM traceback."""
+    rng = random.Random(seed)
+    lines = _fill(rng, size, _train_line)
+    return "\n".join(lines + _traceback(rng, 12)) + "\n"
+
+
+def deep_traceback(size=2 * 1024 ** 2, seed=2):
+    """Log with a RecursionError-style traceback of thousands of frames."""
+    rng = random.Random(seed)
+    head = _fill(rng, size // 10, _train_line)
+    tb = ["Traceback (most recent call last):"]
+    while sum(len(l) + 1 for l in tb) < size - size // 10:
+        tb.append('  File "/opt/project/src/tree.py", line 42, in visit')
+        tb.append("    return self.visit(node.child)")
+    tb.append("RecursionError: maximum recursion depth exceeded")
+    return "\n".join(head + tb) + "\n"
+
+
+def cjk_log(size=2 * 1024 ** 2, seed=3):
+    """Chinese log messages with a Chinese error line at the end."""
+    rng = random.Random(seed)
+    words = ["訓練", "資料", "模型", "載入", "完成", "批次", "進度", "檢查點", "儲存", "驗證"]
+
+    def line(rng, i):
+        return f"[{i:08d}] " + "".join(rng.choice(words) for _ in range(12)) + f" {rng.randint(0, 100)}%"
+
+    lines = _fill(rng, size // 3, line)   # ~3 bytes per CJK char in UTF-8
+    return "\n".join(lines + ["錯誤：無法存取 '/data/train.bin'：沒有此一檔案或目錄"]) + "\n"
+
+
+def ansi_log(size=2 * 1024 ** 2, seed=4):
+    """Colorized / progress-bar output full of ANSI escape sequences."""
+    rng = random.Random(seed)
+
+    def line(rng, i):
+        color = rng.choice(ANSI_COLORS)
+        bar = "█" * rng.randint(0, 30)
+        return f"{color}[{i:06d}]\x1b[0m {bar}\x1b[K {rng.randint(0, 100)}% \x1b[1A\x1b[2K"
+
+    lines = _fill(rng, size, line)
+    return "\n".join(lines + ["\x1b[31mSegmentation fault (core dumped)\x1b[0m"]) + "\n"
+
+
+def clean_log(size=8 * 1024 ** 2, seed=5):
+    """Large log without any error: worst case, every line is scanned."""
+    rng = random.Random(seed)
+
+    def line(rng, i):
+        return f"2024-05-01 12:00:{i % 60:02d} INFO processed item {i} in {rng.random():.3f}s status=ok"
+
+    return "\n".join(_fill(rng, size, line)) + "\n"
+
+
+CORPORA = {
+    "training_log": training_log,
+    "deep_traceback": deep_traceback,
+    "cjk_log": cjk_log,
+    "ansi_log": ansi_log,
+    "clean_log": clean_log,
+}
+
+
+def build(scale: float = 1.0) -> dict:
+    """All corpora, with sizes multiplied by scale (e.g. 0.1 for a quick run)."""
+    out = {}
+    for name, gen in CORPORA.items():
+        default_size = gen.__defaults__[0]
+        out[name] = gen(size=max(int(default_size * scale), 1024))
+    return out
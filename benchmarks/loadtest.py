@@ -0,0 +1,235 @@
+# benchmarks/loadtest.py
+"""
+End-to-end load / soak test of runner + core + LLM, without a GPU.
+
+By default it starts the mock Ollama server and a real runner.py (local bash
+shell) on free ports in this process, then simulates --users concurrent users,
+each looping: core.run_command(cmd) -> core.analyze_with_code(...).
+
+Usage:
+  python benchmarks/loadtest.py --users 10 --duration 30
+  python benchmarks/loadtest.py --users 50 --duration 600 --soak   # memory growth
+  python benchmarks/loadtest.py --users 10 --sessions               # one runner shell per user
+  python benchmarks/loadtest.py --runner-url http://127.0.0.1:9090/run --ollama-url http://127.0.0.1:11434/api/generate
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import mock_ollama
+from logwise import metrics
+from logwise.core import LogwiseClient
+
+# (weight, command): success, failing shell command, Python traceback, slow command
+DEFAULT_MIX = [
+    (4, "echo ok"),
+    (3, "ls /no_such_dir_{n}"),
+    (2, "python3 -c 'import no_such_module_{n}'"),
+    (1, "sleep 0.5; echo done"),
+]
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    if len(values) == 1:
+        v = values[0]
+        return {"p50": v, "p95": v, "p99": v, "max": v}
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": q[49], "p95": q[94], "p99": q[98], "max": max(values)}
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process (Linux /proc, falls back to ru_maxrss)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def start_local_runner(max_sessions: int = None) -> str:
+    """Import runner.py, start its shell and serve the Flask app on a free port."""
+    from werkzeug.serving import make_server
+    from logwise import runner
+
+    if max_sessions:
+        runner.sessions.max_sessions = max(max_sessions, runner.sessions.max_sessions)
+    runner.initialize_shell()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log per request
+    server = make_server("127.0.0.1", 0, runner.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/run"
+
+
+def scrape_lock_wait(client: LogwiseClient) -> dict:
+    """Average shell_lock wait from the runner's /metrics (needs LOGWISE_METRICS=1 on the runner)."""
+    try:
+        text = client.session.get(client._runner_endpoint("/metrics"), timeout=5).text
+    except Exception:
+        return {}
+    values = {}
+    for line in text.splitlines():
+        for key in ("_sum", "_count"):
+            if line.startswith("logwise_runner_lock_wait_seconds" + key + " "):
+                values[key[1:]] = float(line.split()[-1])
+    if not values.get("count"):
+        return {}
+    return {"count": int(values["count"]), "avg_s": values["sum"] / values["count"]}
+
+
+class LoadTest:
+    def __init__(self, client: LogwiseClient, users: int, duration: float, mix, seed: int = 0,
+                 think_time: float = 0.0, sessions: bool = False):
+        self.client = client
+        self.users = users
+        self.duration = duration
+        self.mix = mix
+        self.seed = seed
+        self.think_time = think_time
+        self.sessions = sessions    # one runner shell session per user (else all share the default one)
+        self.samples = []           # one dict per completed iteration
+        self.errors = 0
+        self.memory = []            # (elapsed_s, rss_mb)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def user(self, uid: int):
+        rng = random.Random(self.seed + uid)
+        weights = [w for w, _ in self.mix]
+        commands = [c for _, c in self.mix]
+        session_id = f"loadtest-{uid}" if self.sessions else None
+        while not self._stop.is_set():
+            cmd = rng.choices(commands, weights)[0].format(n=rng.randint(0, 9))
+            sample = {"command": cmd}
+            try:
+                start = time.perf_counter()
+                exit_code, out, err, _ = self.client.run_command(cmd, session_id)
+                sample["run_s"] = time.perf_counter() - start
+
+                chunks = []
+                start_llm = time.perf_counter()
+                self.client.analyze_with_code(exit_code, out, err, callback=chunks.append)
+                sample["analyze_s"] = time.perf_counter() - start_llm
+                sample["total_s"] = sample["run_s"] + sample["analyze_s"]
+                sample["ok"] = bool(chunks) and exit_code != -1
+            except Exception as e:
+                sample["ok"] = False
+                sample["error"] = str(e)
+            with self._lock:
+                self.samples.append(sample)
+                if not sample["ok"]:
+                    self.errors += 1
+            if self.think_time:
+                time.sleep(self.think_time)
+
+    def sample_memory(self, start: float, interval: float):
+        while not self._stop.wait(interval):
+            self.memory.append((time.perf_counter() - start, rss_mb()))
+
+    def run(self, memory_interval: float = 5.0) -> dict:
+        start = time.perf_counter()
+        self.memory.append((0.0, rss_mb()))
+        threads = [threading.Thread(target=self.user, args=(i,), daemon=True) for i in range(self.users)]
+        threads.append(threading.Thread(target=self.sample_memory, args=(start, memory_interval), daemon=True))
+        for t in threads:
+            t.start()
+        time.sleep(self.duration)
+        self._stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        self.memory.append((elapsed, rss_mb()))
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        ok = [s for s in self.samples if s["ok"]]
+        return {
+            "users": self.users,
+            "elapsed_s": elapsed,
+            "iterations": len(self.samples),
+            "errors": self.errors,
+            "throughput_per_s": len(ok) / elapsed if elapsed else 0,
+            "run_command_s": percentiles([s["run_s"] for s in ok]),
+            "analyze_s": percentiles([s["analyze_s"] for s in ok]),
+            "total_s": percentiles([s["total_s"] for s in ok]),
+            "llm": self.client.stream_stats()["warm"],
+            "memory_mb": {
+                "start": self.memory[0][1],
+                "end": self.memory[-1][1],
+                "growth": self.memory[-1][1] - self.memory[0][1],
+                "samples": self.memory,
+            },
+        }
+
+
+def print_report(report: dict):
+    print(f"users {report['users']}  iterations {report['iterations']}  errors {report['errors']}  "
+          f"throughput {report['throughput_per_s']:.2f}/s  ({report['elapsed_s']:.1f}s)")
+    for key in ("run_command_s", "analyze_s", "total_s"):
+        p = report[key]
+        if p["p50"] is None:
+            print(f"  {key:<14} (no successful samples)")
+            continue
+        print(f"  {key:<14} p50 {p['p50']:.3f}  p95 {p['p95']:.3f}  p99 {p['p99']:.3f}  max {p['max']:.3f}")
+    if report.get("lock_wait"):
+        lw = report["lock_wait"]
+        print(f"  shell_lock wait avg {lw['avg_s']:.3f}s over {lw['count']} commands")
+    m = report["memory_mb"]
+    print(f"  RSS {m['start']:.1f} MB -> {m['end']:.1f} MB (growth {m['growth']:+.1f} MB)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load / soak test for runner + core + LLM.")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause between iterations per user")
+    parser.add_argument("--soak", action="store_true", help="long run: sample memory every 30s instead of 5s")
+    parser.add_argument("--runner-url", help="use an existing runner instead of starting one")
+    parser.add_argument("--ollama-url", help="use an existing Ollama (or mock) instead of starting the mock")
+    parser.add_argument("--cache", action="store_true", help="keep the analysis cache on (off by default)")
+    parser.add_argument("--mix", help="JSON list of [weight, command] pairs ({n} = random digit)")
+    parser.add_argument("--sessions", action="store_true",
+                        help="one runner shell session per user instead of one shared shell")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    mock_ollama.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    metrics.enable()  # lock-wait histogram of the in-process runner
+    ollama_url = args.ollama_url
+    if not ollama_url:
+        server = mock_ollama.start(mock_ollama.config_from_args(args))
+        ollama_url = f"http://127.0.0.1:{server.server_port}/api/generate"
+    runner_url = args.runner_url or start_local_runner(max_sessions=args.users if args.sessions else None)
+
+    client = LogwiseClient(runner_url=runner_url, ollama_url=ollama_url, use_cache=args.cache,
+                           pool_maxsize=max(args.users, 1))
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+
+    print(f"[LoadTest] runner {runner_url}  ollama {ollama_url}  users {args.users}  {args.duration}s")
+    test = LoadTest(client, args.users, args.duration, mix, seed=args.seed, think_time=args.think_time,
+                    sessions=args.sessions)
+    report = test.run(memory_interval=30.0 if args.soak else 5.0)
+    report["lock_wait"] = scrape_lock_wait(client)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# benchmarks/mock_ollama.py
+"""
+Stand-in for Ollama's /api/generate, for load tests without a GPU or a model.
+
+Usage:
+  python benchmarks/mock_ollama.py --port 11435 --ttft 0.3 --tokens-per-s 40 --parallel 1
+  export OLLAMA_URL=http://127.0.0.1:11435/api/generate
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOllamaConfig:
+    def __init__(self, ttft: float = 0.3, tokens_per_s: float = 40.0, tokens: int = 64,
+                 parallel: int = 1, error_rate: float = 0.0, drop_rate: float = 0.0,
+                 load_time: float = 0.0, seed: int = None):
+        self.ttft = ttft                    # prompt-eval delay before the first token
+        self.tokens_per_s = tokens_per_s
+        self.tokens = tokens                # tokens per answer (capped by options.num_predict)
+        self.error_rate = error_rate        # fraction of requests answered with HTTP 500
+        self.drop_rate = drop_rate          # fraction of streams cut off mid-answer
+        self.load_time = load_time          # extra delay for the first request (cold model)
+        self.slots = threading.Semaphore(max(1, parallel))   # like OLLAMA_NUM_PARALLEL
+        self.rng = random.Random(seed)
+        self.loaded = load_time <= 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(config: MockOllamaConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            with config.lock:
+                config.requests += 1
+                fail = config.rng.random() < config.error_rate
+                drop = config.rng.random() < config.drop_rate
+
+            if self.path != "/api/generate":
+                return self._send_json(404, {"error": "not found"})
+            if fail:
+                return self._send_json(500, {"error": "injected failure"})
+
+            with config.slots:
+                load = 0.0
+                if not config.loaded:
+                    load = config.load_time
+                    time.sleep(load)
+                    config.loaded = True
+
+                if body.get("stream") is False or not body.get("prompt"):
+                    # warm-up / non-streaming call
+                    return self._send_json(200, {"model": body.get("model"), "response": "",
+                                                 "done": True, "load_duration": int(load * 1e9)})
+
+                n = min(config.tokens, body.get("options", {}).get("num_predict", config.tokens))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    time.sleep(config.ttft)
+                    start = time.perf_counter()
+                    for i in range(n):
+                        if drop and i == n // 2:
+                            self.close_connection = True
+                            return
+                        self._chunk({"model": body.get("model"), "response": f"tok{i} ", "done": False})
+                        time.sleep(1.0 / config.tokens_per_s)
+                    self._chunk({"model": body.get("model"), "response": "", "done": True,
+                                 "load_duration": int(load * 1e9), "eval_count": n,
+                                 "eval_duration": int((time.perf_counter() - start) * 1e9)})
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client cancelled: stop "generating"
+
+        def _chunk(self, obj):
+            data = (json.dumps(obj) + "\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def _send_json(self, status, obj):
+            data = json.dumps(obj).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def start(config: MockOllamaConfig, port: int = 0, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Start the mock server on a daemon thread; server.server_port is the bound port."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--tokens-per-s", type=float, default=40.0, help="token generation rate")
+    parser.add_argument("--tokens", type=int, default=64, help="tokens per answer")
+    parser.add_argument("--parallel", type=int, default=1, help="concurrent generations (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of HTTP 500 answers")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of streams cut mid-answer")
+    parser.add_argument("--load-time", type=float, default=0.0, help="cold model load delay")
+
+
+def config_from_args(args) -> MockOllamaConfig:
+    return MockOllamaConfig(ttft=args.ttft, tokens_per_s=args.tokens_per_s, tokens=args.tokens,
+                            parallel=args.parallel, error_rate=args.error_rate,
+                            drop_rate=args.drop_rate, load_time=args.load_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Ollama /api/generate server.")
+    parser.add_argument("--port", type=int, default=11435)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = start(config_from_args(args), port=args.port)
+    print(f"[MockOllama] http://127.0.0.1:{server.server_port}/api/generate (Ctrl-C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
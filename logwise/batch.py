@@ -0,0 +1,153 @@
+# logwise/batch.py
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .core import get_client
+from .error_extractor import extract_error_from_file, match_rule
+from .scheduler import AnalysisScheduler
+
+# Snippets that do not need the LLM -> batch status
+SKIP_STATUS = {
+    "[No error detected]": "no_error",
+    "[No output received]": "empty",
+    "[Info message detected]": "info",
+}
+
+
+def collect_files(targets: list[str]) -> list[str]:
+    """Expand directories (recursively) and glob patterns into a sorted list of files."""
+    files = set()
+    for target in targets:
+        if os.path.isdir(target):
+            for root, _, names in os.walk(target):
+                for name in names:
+                    files.add(os.path.join(root, name))
+        else:
+            for path in glob.glob(target, recursive=True):
+                if os.path.isfile(path):
+                    files.add(path)
+    return sorted(files)
+
+
+def extract_file(path: str) -> dict:
+    """Extract one log file's error snippet (runs in a worker process; memory-mapped, see file mode)."""
+    start = time.perf_counter()
+    try:
+        snippet = extract_error_from_file(path)
+        error = None
+    except OSError as e:
+        snippet, error = None, str(e)
+    rule = match_rule(snippet) if snippet else None
+    return {
+        "file": path,
+        "snippet": snippet,
+        "rule": rule.name if rule else None,
+        "severity": rule.severity if rule else 0,
+        "error": error,
+        "extract_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def snippet_priority(record: dict) -> int:
+    """Tracebacks first, then other error lines by rule severity (see rules.py)."""
+    if record["snippet"].startswith("Traceback"):
+        return 0
+    return 6 - record.get("severity", 0)
+
+
+def run_batch(files: list[str], out, concurrency: int = 2, workers: int = None,
+              max_pending: int = 64, client=None, bypass_cache: bool = False) -> dict:
+    """
+    Extract errors from every file in a process pool, then analyze the snippets
+    through the bounded scheduler. One JSON line per file is written to out.
+    bypass_cache asks the LLM again instead of reusing cached answers (--no-cache).
+    """
+    client = client or get_client()
+    counts = {}
+    lock = threading.Lock()
+
+    def write(record):
+        with lock:
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+    def analyze(record):
+        start = time.perf_counter()
+        answer = "".join(client.iter_answer(record["snippet"], bypass_cache=bypass_cache))
+        record["llm_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return answer
+
+    def on_result(record, answer, error, queue_s):
+        record["queue_ms"] = round(queue_s * 1000, 2)
+        if error is not None:
+            record["status"] = "llm_error"
+            record["error"] = str(error)
+        else:
+            record["status"] = "analyzed"
+            record["analysis"] = answer
+        write(record)
+
+    scheduler = AnalysisScheduler(analyze, on_result, concurrency=concurrency, max_pending=max_pending)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(extract_file, path) for path in files]
+            for future in as_completed(futures):
+                record = future.result()
+                if record["error"] is not None:
+                    record["status"] = "read_error"
+                    write(record)
+                    continue
+
+                status = next((s for prefix, s in SKIP_STATUS.items()
+                               if record["snippet"].startswith(prefix)), None)
+                if status:
+                    record["status"] = status
+                    write(record)
+                    continue
+
+                # blocks while the scheduler queue is full (backpressure)
+                scheduler.submit(record, priority=snippet_priority(record))
+    finally:
+        scheduler.close()
+    return counts
+
+
+def main(argv: list[str], bypass_cache: bool = False):
+    parser = argparse.ArgumentParser(
+        prog="python -m logwise batch",
+        description="Analyze every log file in a directory or glob, writing JSON Lines results.",
+    )
+    parser.add_argument("targets", nargs="+", help="log directories or glob patterns")
+    parser.add_argument("-c", "--concurrency", type=int, default=2,
+                        help="max analyses sent to Ollama at the same time (default: 2)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="extraction processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="snippets queued for the LLM before extraction waits (default: 64)")
+    parser.add_argument("-o", "--output", default="-", help="JSON Lines output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.targets)
+    if not files:
+        print(f"[Logwise] No files matched: {' '.join(args.targets)}", file=sys.stderr)
+        return 1
+
+    print(f"[Batch] {len(files)} files, concurrency {args.concurrency}", file=sys.stderr)
+    start = time.perf_counter()
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        counts = run_batch(files, out, concurrency=args.concurrency, workers=args.workers,
+                           max_pending=args.max_pending, bypass_cache=bypass_cache)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    summary = ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+    print(f"[Batch] Done in {time.perf_counter() - start:.1f}s ({summary})", file=sys.stderr)
+    return 0
@@ -0,0 +1,192 @@
+# logwise/cache.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+DISK_EVICT_EVERY = 64   # puts between two sweeps of the disk tier (sooner once it looks over max_bytes)
+
+# Volatile parts of an error snippet that must not change its fingerprint.
+_NORMALIZERS = [
+    # runner resource accounting: '[Resources] wall 12.3s | peak RSS 1.2 GB' (numbers vary per run)
+    (re.compile(r"^\[Resources\].*$", re.MULTILINE), lambda m: re.sub(r"\d+(?:\.\d+)?", "<n>", m.group(0))),
+    # timestamps: 2024-05-01 12:00:00,123 / 2024-05-01T12:00:00.123Z / 12:00:00
+    (re.compile(r"\d{4}[-/]\d{2}[-/]\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<ts>"),
+    (re.compile(r"\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b"), "<ts>"),
+    # hex addresses: 0x7f3a2c...
+    (re.compile(r"0x[0-9a-fA-F]+"), "<hex>"),
+    # PIDs: pid=1234 / pid 1234 / Process 1234 / bash[1234]
+    (re.compile(r"\b(pid|process)([\s=:]+)\d+", re.IGNORECASE), r"\1\2<pid>"),
+    (re.compile(r"\[\d+\]"), "[<pid>]"),
+    # paths: keep only the file name (/home/a/proj/train.py -> <path>/train.py)
+    (re.compile(r"(?:[A-Za-z]:)?(?:[\\/][^\s\\/\"':,()]+)+[\\/]"), "<path>/"),
+    # line numbers: 'line 42' / 'train.py:42:'
+    (re.compile(r"\bline \d+", re.IGNORECASE), "line <n>"),
+    (re.compile(r"(\.\w+):\d+(?::\d+)?"), r"\1:<n>"),
+    (re.compile(r"[ \t]+"), " "),
+]
+
+
+def normalize_snippet(snippet: str) -> str:
+    """Strip paths, line numbers, hex addresses, timestamps and PIDs from an error snippet."""
+    text = snippet.strip()
+    for pattern, repl in _NORMALIZERS:
+        text = pattern.sub(repl, text)
+    return "\n".join(l.strip() for l in text.splitlines() if l.strip())
+
+
+def fingerprint(snippet: str, salt: str = "") -> str:
+    """Stable cache key for a snippet (salt = model / prompt variant)."""
+    return hashlib.sha256((salt + "\x00" + normalize_snippet(snippet)).encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Two-tier cache of LLM answers keyed by snippet fingerprint.
+    - memory: LRU with max_entries
+    - disk (optional): one JSON file per key in cache_dir, evicted by ttl and max_bytes.
+      A file's mtime is its creation time (ttl), its atime its last use (max_bytes, LRU)
+    """
+
+    def __init__(self, max_entries: int = 256, cache_dir: str = None,
+                 ttl: float = 7 * 24 * 3600, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._disk_puts = 0
+        self._disk_bytes = 0    # estimate: size after the last sweep + what was put since
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        answer = self._disk_get(key)
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._memory_put(key, answer)
+        return answer
+
+    def put(self, key: str, answer: str):
+        with self._lock:
+            self._memory_put(key, answer)
+        self._disk_put(key, answer)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    _remove(os.path.join(self.cache_dir, name))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "entries": len(self._memory),
+            }
+
+    def _memory_put(self, key, answer):
+        self._memory[key] = answer
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # Disk tier
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _disk_get(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                created = os.fstat(f.fileno()).st_mtime
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        now = time.time()
+        if now - created > self.ttl:
+            _remove(path)
+            return None
+        try:
+            os.utime(path, (now, created))  # atime = last use, mtime stays the creation time
+        except OSError:
+            pass
+        return entry.get("answer")
+
+    def _disk_put(self, key, answer):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"answer": answer}, f, ensure_ascii=False)
+                size = f.tell()
+            os.replace(tmp, path)
+        except OSError:
+            _remove(tmp)
+            return
+        with self._lock:
+            # a sweep lists and stats the whole directory: on the first put, then
+            # every DISK_EVICT_EVERY puts (expired entries, other processes' puts)
+            self._disk_puts += 1
+            self._disk_bytes += size
+            sweep = self._disk_puts % DISK_EVICT_EVERY == 1 or self._disk_bytes > self.max_bytes
+        if sweep:
+            self._disk_evict()
+
+    def _disk_evict(self):
+        entries = []
+        total = 0
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if now - st.st_mtime > self.ttl:
+                _remove(path)
+                continue
+            entries.append((st.st_atime, st.st_size, path))
+            total += st.st_size
+        # least recently used first
+        entries.sort()
+        while total > self.max_bytes and entries:
+            _, size, path = entries.pop(0)
+            _remove(path)
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
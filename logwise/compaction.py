@@ -0,0 +1,172 @@
+# logwise/compaction.py
+import re
+
+# '  File "/app/train.py", line 42, in forward'
+FRAME_RE = re.compile(r'^\s*File "[^"]*", line \d+')
+# separators printed between chained exceptions
+CHAIN_RE = re.compile(
+    r"^(During handling of the above exception, another exception occurred:"
+    r"|The above exception was the direct cause of the following exception:)\s*$"
+)
+
+MAX_CYCLE = 8        # longest repeating frame cycle to detect (mutual recursion)
+MIN_REPEATS = 3      # collapse a frame (or cycle) only if it repeats at least this often
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: ~4 ASCII chars per token, 1 token per CJK / non-ASCII char."""
+    non_ascii = sum(1 for c in text if ord(c) > 127)
+    return (len(text) - non_ascii) // 4 + non_ascii + 1
+
+
+def _parse_block(lines: list[str]) -> tuple[list[str], list[list[str]], list[str]]:
+    """Split one traceback block into (header lines, frames, tail lines)."""
+    header, frames, tail = [], [], []
+    for line in lines:
+        if FRAME_RE.match(line) and not tail:
+            frames.append([line])
+        elif frames and not tail and line[:1].isspace():
+            frames[-1].append(line)         # source line / ^^^^ markers of the frame
+        elif frames:
+            tail.append(line)               # exception line and whatever follows
+        else:
+            header.append(line)
+    return header, frames, tail
+
+
+def _frame_key(frame: list[str]) -> tuple:
+    return tuple(l.strip() for l in frame)
+
+
+def collapse_frames(frames: list[list[str]]) -> tuple[list[list[str]], int]:
+    """Collapse runs of identical frames / frame cycles. Returns (frames, number of frames removed)."""
+    keys = [_frame_key(f) for f in frames]
+    out, removed, i, n = [], 0, 0, len(frames)
+    while i < n:
+        best_period, best_repeats = 0, 1
+        for period in range(1, MAX_CYCLE + 1):
+            if i + 2 * period > n:
+                break
+            repeats = 1
+            while (i + (repeats + 1) * period <= n
+                   and keys[i + repeats * period:i + (repeats + 1) * period] == keys[i:i + period]):
+                repeats += 1
+            if repeats >= MIN_REPEATS and repeats * period > best_repeats * best_period:
+                best_period, best_repeats = period, repeats
+        if best_period:
+            out.extend(frames[i:i + best_period])
+            skipped = (best_repeats - 1) * best_period
+            if best_period == 1:
+                out.append([f"  [... {skipped} identical frames ...]"])
+            else:
+                out.append([f"  [... {skipped} identical frames (cycle of {best_period}) ...]"])
+            removed += skipped
+            i += best_repeats * best_period
+        else:
+            out.append(frames[i])
+            i += 1
+    return out, removed
+
+
+def _render(header, frames, tail) -> list[str]:
+    return header + [l for f in frames for l in f] + tail
+
+
+def compact_snippet(snippet: str, token_budget: int = 1500) -> tuple[str, dict]:
+    """
+    Shrink an extracted error snippet before it goes into the prompt.
+    (1) collapse repeated frames and frame cycles
+    (2) drop chained traceback blocks identical to an earlier one
+    (3) trim to token_budget: drop earlier chained blocks, then outer frames,
+        always keeping the innermost frames and the exception line
+    Returns (compacted snippet, stats).
+    """
+    lines = snippet.splitlines()
+
+    # Split chained exceptions into blocks (separator kept at the start of each later block)
+    blocks, current = [], []
+    for line in lines:
+        if CHAIN_RE.match(line.strip()):
+            blocks.append(current)
+            current = [line]
+        else:
+            current.append(line)
+    blocks.append(current)
+
+    parsed, seen, frames_removed, blocks_removed = [], set(), 0, 0
+    for block in blocks:
+        header, frames, tail = _parse_block(block)
+        frames, removed = collapse_frames(frames)
+        frames_removed += removed
+        body = tuple(l.strip() for l in _render([], frames, tail) if l.strip())
+        if frames and body in seen:
+            # identical chained block: keep the separator only
+            sep = header[:1] if header and CHAIN_RE.match(header[0].strip()) else []
+            parsed.append((sep, [], ["[... identical chained traceback omitted ...]"]))
+            blocks_removed += 1
+            continue
+        seen.add(body)
+        parsed.append((header, frames, tail))
+
+    def render_all(parts):
+        return "\n".join(l for p in parts for l in _render(*p))
+
+    text = render_all(parsed)
+
+    # (3) token budget
+    if estimate_tokens(text) > token_budget:
+        dropped = 0
+        while len(parsed) > 1 and estimate_tokens(text) > token_budget:
+            parsed.pop(0)
+            dropped += 1
+            note = ([], [], [f"[... {dropped} earlier chained traceback(s) omitted ...]"])
+            text = render_all([note] + parsed)
+        if dropped:
+            parsed.insert(0, ([], [], [f"[... {dropped} earlier chained traceback(s) omitted ...]"]))
+
+        header, frames, tail = parsed[-1]
+        outer = 0
+        while len(frames) > 1 and estimate_tokens(text) > token_budget:
+            frames = frames[1:]
+            outer += 1
+            parsed[-1] = (header, [[f"  [... {outer} outer frames omitted ...]"]] + frames, tail)
+            text = render_all(parsed)
+
+    if estimate_tokens(text) > token_budget:
+        text = _trim_tail(text, token_budget)
+
+    stats = {
+        "original_bytes": len(snippet.encode("utf-8")),
+        "compacted_bytes": len(text.encode("utf-8")),
+        "original_tokens": estimate_tokens(snippet),
+        "compacted_tokens": estimate_tokens(text),
+        "frames_collapsed": frames_removed,
+        "blocks_deduplicated": blocks_removed,
+    }
+    stats["bytes_saved"] = stats["original_bytes"] - stats["compacted_bytes"]
+    stats["tokens_saved"] = stats["original_tokens"] - stats["compacted_tokens"]
+    return text, stats
+
+
+def _trim_tail(text: str, token_budget: int) -> str:
+    """Last resort: keep the first line and as many trailing lines as fit."""
+    lines = text.splitlines()
+    if len(lines) == 1:
+        return text[-token_budget * 4:]
+    head = lines[0]
+    kept = []
+    used = estimate_tokens(head) + 16
+    for line in reversed(lines[1:]):
+        cost = estimate_tokens(line)
+        if used + cost > token_budget:
+            break
+        kept.append(line)
+        used += cost
+    if not kept:
+        # a single huge line (the exception message itself): keep its end
+        last = lines[-1]
+        chars = max(token_budget - used, 1) * 4
+        kept = [last[-chars:]]
+    omitted = len(lines) - 1 - len(kept)
+    marker = [f"[... {omitted} lines omitted ...]"] if omitted > 0 else []
+    return "\n".join([head] + marker + list(reversed(kept)))
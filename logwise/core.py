@@ -1,97 +1,824 @@
 # logwise/core.py
-import requests, json
-from .error_extractor import extract_error_from_text, extract_error_with_code
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
 
-OLLAMA_URL = "http://127.0.0.1:11434/api/generate"
-RUNNER_URL = "http://127.0.0.1:9090/run"
+import requests
+from requests.adapters import HTTPAdapter
+from . import metrics
+from .cache import AnalysisCache, fingerprint
+from .compaction import compact_snippet
+from .error_extractor import (
+    extract_error_from_text, extract_error_with_code, extract_error_from_stream, extract_error_from_file,
+    extract_error_events, truncation_marker, TOP_K,
+)
+from .flight import CancelToken, SingleFlight
+from .parallel import scan_file_parallel
+from .transport import UnixSocketAdapter, decode, request_headers, split_unix_url
 
-def run_command(cmd: str) -> tuple[int, str, str, str]:
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://127.0.0.1:11434/api/generate")
+# http://host:port/run, or unix:///path/to/runner.sock for a runner started with LOGWISE_RUNNER_SOCKET
+RUNNER_URL = os.environ.get("RUNNER_URL", "http://127.0.0.1:9090/run")
+# Runner shell session: commands with the same id share one stateful shell (cwd, env)
+SESSION_ID = os.environ.get("LOGWISE_SESSION", "default")
+
+# Model settings (keep_alive: how long Ollama keeps the model loaded after a request)
+MODEL = os.environ.get("LOGWISE_MODEL", "qwen2.5:7b")
+KEEP_ALIVE = os.environ.get("LOGWISE_KEEP_ALIVE", "30m")
+OPTIONS = {"num_predict": 256}
+if os.environ.get("LOGWISE_OPTIONS"):
+    OPTIONS.update(json.loads(os.environ["LOGWISE_OPTIONS"]))
+
+# A stream whose model load took longer than this counts as "cold"
+COLD_LOAD_THRESHOLD = 1.0
+# Skip a background warm-up if the last one was less than this many seconds ago
+WARM_UP_INTERVAL = 60
+
+# Connection pool / timeout defaults for LogwiseClient
+POOL_CONNECTIONS = 4      # number of distinct hosts kept in the pool (runner + ollama)
+POOL_MAXSIZE = 16         # max keep-alive connections per host
+CONNECT_TIMEOUT = 5
+RUN_TIMEOUT = 1810        # must longer than runner.py (1800s)
+RUN_KEEP_BYTES = 1024 * 1024  # streamed command output kept for the analysis (the tail)
+JOB_POLL_WAIT = 10        # seconds one long poll of a Runner job's output may wait
+JOB_RETRIES = 5           # reconnects while following a job before giving up
+LLM_TIMEOUT = 600
+
+# Analysis cache: in-memory LRU, plus an on-disk tier when LOGWISE_CACHE_DIR is set
+CACHE_ENTRIES = 256
+CACHE_DIR = os.environ.get("LOGWISE_CACHE_DIR")
+
+# Max (estimated) tokens of error snippet put into the prompt
+TOKEN_BUDGET = int(os.environ.get("LOGWISE_TOKEN_BUDGET", "1500"))
+
+
+def build_prompt(snippet: str) -> str:
+    """Wrap an extracted error snippet into the prompt sent to Ollama."""
+    hint = ""
+    if "\n[Resources] " in snippet:
+        hint = ("The last line is the command's measured resource usage; "
+                "consider memory (OOM), time limits or signals as the cause. ")
+    return (
+        "You are a Linux and Python debugging assistant.\n"
+        "Please reply only in Traditional Chinese (Mandarin). "
+        "If the error is within the file itself, please tell me which row it is."
+        + hint +
+        "Explain briefly and give concise suggestions:\n----\n"
+        + snippet + "\n----"
+    )
+
+
+def format_events(events, token_budget: int = TOKEN_BUDGET) -> str:
     """
-    (Agent Mode)
-    Sends commands to the Runner Agent running on the C terminal,
-    which executes the commands in its environment and returns the results.
+    (Multi-Error Mode)
+    Ranked error events as one snippet for a single prompt. Each event is compacted
+    to an equal share of token_budget, so trimming never drops the top-ranked one.
     """
-    try:
-        response = requests.post(
-            RUNNER_URL,
-            json={"command": cmd},
-            timeout=1810 # must longer than runner.py (1800s)
-        )
+    share = max(token_budget // len(events) - 32, 64)
+    parts = [f"{len(events)} distinct error(s) in this log, most severe / most recent first:"]
+    for n, event in enumerate(events, 1):
+        text, _ = compact_snippet(event.text, share)
+        if event.count > 1:
+            where = f"{event.count} times, first line {event.first_line}, last line {event.last_line}"
+        else:
+            where = f"line {event.first_line}"
+        parts.append(f"[{n}] {event.rule} ({where})\n{text}")
+    return "\n\n".join(parts)
+
+
+class CommandResult(tuple):
+    """(exit_code, stdout, stderr, cwd) of a Runner command; .resources is its resource accounting (or None)."""
+
+    def __new__(cls, exit_code: int, stdout: str, stderr: str, cwd: str, resources: dict = None):
+        result = super().__new__(cls, (exit_code, stdout, stderr, cwd))
+        result.resources = resources
+        return result
+
+
+def _emit(chunk: str, callback=None):
+    if callback:
+        callback(chunk)                     # <-- to WebUI
+    else:
+        # default: prints directly (CLI)
+        print(chunk, end="", flush=True)
+
+
+class LogwiseClient:
+    """
+    Shared HTTP client for the Runner Agent (C terminal) and Ollama (A terminal).
+    Keeps keep-alive connections in a pool instead of opening a new TCP
+    connection for every command / analysis.
+    """
+
+    def __init__(self, runner_url: str = None, ollama_url: str = None,
+                 pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                 connect_timeout: float = CONNECT_TIMEOUT, run_timeout: float = RUN_TIMEOUT,
+                 llm_timeout: float = LLM_TIMEOUT, cache: AnalysisCache = None,
+                 use_cache: bool = True, token_budget: int = TOKEN_BUDGET,
+                 model: str = None, keep_alive: str = None, options: dict = None,
+                 session_id: str = None):
+        self.runner_socket, self.runner_url = split_unix_url(runner_url or RUNNER_URL)
+        self.session_id = session_id or SESSION_ID
+        self.ollama_url = ollama_url or OLLAMA_URL
+        self.connect_timeout = connect_timeout
+        self.run_timeout = run_timeout
+        self.llm_timeout = llm_timeout
+        self.model = model or MODEL
+        self.keep_alive = keep_alive or KEEP_ALIVE
+        self.options = dict(OPTIONS if options is None else options)
+        if cache is None and use_cache:
+            cache = AnalysisCache(max_entries=CACHE_ENTRIES, cache_dir=CACHE_DIR)
+        self.cache = cache
+        self.flights = SingleFlight()
+        self.token_budget = token_budget
+        self.compaction = {"snippets": 0, "bytes_saved": 0, "tokens_saved": 0}
+        self._stats_lock = threading.Lock()
+        self.stream_history = deque(maxlen=200)     # per-stream TTFT / tokens per second
+        self._last_warm_up = 0.0
+        self._warm_up_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if self.runner_socket:
+            self.session.mount(self.runner_url.rsplit("/", 1)[0] + "/", UnixSocketAdapter(self.runner_socket, pool_maxsize))
+        # compressed (zstd / gzip) and msgpack Runner responses, where the libraries are installed
+        self.session.headers.update(request_headers())
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run_command(self, cmd: str, session_id: str = None) -> CommandResult:
+        """
+        (Agent Mode)
+        Sends commands to the Runner Agent running on the C terminal,
+        which executes the commands in its environment and returns the results.
+        session_id picks the Runner shell (default: the client's session_id).
+        """
+        try:
+            with metrics.timer("logwise_run_command_seconds"):
+                response = self.session.post(
+                    self.runner_url,
+                    json={"command": cmd, "session": session_id or self.session_id},
+                    timeout=(self.connect_timeout, self.run_timeout)
+                )
+            if response.status_code in (500, 503):
+                # the command failed (e.g. its shell was killed) / every Runner shell session is busy:
+                # its JSON says so, with the partial output
+                data = decode(response)
+                return CommandResult(-1, "", data.get("stderr", ""), data.get("cwd", "/"))
+            response.raise_for_status()
+
+            data = decode(response)
+
+            return CommandResult(
+                data.get("exit_code", -1),
+                data.get("stdout", ""),
+                data.get("stderr", data.get("error", "")),
+                data.get("cwd", "/"),
+                data.get("resources"),
+            )
+
+        except requests.exceptions.ConnectionError:
+            # if C terminal "runner.py" doesn't work
+            err_msg = "[Logwise ERROR] cannot connect to  Runner Agent (C terminal).\n"
+            err_msg += "please ensure your 'C terminal' already start runner.py"
+            return CommandResult(-1, "", err_msg, "/")
+        except Exception as e:
+            return CommandResult(-1, "", f"[Logwise CORE ERROR] fail to send command to Agent: {str(e)}", "/")
+
+    def iter_run_command(self, cmd: str, session_id: str = None):
+        """
+        (Agent Mode, streaming)
+        Yield the Runner's /run/stream frames while the command runs:
+        {"output": "..."} as lines are printed, then {"done": True, "exit_code", "cwd", "resources"[, "error"]}.
+        """
+        try:
+            with metrics.timer("logwise_run_command_seconds"):
+                with self.session.post(self.runner_url.rstrip("/") + "/stream", json={"command": cmd, "session": session_id or self.session_id},
+                                       stream=True, timeout=(self.connect_timeout, self.run_timeout)) as response:
+                    response.raise_for_status()
+                    # chunk_size=None: hand over each frame as it arrives, not per 512-byte block
+                    for line in response.iter_lines(chunk_size=None):
+                        if line:
+                            yield json.loads(line)
+        except requests.exceptions.ConnectionError:
+            err_msg = "[Logwise ERROR] cannot connect to  Runner Agent (C terminal).\n"
+            err_msg += "please ensure your 'C terminal' already start runner.py"
+            yield {"done": True, "exit_code": -1, "cwd": "/", "error": err_msg}
+        except Exception as e:
+            yield {"done": True, "exit_code": -1, "cwd": "/",
+                   "error": f"[Logwise CORE ERROR] fail to send command to Agent: {str(e)}"}
+
+    def run_command_stream(self, cmd: str, callback=None, session_id: str = None) -> CommandResult:
+        """
+        run_command() over /run/stream: callback(text) gets the output as it arrives.
+        Returns the same CommandResult; only the last RUN_KEEP_BYTES of output are kept.
+        """
+        kept = deque()
+        kept_len = dropped = 0
+        final = {"exit_code": -1, "cwd": "/", "error": "[Logwise ERROR] Runner stream ended early."}
+        for frame in self.iter_run_command(cmd, session_id):
+            if frame.get("output"):
+                text = frame["output"]
+                _emit(text, callback)
+                kept.append(text)
+                kept_len += len(text)
+                while kept_len > RUN_KEEP_BYTES and len(kept) > 1:
+                    kept_len -= len(kept[0])
+                    dropped += len(kept.popleft())
+            if frame.get("done"):
+                final = frame
+        output = "".join(kept).strip()
+        if dropped:
+            # the runner also keeps the full output when it spilled it (output_id)
+            output = truncation_marker(dropped, final.get("output_id")) + "\n" + output
+        exit_code = final.get("exit_code", -1)
+        if final.get("error"):
+            _emit(final["error"] + "\n", callback)
+            output = (output + "\n" + final["error"]).strip()
+        if exit_code == 0:
+            return CommandResult(0, output, "", final.get("cwd", "/"), final.get("resources"))
+        return CommandResult(exit_code, "", output, final.get("cwd", "/"), final.get("resources"))
+
+    def _runner_endpoint(self, path: str) -> str:
+        # runner_url points at /run; the other endpoints live next to it
+        return self.runner_url.rsplit("/", 1)[0] + path
+
+    def submit_job(self, cmd: str, session_id: str = None) -> str:
+        """(Agent Mode, async) Queue a command on the Runner; returns the job id at once."""
+        response = self.session.post(self._runner_endpoint("/jobs"),
+                                     json={"command": cmd, "session": session_id or self.session_id},
+                                     timeout=(self.connect_timeout, self.run_timeout))
+        if response.status_code == 503:
+            raise RuntimeError(decode(response).get("error", "Runner job queue is full"))
+        response.raise_for_status()
+        return decode(response)["job_id"]
+
+    def _get_job(self, path: str, params: dict = None, timeout: float = None) -> requests.Response:
+        """GET a job endpoint; dropped connections are retried (the job goes on on the Runner)."""
+        for attempt in range(JOB_RETRIES):
+            try:
+                return self.session.get(self._runner_endpoint(path), params=params,
+                                        timeout=(self.connect_timeout, timeout or self.run_timeout))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == JOB_RETRIES - 1:
+                    raise
+                time.sleep(1 + attempt)
+
+    def job_status(self, job_id: str) -> dict:
+        response = self._get_job(f"/jobs/{job_id}")
         response.raise_for_status()
-        
-        data = response.json()
-        
-        return (
+        return decode(response)
+
+    def list_jobs(self) -> list[dict]:
+        response = self._get_job("/jobs")
+        response.raise_for_status()
+        return decode(response)["jobs"]
+
+    def iter_job_output(self, job_id: str, offset: int = 0):
+        """Yield a job's output as it is produced (long polls), until the job is done."""
+        while True:
+            response = self._get_job(f"/jobs/{job_id}/output", {"offset": offset, "wait": JOB_POLL_WAIT},
+                                     timeout=JOB_POLL_WAIT + self.connect_timeout + 5)
+            response.raise_for_status()
+            data = decode(response)
+            if data["skipped"]:
+                yield f"[... {data['skipped']} characters of output skipped ...]\n"
+            if data["data"]:
+                yield data["data"]
+            offset = data["next_offset"]
+            if data["done"]:
+                return
+
+    def job_result(self, job_id: str) -> CommandResult:
+        """CommandResult of a finished job, like run_command()."""
+        response = self._get_job(f"/jobs/{job_id}/result")
+        response.raise_for_status()
+        data = decode(response)
+        return CommandResult(
             data.get("exit_code", -1),
             data.get("stdout", ""),
-            data.get("stderr", data.get("error", "")), 
-            data.get("cwd", "/")
+            data.get("stderr", ""),
+            data.get("cwd", "/"),
+            data.get("resources"),
         )
-        
-    except requests.exceptions.ConnectionError:
-        # if C terminal "runner.py" doesn't work
-        err_msg = "[Logwise ERROR] cannot connect to  Runner Agent (C terminal).\n"
-        err_msg += "please ensure your 'C terminal' already start runner.py"
-        return -1, "", err_msg, "/"
-    except Exception as e:
-        return -1, "", f"[Logwise CORE ERROR] fail to send command to Agent: {str(e)}", "/"
-
-
-def ask_llm_stream(snippet: str, callback=None):
-    """Stream sends to Ollama; callback is used to write to WebUI, CLI prints directly."""
-    payload = {
-        "model": "qwen2.5:7b",
-        "prompt": (
-            "You are a Linux and Python debugging assistant.\n"
-            "Please reply only in Traditional Chinese (Mandarin). "
-            "If the error is within the file itself, please tell me which row it is."
-            "Explain briefly and give concise suggestions:\n----\n"
-            + snippet + "\n----"
-        ),
-        "options": {"num_predict": 256},
-    }
-    response = requests.post(OLLAMA_URL, json=payload, stream=True, timeout=600)
-    for line in response.iter_lines():
-        if line:
-            data = json.loads(line)
-            if "response" in data:
-                if callback:
-                    callback(data["response"])
-                else:
-                    # defaultGprints directly (CLI)
-                    print(data["response"], end="", flush=True)
-
-
-def analyze_text(text: str, callback=None):
+
+    def attach_job(self, job_id: str, callback=None) -> CommandResult:
+        """Follow a submitted job: its output goes to callback as it arrives, then its result."""
+        received = False
+        try:
+            for text in self.iter_job_output(job_id):
+                received = True
+                _emit(text, callback)
+            result = self.job_result(job_id)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                result = CommandResult(-1, "", f"[Logwise ERROR] Runner job '{job_id}' not found (expired or runner restarted).", "/")
+            else:
+                result = CommandResult(-1, "", f"[Logwise CORE ERROR] fail to follow job '{job_id}': {str(e)}", "/")
+        except requests.exceptions.ConnectionError:
+            result = CommandResult(-1, "", f"[Logwise ERROR] lost the Runner Agent while following job '{job_id}'.", "/")
+        if not received and (result[1] or result[2]):
+            # no output came through (e.g. a rejected command): show the message instead
+            _emit((result[1] or result[2]) + "\n", callback)
+        return result
+
+    def cancel_job(self, job_id: str) -> dict:
+        """
+        Interrupt a Runner job (Ctrl-C, then SIGKILL) or drop it from the queue:
+        {"job_id", "status", "cancelled", "signal"}. Its partial output then comes from job_result().
+        """
+        response = self.session.post(self._runner_endpoint(f"/jobs/{job_id}/cancel"),
+                                     timeout=(self.connect_timeout, self.run_timeout))
+        response.raise_for_status()
+        return decode(response)
+
+    def cancel_command(self, session_id: str = None) -> dict:
+        """Interrupt the command running in a Runner session: {"session", "cancelled", "signal"}."""
+        response = self.session.post(self._runner_endpoint("/cancel"),
+                                     json={"session": session_id or self.session_id},
+                                     timeout=(self.connect_timeout, self.run_timeout))
+        response.raise_for_status()
+        return decode(response)
+
+    def run_command_job(self, cmd: str, callback=None, session_id: str = None,
+                        on_submit=None) -> CommandResult:
+        """
+        run_command() through the Runner's job API: no HTTP request is held open
+        for the whole command, output arrives by cheap long polls (callback), and a
+        dropped connection only means polling again. on_submit(job_id) is called
+        once the job is queued.
+        """
+        try:
+            job_id = self.submit_job(cmd, session_id)
+        except requests.exceptions.ConnectionError:
+            err_msg = "[Logwise ERROR] cannot connect to  Runner Agent (C terminal).\n"
+            err_msg += "please ensure your 'C terminal' already start runner.py"
+            _emit(err_msg + "\n", callback)
+            return CommandResult(-1, "", err_msg, "/")
+        except Exception as e:
+            err_msg = f"[Logwise CORE ERROR] fail to send command to Agent: {str(e)}"
+            _emit(err_msg + "\n", callback)
+            return CommandResult(-1, "", err_msg, "/")
+        if on_submit:
+            on_submit(job_id)
+        return self.attach_job(job_id, callback)
+
+    def fetch_output(self, output_id: str, offset: int = 0, length: int = None) -> dict:
+        """
+        A byte range of a truncated command's full output, kept by the Runner
+        (output id from the truncation marker): {"data", "next_offset", "size", "eof", ...}.
+        """
+        params = {"offset": offset}
+        if length is not None:
+            params["length"] = length
+        url = self._runner_endpoint(f"/output/{output_id}")
+        response = self.session.get(url, params=params, timeout=(self.connect_timeout, self.run_timeout))
+        response.raise_for_status()
+        return decode(response)
+
+    def iter_llm_stream(self, snippet: str, cancel: CancelToken = None):
+        """Yield response tokens from Ollama as they are generated; stops (and closes the stream) on cancel."""
+        with metrics.timer("logwise_prompt_build_seconds"):
+            prompt = build_prompt(snippet)
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "keep_alive": self.keep_alive,
+            "options": self.options,
+        }
+        if cancel is not None and cancel.cancelled:
+            return
+        stats = {"model": self.model, "ttft_s": None, "tokens": 0, "completed": False}
+        start = time.perf_counter()
+        try:
+            # 'with' returns the connection to the pool once the stream is consumed
+            with self.session.post(self.ollama_url, json=payload, stream=True,
+                                   timeout=(self.connect_timeout, self.llm_timeout)) as response:
+                if cancel is not None:
+                    # closing the connection makes Ollama abort the generation
+                    cancel.on_cancel(response.close)
+                try:
+                    for line in response.iter_lines():
+                        if cancel is not None and cancel.cancelled:
+                            return
+                        if line:
+                            data = json.loads(line)
+                            if data.get("response"):
+                                if stats["ttft_s"] is None:
+                                    stats["ttft_s"] = time.perf_counter() - start
+                                stats["tokens"] += 1
+                                yield data["response"]
+                            if data.get("done"):
+                                stats["completed"] = True
+                                _add_ollama_timings(stats, data)
+                except Exception:
+                    if cancel is not None and cancel.cancelled:
+                        return
+                    raise
+        finally:
+            stats["total_s"] = time.perf_counter() - start
+            self._record_stream(stats)
+
+    def _record_stream(self, stats: dict):
+        gen_s = stats.get("eval_s") or (stats["total_s"] - (stats["ttft_s"] or 0))
+        tokens = stats.get("eval_count", stats["tokens"])
+        stats["tokens_per_s"] = tokens / gen_s if gen_s > 0 else None
+        stats["cold"] = (stats.get("load_s") or 0) >= COLD_LOAD_THRESHOLD
+        with self._stats_lock:
+            self.stream_history.append(stats)
+        if metrics.is_enabled():
+            if stats["ttft_s"] is not None:
+                metrics.observe("logwise_llm_ttft_seconds", stats["ttft_s"])
+            metrics.observe("logwise_llm_total_seconds", stats["total_s"])
+            metrics.observe("logwise_llm_tokens", stats["tokens"])
+
+    def stream_stats(self) -> dict:
+        """Average TTFT / tokens per second of recent streams, split into cold and warm model loads."""
+        with self._stats_lock:
+            history = list(self.stream_history)
+        summary = {}
+        for label, cold in (("warm", False), ("cold", True)):
+            streams = [s for s in history if s["cold"] == cold and s["ttft_s"] is not None]
+            summary[label] = {
+                "streams": len(streams),
+                "avg_ttft_s": _mean([s["ttft_s"] for s in streams]),
+                "avg_tokens_per_s": _mean([s["tokens_per_s"] for s in streams if s["tokens_per_s"]]),
+                "avg_total_s": _mean([s["total_s"] for s in streams]),
+            }
+        summary["last"] = history[-1] if history else None
+        return summary
+
+    def warm_up(self) -> float:
+        """
+        Load the model into Ollama memory (empty prompt) and keep it resident for keep_alive.
+        Returns the seconds Ollama spent loading the model (0 if it was already loaded).
+        """
+        response = self.session.post(
+            self.ollama_url,
+            json={"model": self.model, "prompt": "", "keep_alive": self.keep_alive, "stream": False},
+            timeout=(self.connect_timeout, self.llm_timeout),
+        )
+        response.raise_for_status()
+        self._last_warm_up = time.time()
+        return response.json().get("load_duration", 0) / 1e9
+
+    def warm_up_in_background(self, force: bool = False) -> threading.Thread:
+        """
+        Start warm_up() on a daemon thread so the model is resident before the first error arrives.
+        Skipped (returns None) if a warm-up is running or ran within WARM_UP_INTERVAL seconds.
+        """
+        if not force and time.time() - self._last_warm_up < WARM_UP_INTERVAL:
+            return None
+        if not self._warm_up_lock.acquire(blocking=False):
+            return None
+        self._last_warm_up = time.time()
+
+        def worker():
+            try:
+                self.warm_up()
+            except Exception as e:
+                print(f"[Logwise] Model warm-up failed: {e}")
+            finally:
+                self._warm_up_lock.release()
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    def iter_answer(self, snippet: str, bypass_cache: bool = False, cancel: CancelToken = None):
+        """
+        Yield the LLM answer for a snippet.
+        A cache hit yields the stored answer at once; a miss joins (or starts) the
+        single in-flight generation for the same fingerprint, which stores the
+        answer in the cache once it completes.
+        bypass_cache skips the lookup (the fresh answer still refreshes the cache).
+        """
+        snippet = self.compact(snippet)
+        # the model and its options are part of the key: switching them must not return old answers
+        key = fingerprint(snippet, salt=f"{self.model}|{json.dumps(self.options, sort_keys=True)}")
+        if self.cache is not None and not bypass_cache:
+            answer = self.cache.get(key)
+            if answer is not None:
+                yield answer
+                return
+
+        def on_complete(answer):
+            # an empty answer means Ollama failed (e.g. HTTP 500 / unknown model): do not cache it
+            if self.cache is not None and answer:
+                self.cache.put(key, answer)
+
+        yield from self.flights.stream(
+            key,
+            lambda flight_cancel: self.iter_llm_stream(snippet, cancel=flight_cancel),
+            on_complete=on_complete,
+            cancel=cancel,
+        )
+
+    def compact(self, snippet: str) -> str:
+        """Collapse repeated frames / chained blocks and trim the snippet to token_budget."""
+        with metrics.timer("logwise_prompt_compact_seconds"):
+            snippet, stats = compact_snippet(snippet, self.token_budget)
+        with self._stats_lock:
+            self.compaction["snippets"] += 1
+            self.compaction["bytes_saved"] += stats["bytes_saved"]
+            self.compaction["tokens_saved"] += stats["tokens_saved"]
+        return snippet
+
+    def ask_llm_stream(self, snippet: str, callback=None, bypass_cache: bool = False,
+                       cancel: CancelToken = None):
+        """Stream sends to Ollama; callback is used to write to WebUI, CLI prints directly."""
+        for token in self.iter_answer(snippet, bypass_cache=bypass_cache, cancel=cancel):
+            _emit(token, callback)
+
+    def iter_analysis(self, snippet: str, bypass_cache: bool = False, cancel: CancelToken = None):
+        """Yield the analysis of an extracted snippet (a single message when there is nothing to analyze)."""
+        if snippet.startswith("[No error detected]"):
+            yield snippet
+            return
+        yield from self.iter_answer(snippet, bypass_cache=bypass_cache, cancel=cancel)
+
+    def analyze_text(self, text: str, callback=None, bypass_cache: bool = False,
+                     cancel: CancelToken = None):
+        """
+        (For Pipe Mode)
+        Shared logic: Extract the erroneous segment -> pass it to the Ollama. Both CLI and WebUI can use this terminology.
+        """
+        # Call text-based extractor
+        with metrics.timer("logwise_extract_text_seconds"):
+            snippet = extract_error_from_text(text)
+        self._analyze_snippet(snippet, callback, bypass_cache, cancel)
+
+    def analyze_stream(self, chunks, callback=None, bypass_cache: bool = False,
+                       cancel: CancelToken = None):
+        """
+        (For Pipe Mode, large input)
+        Same as analyze_text, but extracts incrementally from an iterable of text chunks,
+        so memory stays flat however big the log is.
+        """
+        snippet = extract_error_from_stream(chunks)
+        self._analyze_snippet(snippet, callback, bypass_cache, cancel)
+
+    def analyze_file(self, path: str, callback=None, bypass_cache: bool = False,
+                     cancel: CancelToken = None, workers: int = None):
+        """
+        (For File Mode)
+        Memory-maps the log and only decodes the windows around the error.
+        With workers, the middle is scanned in a process pool instead (same result).
+        """
+        with metrics.timer("logwise_extract_file_seconds"):
+            if workers:
+                snippet = scan_file_parallel(path, workers)
+            else:
+                snippet = extract_error_from_file(path)
+        self._analyze_snippet(snippet, callback, bypass_cache, cancel)
+
+    def analyze_events(self, chunks, top_k: int = TOP_K, callback=None, bypass_cache: bool = False,
+                       cancel: CancelToken = None):
+        """
+        (For Multi-Error Mode)
+        Every distinct error event of the log (one streaming pass, repeats clustered),
+        ranked by severity and recency; the top_k are analyzed together in one prompt.
+        """
+        with metrics.timer("logwise_extract_events_seconds"):
+            events = extract_error_events(chunks, top_k)
+        self.analyze_error_events(events, callback, bypass_cache, cancel)
+
+    def analyze_error_events(self, events: list, callback=None, bypass_cache: bool = False,
+                             cancel: CancelToken = None):
+        """Analyze already extracted (ranked) error events in one prompt."""
+        if not events:
+            snippet = "[No error detected] Command executed successfully."
+        else:
+            snippet = format_events(events, self.token_budget)
+        self._analyze_snippet(snippet, callback, bypass_cache, cancel)
+
+    def analyze_with_code(self, exit_code: int, stdout: str, stderr: str, callback=None,
+                          bypass_cache: bool = False, cancel: CancelToken = None, resources: dict = None):
+        """
+        (For Run Mode)
+        Uses exit_code as the gold standard for error detection.
+        resources: the Runner's accounting of the command (CommandResult.resources).
+        """
+        # Call the exit Code-based extractor
+        with metrics.timer("logwise_extract_with_code_seconds"):
+            snippet = extract_error_with_code(exit_code, stdout, stderr, resources)
+        self._analyze_snippet(snippet, callback, bypass_cache, cancel)
+
+    def _analyze_snippet(self, snippet: str, callback=None, bypass_cache: bool = False,
+                         cancel: CancelToken = None):
+        if snippet.startswith("[No error detected]"):
+            if callback:
+                callback(snippet) # <-- to WebUI
+            else:
+                print(snippet)    # <-- to CLI
+            return
+
+        self.ask_llm_stream(snippet, callback=callback, bypass_cache=bypass_cache, cancel=cancel)
+
+
+class AsyncLogwiseClient:
     """
-    (For Pipe Mode)
-    Shared logic: Extract the erroneous segment -> pass it to the Ollama. Both CLI and WebUI can use this terminology.
+    asyncio version of the LogwiseClient API.
+    The blocking HTTP work runs in the default executor, so one event loop can
+    drive many analyses at once; analyses are exposed as async iterators of tokens.
+    Leaving the iteration early (break / task cancellation) cancels the generation.
     """
-    # Call text-based extractor
-    snippet = extract_error_from_text(text)
-    
-    if snippet.startswith("[No error detected]"):
-        if callback:
-            callback(snippet) # <-- to WebUI
-        else:
-            print(snippet)    # <-- to CLI
-        return
-        
-    ask_llm_stream(snippet, callback=callback)
-    
-def analyze_with_code(exit_code: int, stdout: str, stderr: str, callback=None):
+
+    def __init__(self, client: LogwiseClient = None):
+        self.client = client or get_client()
+
+    async def run_command(self, cmd: str, session_id: str = None) -> CommandResult:
+        return await asyncio.to_thread(self.client.run_command, cmd, session_id)
+
+    async def ask_llm_stream(self, snippet: str, bypass_cache: bool = False):
+        async for token in _aiter_thread(self.client.iter_answer, snippet, bypass_cache):
+            yield token
+
+    async def analyze_text(self, text: str, bypass_cache: bool = False):
+        with metrics.timer("logwise_extract_text_seconds"):
+            snippet = extract_error_from_text(text)
+        async for token in _aiter_thread(self.client.iter_analysis, snippet, bypass_cache):
+            yield token
+
+    async def analyze_with_code(self, exit_code: int, stdout: str, stderr: str,
+                                bypass_cache: bool = False, resources: dict = None):
+        with metrics.timer("logwise_extract_with_code_seconds"):
+            snippet = extract_error_with_code(exit_code, stdout, stderr, resources)
+        async for token in _aiter_thread(self.client.iter_analysis, snippet, bypass_cache):
+            yield token
+
+
+def _add_ollama_timings(stats: dict, data: dict):
+    """Copy the server-side timings (nanoseconds) of Ollama's final 'done' message."""
+    for key, name in (("load_duration", "load_s"), ("prompt_eval_duration", "prompt_eval_s"),
+                      ("eval_duration", "eval_s")):
+        if data.get(key):
+            stats[name] = data[key] / 1e9
+    if data.get("eval_count"):
+        stats["eval_count"] = data["eval_count"]
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else None
+
+
+_DONE = object()
+
+
+async def _aiter_thread(gen_func, *args):
     """
-    (For Run Mode)
-    Uses exit_code as the gold standard for error detection.
+    Drive a blocking generator in a worker thread and re-yield its items on the event loop.
+    gen_func must accept a cancel= CancelToken, which is cancelled when the consumer goes away.
     """
-    # [NEW] Call the exit Code-based extractor
-    snippet = extract_error_with_code(exit_code, stdout, stderr)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    cancel = CancelToken()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # event loop already closed
+
+    def worker():
+        try:
+            for item in gen_func(*args, cancel=cancel):
+                put(item)
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    future = loop.run_in_executor(None, worker)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        cancel.cancel()
+        await future
+
+
+# Module-level API (shared pooled client)
+_client: LogwiseClient = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> LogwiseClient:
+    """Return the process-wide LogwiseClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LogwiseClient()
+    return _client
+
+
+def run_command(cmd: str, session_id: str = None) -> CommandResult:
+    return get_client().run_command(cmd, session_id)
+
+
+def iter_run_command(cmd: str, session_id: str = None):
+    return get_client().iter_run_command(cmd, session_id)
+
+
+def run_command_stream(cmd: str, callback=None, session_id: str = None) -> CommandResult:
+    return get_client().run_command_stream(cmd, callback, session_id)
+
+
+def fetch_output(output_id: str, offset: int = 0, length: int = None) -> dict:
+    return get_client().fetch_output(output_id, offset, length)
+
+
+def submit_job(cmd: str, session_id: str = None) -> str:
+    return get_client().submit_job(cmd, session_id)
+
+
+def attach_job(job_id: str, callback=None) -> CommandResult:
+    return get_client().attach_job(job_id, callback)
+
+
+def run_command_job(cmd: str, callback=None, session_id: str = None, on_submit=None) -> CommandResult:
+    return get_client().run_command_job(cmd, callback, session_id, on_submit)
+
+
+def list_jobs() -> list[dict]:
+    return get_client().list_jobs()
+
+
+def cancel_job(job_id: str) -> dict:
+    return get_client().cancel_job(job_id)
+
+
+def cancel_command(session_id: str = None) -> dict:
+    return get_client().cancel_command(session_id)
+
+
+def ask_llm_stream(snippet: str, callback=None, bypass_cache: bool = False,
+                   cancel: CancelToken = None):
+    get_client().ask_llm_stream(snippet, callback=callback, bypass_cache=bypass_cache, cancel=cancel)
+
+
+def analyze_text(text: str, callback=None, bypass_cache: bool = False, cancel: CancelToken = None):
+    get_client().analyze_text(text, callback=callback, bypass_cache=bypass_cache, cancel=cancel)
+
+
+def analyze_stream(chunks, callback=None, bypass_cache: bool = False, cancel: CancelToken = None):
+    get_client().analyze_stream(chunks, callback=callback, bypass_cache=bypass_cache, cancel=cancel)
+
+
+def analyze_file(path: str, callback=None, bypass_cache: bool = False, cancel: CancelToken = None,
+                 workers: int = None):
+    get_client().analyze_file(path, callback=callback, bypass_cache=bypass_cache, cancel=cancel, workers=workers)
+
+
+def analyze_events(chunks, top_k: int = TOP_K, callback=None, bypass_cache: bool = False,
+                   cancel: CancelToken = None):
+    get_client().analyze_events(chunks, top_k=top_k, callback=callback, bypass_cache=bypass_cache,
+                                cancel=cancel)
+
+
+def analyze_error_events(events: list, callback=None, bypass_cache: bool = False, cancel: CancelToken = None):
+    get_client().analyze_error_events(events, callback=callback, bypass_cache=bypass_cache, cancel=cancel)
+
+
+def analyze_with_code(exit_code: int, stdout: str, stderr: str, callback=None,
+                      bypass_cache: bool = False, cancel: CancelToken = None, resources: dict = None):
+    get_client().analyze_with_code(exit_code, stdout, stderr, callback=callback,
+                                   bypass_cache=bypass_cache, cancel=cancel, resources=resources)
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the shared client's analysis cache."""
+    cache = get_client().cache
+    return cache.stats() if cache is not None else {}
+
+
+def warm_up_in_background(force: bool = False):
+    return get_client().warm_up_in_background(force=force)
+
+
+def stream_stats() -> dict:
+    return get_client().stream_stats()
 
-    if snippet.startswith("[No error detected]"):
-        if callback:
-            callback(snippet) # <-- to WebUI
-        else:
-            print(snippet)    # <-- to CLI
-        return
 
-    ask_llm_stream(snippet, callback=callback)
\ No newline at end of file
+def compaction_stats() -> dict:
+    """Bytes / estimated tokens removed from snippets by prompt compaction."""
+    client = get_client()
+    with client._stats_lock:
+        return dict(client.compaction)
@@ -1,4 +1,64 @@
+import os
 import re
+from collections import deque
+
+from .cache import fingerprint, normalize_snippet
+from .rules import get_cascade_engine, get_engine
+
+# Pipe mode only looks at the beginning and the end of a log.
+HEAD_LINES = 60
+TAIL_LINES = 400
+
+# Error keywords live in rules.py (rule sets compiled into one pattern). The single-error
+# extractors below detect with get_cascade_engine() (the original keyword list), the
+# multi-error mode classifies with every set (get_engine()).
+TRACEBACK_PATTERN = re.compile("traceback", re.IGNORECASE)
+
+# Command output cut in the middle (runner capture limits): head, this marker line, tail.
+TRUNCATION_PATTERN = re.compile(r"^\[\.\.\. \d+ bytes of output omitted\b.*\.\.\.\]$", re.MULTILINE)
+
+
+def truncation_marker(omitted: int, output_id: str = None) -> str:
+    where = f" (full output: runner output id {output_id})" if output_id else ""
+    return f"[... {omitted} bytes of output omitted{where} ...]"
+
+
+def split_truncated(text: str) -> tuple[str, str, str]:
+    """(head, marker, tail) of a truncated output; (text, "", "") if it was not cut."""
+    match = TRUNCATION_PATTERN.search(text)
+    if not match:
+        return text, "", ""
+    return text[:match.start()], match.group(0), text[match.end():]
+
+
+def _size(kb: int) -> str:
+    if kb >= 1024 ** 2:
+        return f"{kb / 1024 ** 2:.1f} GB"
+    if kb >= 1024:
+        return f"{kb / 1024:.0f} MB"
+    return f"{kb} KB"
+
+
+def format_resources(resources: dict) -> str:
+    """
+    One "[Resources] ..." line from the runner's per-command accounting
+    (wall / CPU time, sampled peak RSS, terminating signal, OOM killer); "" if there is none.
+    """
+    if not resources:
+        return ""
+    parts = []
+    if resources.get("wall_s") is not None:
+        parts.append(f"wall {resources['wall_s']:.1f}s")
+    if resources.get("user_s") is not None:
+        parts.append(f"CPU user {resources['user_s']:.1f}s sys {resources.get('sys_s') or 0:.1f}s")
+    if resources.get("max_rss_kb"):
+        parts.append(f"peak RSS {_size(resources['max_rss_kb'])} (sampled)")
+    if resources.get("signal"):
+        parts.append(f"killed by {resources['signal']}")
+    if resources.get("oom_kill"):
+        parts.append("kernel OOM killer ran during the command")
+    return "[Resources] " + " | ".join(parts) if parts else ""
+
 
 def extract_error_from_text(text: str) -> str:
     """
@@ -16,23 +76,16 @@ def extract_error_from_text(text: str) -> str:
         return "[No output received]"
 
     # beginning and end of the scan (to avoid errors at the beginning).
-    scope = "\n".join(lines[:60] + lines[-400:])
+    scope = "\n".join(lines[:HEAD_LINES] + lines[-TAIL_LINES:])
 
     # (1) Python Traceback
     if "Traceback" in scope:
-        match = re.findall(r"(Traceback[\s\S]+?$)", scope, flags=re.IGNORECASE)
-        return match[-1].strip() if match else "[Python traceback detected]"
+        return _match_traceback(scope)
 
     # (2) Clearly identify the error keywords (stderr, not found, permission denied, no such file).
-    error_pattern = re.compile(
-        r"(error|exception|fail|not found|no such file|denied|segmentation fault|oom|cuda|nan|killed|invalid"
-        r"|錯誤|例外|失敗|找不到|沒有此一檔案或目錄|無法存取|拒絕|無效)",
-        re.IGNORECASE,
-    )
-    
-    for l in lines:
-        if error_pattern.search(l):
-            return l.strip()
+    index = get_cascade_engine().first_line(lines)
+    if index != -1:
+        return lines[index].strip()
 
     # (3) No stderr, but no stdout either -> This may indicate an invalid built-in shell.
     if len(lines) == 0 or all(not l.strip() for l in lines):
@@ -40,22 +93,155 @@ def extract_error_from_text(text: str) -> str:
 
     # (4) Short output with a vague message (e.g., just one line: 'Killed' or 'error').
     if len(lines) <= 5:
-        short_text = " ".join(lines).lower()
-        if any(k in short_text for k in ["error", "fail", "denied", "not found", "killed", "oom"]):
-            return "\n".join(lines[-5:]).strip()
-        # Short outputs starting with "usage:" or "help" are also considered suggestive outputs.
-        if short_text.startswith("usage") or short_text.startswith("help"):
-            return "[Info message detected] Possibly command usage or help output."
+        short = _match_short_output(lines)
+        if short:
+            return short
 
     # (5) Other situations: Considered successful (executed successfully, no abnormalities).
     return "[No error detected] Command executed successfully."
+
+
+def _traceback_tail(text: str) -> str:
+    r"""
+    From the first 'traceback' to the end of text, or None. Same result as the former
+    lazy regex (Traceback[\s\S]+?$), which tried $ after every character.
+    """
+    match = TRACEBACK_PATTERN.search(text)
+    if match and match.end() < len(text):
+        return text[match.start():].strip()
+    return None
+
+
+def _match_traceback(scope: str) -> str:
+    return _traceback_tail(scope) or "[Python traceback detected]"
+
+
+def match_rule(snippet: str):
+    """Most severe rule matching any line of a snippet (rules.Rule), or None."""
+    hits = get_engine().scan(snippet.splitlines())
+    return max((rule for _, rule in hits), key=lambda r: r.severity, default=None)
+
+
+def _match_short_output(lines: list[str]) -> str:
+    short_text = " ".join(lines).lower()
+    if any(k in short_text for k in ["error", "fail", "denied", "not found", "killed", "oom"]):
+        return "\n".join(lines[-5:]).strip()
+    # Short outputs starting with "usage:" or "help" are also considered suggestive outputs.
+    if short_text.startswith("usage") or short_text.startswith("help"):
+        return "[Info message detected] Possibly command usage or help output."
+    return None
+
+
+# Everything str.splitlines() treats as a line boundary
+_LINE_BREAKS = ("\n", "\r", "\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
+
+
+def _split_chunk(partial: str, chunk: str) -> tuple[list[str], str]:
+    """Complete lines of partial + chunk, and the unfinished last piece (kept for the next chunk)."""
+    parts = (partial + chunk).splitlines(keepends=True)
+    partial = parts.pop() if not parts[-1].endswith(_LINE_BREAKS) else ""
+    return [p.splitlines()[0] for p in parts], partial
+
+
+class StreamingErrorExtractor:
+    """
+    (Streaming Pipe Mode)
+    Incremental extract_error_from_text: feed() chunks as they arrive, then finish().
+    Memory is bounded no matter how big the input is: only the first HEAD_LINES
+    lines, a ring buffer of the last TAIL_LINES lines and the first keyword line
+    are kept. The result is identical to extract_error_from_text(whole_text),
+    which only ever looks at those lines too.
+    """
+
+    def __init__(self):
+        self.head = []
+        self.tail = deque(maxlen=TAIL_LINES)
+        self.first_error = None
+        self.line_count = 0
+        self._partial = ""
+
+    def feed(self, chunk: str):
+        if not chunk:
+            return
+        lines, self._partial = _split_chunk(self._partial, chunk)
+        self._add_lines(lines)
+
+    def feed_lines(self, lines):
+        for line in lines:
+            self.feed(line)
+
+    def _add_lines(self, lines: list[str]):
+        lines = [l for l in lines if l.strip()]
+        if not lines:
+            return
+        if self.line_count == 0:
+            lines[0] = lines[0].lstrip()  # same as text.strip() in extract_error_from_text
+        self.line_count += len(lines)
+        if len(self.head) < HEAD_LINES:
+            self.head.extend(lines[:HEAD_LINES - len(self.head)])
+        self.tail.extend(lines)
+
+        if self.first_error is None:
+            # one pass over the whole block; a keyword never spans lines
+            index = get_cascade_engine().first_line(lines)
+            if index != -1:
+                self.first_error = lines[index]
+
+    def finish(self) -> str:
+        if self._partial:
+            self._add_lines([self._partial])
+            self._partial = ""
+
+        if self.line_count == 0:
+            return "[No output received]"
+
+        # last line: trailing whitespace is removed by text.strip() in the batch version
+        last = self.tail[-1].rstrip()
+        self.tail[-1] = last
+        if self.line_count <= HEAD_LINES:
+            self.head[-1] = last
+
+        scope = "\n".join(self.head + list(self.tail))
+
+        # (1) Python Traceback
+        if "Traceback" in scope:
+            return _match_traceback(scope)
+
+        # (2) error keywords
+        if self.first_error is not None:
+            return self.first_error.strip()
+
+        # (4) Short output (all lines are in head)
+        if self.line_count <= 5:
+            short = _match_short_output(self.head)
+            if short:
+                return short
+
+        # (5) success
+        return "[No error detected] Command executed successfully."
+
+
+def extract_error_from_stream(chunks) -> str:
+    """extract_error_from_text for an iterable of text chunks / lines (e.g. a file or sys.stdin)."""
+    extractor = StreamingErrorExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+    return extractor.finish()
     
-def extract_error_with_code(exit_code: int, stdout: str, stderr: str) -> str:
+def extract_error_with_code(exit_code: int, stdout: str, stderr: str, resources: dict = None) -> str:
     """
     (Gold Standard for Run Mode)
     Uses exit_code as the primary criterion.
     Analyzes stderr (primary) or stdout (secondary) for the message.
+    For a failed command, the runner's resource accounting is appended as a last
+    "[Resources]" line (an OOM kill or timeout often prints nothing at all).
     """
+    snippet = _extract_with_code(exit_code, stdout, stderr)
+    usage = format_resources(resources) if exit_code != 0 else ""
+    return f"{snippet}\n{usage}" if usage else snippet
+
+
+def _extract_with_code(exit_code: int, stdout: str, stderr: str) -> str:
 
     # (1) check Exit Code
     if exit_code == 0:
@@ -79,17 +265,435 @@ def extract_error_with_code(exit_code: int, stdout: str, stderr: str) -> str:
     if not error_text:
         return f"[Error detected (exit code {exit_code}), but no output received]"
 
+    # Output cut by the runner: the failure is at the end, so look at the tail
+    # (unless only the head holds a traceback, which then runs on into the tail)
+    head, marker, tail = split_truncated(error_text)
+    if marker and ("Traceback" in tail or "Traceback" not in head):
+        error_text = tail.strip() or error_text
+
     lines = [l for l in error_text.splitlines() if l.strip()]
     if not lines:
         return f"[Error detected (exit code {exit_code}), but no output received]"
 
     # (3) priority for Python Traceback
     if "Traceback" in error_text:
-        match = re.search(r"(Traceback[\s\S]+?$)", error_text, flags=re.IGNORECASE)
-        if match:
-            return match.group(1).strip() # return full Traceback
+        traceback = _traceback_tail(error_text)
+        if traceback:
+            return traceback # return full Traceback
 
     # (4) For general errors (such as 'ls', 'sh'), simply return to the last few lines.
     # This completely ignores whether the error message is in Chinese, English, or Japanese.
     # This will perfectly catch 'ls: cannot access '/no_such_dir': no ​​such file or directory'.
-    return "\n".join(lines[-10:]).strip()
\ No newline at end of file
+    return "\n".join(lines[-10:]).strip()
+
+# ---------- File mode (mmap + reverse scan) ----------
+FILE_BLOCK = 64 * 1024            # read granularity for the head / tail windows
+FILE_WINDOW_MAX = 16 * 1024 ** 2  # cap on the decoded head / tail window
+FILE_SCAN_WINDOW = 8 * 1024 ** 2  # reverse-scan step over the middle of the file
+TRACEBACK_BLOCK_MAX = 256 * 1024  # max bytes decoded for a traceback found in the middle
+
+
+def _decode(data) -> str:
+    return bytes(data).decode("utf-8", errors="replace")
+
+
+def _nonempty_lines(text: str) -> list[str]:
+    return [l for l in text.splitlines() if l.strip()]
+
+
+def _head_window(mm, size: int) -> tuple[list[str], int]:
+    """First HEAD_LINES non-empty lines and the byte offset where they end."""
+    lines, pos = [], 0
+    limit = min(size, FILE_WINDOW_MAX)
+    while pos < limit and len(lines) < HEAD_LINES:
+        nl = mm.find(b"\n", pos, min(size, pos + FILE_WINDOW_MAX))
+        end = min(size, pos + FILE_WINDOW_MAX) if nl == -1 else nl + 1
+        lines.extend(_nonempty_lines(_decode(mm[pos:end])))
+        pos = end
+    return lines, pos
+
+
+def _tail_window(mm, size: int, stop: int) -> tuple[list[str], int]:
+    """Last TAIL_LINES non-empty lines (never reading before stop) and the offset where they start."""
+    chunks, count, pos = [], 0, size
+    limit = max(stop, size - FILE_WINDOW_MAX)
+    while pos > limit and count < TAIL_LINES:
+        nl = mm.rfind(b"\n", limit, pos - 1)   # newline that ends the previous line
+        start = limit if nl == -1 else nl + 1
+        lines = _nonempty_lines(_decode(mm[start:pos]))
+        chunks.append(lines)
+        count += len(lines)
+        pos = start
+    lines = [l for chunk in reversed(chunks) for l in chunk]
+    return lines, pos
+
+
+def _reverse_scan(mm, lo: int, hi: int) -> tuple[int, int]:
+    """
+    Scan [lo, hi) backwards in FILE_SCAN_WINDOW steps until a window contains
+    'Traceback' or an error keyword. Returns (last traceback offset, last keyword offset)
+    of that window, -1 if none (see _middle_error).
+    """
+    engine = get_cascade_engine()
+    overlap = engine.max_keyword_bytes  # a keyword may straddle two windows
+    end = hi
+    while end > lo:
+        start = max(lo, end - FILE_SCAN_WINDOW)
+        stop = min(end + overlap, hi)
+        tb = mm.rfind(b"Traceback", start, stop)
+        kw = engine.last_offset_bytes(mm[start:stop])
+        if tb != -1 or kw != -1:
+            return tb, (start + kw if kw != -1 else -1)
+        end = start
+    return -1, -1
+
+
+def _line_at(mm, offset: int, size: int) -> str:
+    start = mm.rfind(b"\n", 0, offset) + 1
+    end = mm.find(b"\n", offset, size)
+    return _decode(mm[start:size if end == -1 else end]).strip()
+
+
+def _traceback_at(mm, offset: int, size: int) -> str:
+    """Decode a traceback block starting at offset: header, indented frames, exception line."""
+    text = _decode(mm[offset:min(size, offset + TRACEBACK_BLOCK_MAX)])
+    lines = text.splitlines()
+    block = lines[:1]
+    for line in lines[1:]:
+        block.append(line)
+        if line.strip() and not line[:1].isspace():
+            break  # first non-indented line = exception message
+    return "\n".join(block).strip()
+
+
+def _middle_error(mm, size: int, lo: int, tb: int, kw: int) -> str:
+    """
+    Error of the middle of a file from the last 'Traceback' (tb) and the last keyword (kw)
+    offsets at or after lo (-1: none), or None. The traceback block wins when the keyword
+    is before it or inside it (its exception line). Only the last hit matters, so a scan
+    may stop at the first window (or range, from the end) that has one.
+    """
+    if tb == -1 and kw != -1:
+        # the keyword may be the exception line of a traceback that started in an earlier window
+        tb = mm.rfind(b"Traceback", max(lo, kw - TRACEBACK_BLOCK_MAX), kw)
+    if tb != -1:
+        block = _traceback_at(mm, tb, size)
+        if kw < tb + min(len(block.encode("utf-8")), TRACEBACK_BLOCK_MAX):
+            return block
+    if kw != -1:
+        return _line_at(mm, kw, size)
+    return None
+
+
+def _file_windows(mm, size: int) -> tuple[list[str], list[str], int, int, list[str], list[str]]:
+    """
+    Head and tail windows of a mapped file as extract_error_from_text would see them
+    (first / last line stripped like text.strip(); lines[:HEAD_LINES] and
+    lines[-TAIL_LINES:]). Also returns the offset where the head window ends and the
+    tail window starts (tail_start <= head_end: whole file), and the lines read with
+    the windows but outside them, in file order: one "\n" line can hold many "\r"
+    separated lines (progress bars), so the windows may be read past their size.
+    """
+    head, head_end = _head_window(mm, size)
+    tail, tail_start = _tail_window(mm, size, head_end)
+    lines = head + tail
+    if not lines:
+        return [], [], head_end, tail_start, [], []
+    lines[0] = lines[0].lstrip()
+    lines[-1] = lines[-1].rstrip()
+    if tail_start <= head_end:
+        # whole file: the lines between the two windows (none in a short file)
+        return lines[:HEAD_LINES], lines[-TAIL_LINES:], head_end, tail_start, lines[HEAD_LINES:-TAIL_LINES], []
+    head, tail = lines[:len(head)], lines[len(head):]
+    return head[:HEAD_LINES], tail[-TAIL_LINES:], head_end, tail_start, head[HEAD_LINES:], tail[:-TAIL_LINES]
+
+
+def extract_error_from_file(path: str, middle_scan=None) -> str:
+    """
+    (File Mode)
+    Analyze a log file without reading all of it: the file is memory-mapped,
+    only the head (HEAD_LINES) and tail (TAIL_LINES) windows are decoded, and
+    the middle is scanned backwards from EOF with bytes searches.
+    - A traceback in the head/tail windows is reported as in extract_error_from_text.
+    - Otherwise the *last* error keyword line (or traceback) is reported,
+      since in a long log that is where the real error usually is.
+    middle_scan(mm, lo, hi) -> (traceback offset, keyword offset) scans the middle
+    (default _reverse_scan; parallel.scan_file_parallel uses a process pool).
+    """
+    import mmap
+
+    middle_scan = middle_scan or _reverse_scan
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return "[No output received]"
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            head, tail, head_end, tail_start, head_rest, tail_rest = _file_windows(mm, size)
+            whole_file = tail_start <= head_end
+            if not head and not tail:
+                return "[No output received]"
+
+            scope = "\n".join(head + tail)
+
+            # (1) Python Traceback in the windows
+            if "Traceback" in scope:
+                return _match_traceback(scope)
+
+            # (2) last error keyword line: tail window, then the middle (backwards), then head;
+            #     the lines read past a window belong to the middle
+            engine = get_cascade_engine()
+            index = engine.last_line(tail)
+            if index != -1:
+                return tail[index].strip()
+            index = engine.last_line(tail_rest)
+            if index != -1:
+                return tail_rest[index].strip()
+            if not whole_file:
+                tb, kw = middle_scan(mm, head_end, tail_start)
+                error = _middle_error(mm, size, head_end, tb, kw)
+                if error is not None:
+                    return error
+            index = engine.last_line(head_rest)
+            if index != -1:
+                return head_rest[index].strip()
+            index = engine.last_line(head)
+            if index != -1:
+                return head[index].strip()
+
+            # (4) Short output
+            if whole_file and len(head) <= 5:  # head = all lines of a small file
+                short = _match_short_output(head)
+                if short:
+                    return short
+
+    # (5) success
+    return "[No error detected] Command executed successfully."
+
+
+# ---------- Multi-error mode (every distinct error event, ranked) ----------
+TOP_K = 5                    # events sent to the LLM in one prompt
+MAX_EVENT_CLUSTERS = 1000    # distinct events kept while scanning
+EVENT_MAX_LINES = 200        # lines kept per traceback (header + the innermost lines)
+
+TRACEBACK_HEADER = "Traceback (most recent call last)"
+# separators printed between chained exceptions
+CHAIN_SEPARATORS = (
+    "During handling of the above exception, another exception occurred:",
+    "The above exception was the direct cause of the following exception:",
+)
+# Keyword hits that are not errors: '0 errors', 'no errors', 'failed: 0', ...
+BENIGN_PATTERN = re.compile(
+    r"(?<![\d.])0 (?:errors?|failures?|failed)\b|\bno errors?\b|\b(?:errors?|failures?|failed)[=:] ?0(?![\d.])",
+    re.IGNORECASE,
+)
+# Numbers do not make two occurrences of an event different (step 12 / step 13)
+_EVENT_NUMBERS = re.compile(r"\d+")
+
+
+class ErrorEvent:
+    __slots__ = ("key", "rule", "severity", "text", "count", "first_line", "last_line")
+
+    def __init__(self, key: str, rule: str, severity: int, text: str, line_no: int):
+        self.key = key
+        self.rule = rule
+        self.severity = severity
+        self.text = text              # first occurrence
+        self.count = 1
+        self.first_line = line_no     # 1-based line numbers in the log
+        self.last_line = line_no
+
+    def to_dict(self) -> dict:
+        return {
+            "fingerprint": fingerprint(self.key)[:16],
+            "rule": self.rule,
+            "severity": self.severity,
+            "count": self.count,
+            "first_line": self.first_line,
+            "last_line": self.last_line,
+            "text": self.text,
+        }
+
+
+class MultiErrorExtractor:
+    """
+    (Multi-Error Mode)
+    Collect every distinct error event of a log in one streaming pass: tracebacks
+    (chained ones as one event) and lines matched by the rule engine. Repeats are
+    clustered by fingerprint (paths, line numbers, addresses and numbers ignored)
+    with a count and first/last line. finish() ranks events by severity, then recency.
+    Memory is bounded by MAX_EVENT_CLUSTERS events and one open traceback.
+    """
+
+    def __init__(self, max_clusters: int = MAX_EVENT_CLUSTERS):
+        self.engine = get_engine()
+        self.max_clusters = max_clusters
+        self.events = {}
+        self.line_count = 0
+        self._partial = ""
+        self._tb = None           # traceback being collected: [header lines], deque of the rest
+        self._tb_tail = None
+        self._tb_total = 0
+        self._tb_start = 0
+        self._tb_state = None     # "frames" | "after" | "chain"
+
+    def feed(self, chunk: str):
+        if not chunk:
+            return
+        lines, self._partial = _split_chunk(self._partial, chunk)
+        self._add_lines(lines)
+
+    def feed_lines(self, lines: list[str]):
+        """Feed complete lines (no line breaks), e.g. one line-aligned range of a file."""
+        self._add_lines(lines)
+
+    def _add_lines(self, lines: list[str]):
+        i, n = 0, len(lines)
+        while i < n:
+            if self._tb is not None:
+                i = self._continue_traceback(lines, i)
+                continue
+            j = self._next_traceback(lines, i)
+            for index, rule in self.engine.scan(lines[i:j]):
+                line = lines[i + index].strip()
+                if not BENIGN_PATTERN.search(line):
+                    self._add_event(rule.name, rule.severity, line, self.line_count + i + index + 1)
+            if j < n:
+                self._tb = [lines[j].strip()]
+                self._tb_tail = deque(maxlen=EVENT_MAX_LINES)
+                self._tb_total = 1
+                self._tb_start = self.line_count + j + 1
+                self._tb_state = "frames"
+            i = j + 1
+        self.line_count += n
+
+    @staticmethod
+    def _next_traceback(lines: list[str], i: int) -> int:
+        """Index of the next traceback header at or after i (len(lines) if none)."""
+        block = "\n".join(lines[i:])
+        pos = block.find(TRACEBACK_HEADER)
+        if pos == -1:
+            return len(lines)
+        return i + block.count("\n", 0, pos)
+
+    def _continue_traceback(self, lines: list[str], i: int) -> int:
+        """Consume traceback lines from i on; returns the index of the first line not consumed."""
+        while i < len(lines):
+            line = lines[i]
+            if not line.strip():
+                i += 1
+                continue
+            if self._tb_state == "frames":
+                self._tb_line(line)
+                if not line[:1].isspace():
+                    self._tb_state = "after"   # first non-indented line = exception message
+            elif self._tb_state == "after" and line.strip() in CHAIN_SEPARATORS:
+                self._tb_line(line)
+                self._tb_state = "chain"
+            elif self._tb_state == "chain" and TRACEBACK_HEADER in line:
+                self._tb_line(line)
+                self._tb_state = "frames"
+            else:
+                self._close_traceback()
+                return i
+            i += 1
+        return i
+
+    def _tb_line(self, line: str):
+        self._tb_tail.append(line.rstrip())
+        self._tb_total += 1
+
+    def _close_traceback(self):
+        omitted = self._tb_total - 1 - len(self._tb_tail)
+        marker = [f"  [... {omitted} lines omitted ...]"] if omitted > 0 else []
+        text = "\n".join(self._tb + marker + list(self._tb_tail))
+        self._add_event("python.traceback", 5, text, self._tb_start)
+        self._tb = self._tb_tail = self._tb_state = None
+
+    def _add_event(self, rule: str, severity: int, text: str, line_no: int):
+        key = _EVENT_NUMBERS.sub("#", normalize_snippet(text))
+        event = self.events.get(key)
+        if event is not None:
+            event.count += 1
+            event.last_line = line_no
+            return
+        self.merge_event(ErrorEvent(key, rule, severity, text, line_no))
+
+    def merge_event(self, event: ErrorEvent):
+        """Add an event (or a cluster found by another extractor over later lines)."""
+        existing = self.events.get(event.key)
+        if existing is not None:
+            existing.count += event.count
+            existing.last_line = event.last_line
+            return
+        if len(self.events) >= self.max_clusters:
+            # full: evict the least important event (lowest severity, oldest)
+            weakest = min(self.events.values(), key=lambda e: (e.severity, e.last_line))
+            if (weakest.severity, weakest.last_line) > (event.severity, event.last_line):
+                return
+            del self.events[weakest.key]
+        self.events[event.key] = event
+
+    def open_traceback(self):
+        """Picklable state of an unfinished traceback (None if there is none)."""
+        if self._tb is None:
+            return None
+        return self._tb, list(self._tb_tail), self._tb_total, self._tb_start, self._tb_state
+
+    def resume_traceback(self, state, line_shift: int = 0):
+        """Continue a traceback left open by open_traceback() of another extractor."""
+        tb, tail, total, start, tb_state = state
+        self._tb, self._tb_total, self._tb_start, self._tb_state = tb, total, start + line_shift, tb_state
+        self._tb_tail = deque(tail, maxlen=EVENT_MAX_LINES)
+
+    @staticmethod
+    def continuation_end(lines: list[str]) -> int:
+        """
+        How many leading lines could still belong to a traceback left open before
+        them (the most any open state would consume). Scanning from there on
+        does not depend on what came before.
+        """
+        end = 0
+        for state in ("frames", "after", "chain"):
+            probe = MultiErrorExtractor()
+            probe.resume_traceback(([""], [], 1, 0, state))
+            end = max(end, probe._continue_traceback(lines, 0))
+        return end
+
+    @property
+    def pending(self) -> bool:
+        """True when events (or an unfinished traceback) are waiting to be drained."""
+        return bool(self.events) or self._tb is not None
+
+    def drain(self, top_k: int = None) -> list[ErrorEvent]:
+        """
+        Ranked events seen so far; they are removed, the extractor keeps going
+        (line numbers continue). An unfinished traceback is closed first.
+        """
+        if self._tb is not None:
+            self._close_traceback()
+        ranked = sorted(self.events.values(), key=lambda e: (e.severity, e.last_line), reverse=True)
+        self.events = {}
+        return ranked[:top_k] if top_k else ranked
+
+    def flush(self):
+        """End of the input, events kept: scan the unterminated last line and close an open traceback."""
+        if self._partial:
+            self._add_lines([self._partial])
+            self._partial = ""
+        if self._tb is not None:
+            self._close_traceback()
+
+    def finish(self, top_k: int = None) -> list[ErrorEvent]:
+        self.flush()
+        return self.drain(top_k)
+
+
+def extract_error_events(chunks, top_k: int = TOP_K) -> list[ErrorEvent]:
+    """Ranked, deduplicated error events of a text or an iterable of chunks (a file, sys.stdin)."""
+    if isinstance(chunks, str):
+        chunks = [chunks]
+    extractor = MultiErrorExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+    return extractor.finish(top_k)
@@ -0,0 +1,140 @@
+# logwise/flight.py
+import threading
+
+
+class CancelToken:
+    """
+    Cancellation handle for a running analysis.
+    cancel() may be called from any thread (WebUI rerun, Ctrl-C handler, asyncio task);
+    registered callbacks run once, e.g. to close the Ollama HTTP stream.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception:
+                pass
+
+    def on_cancel(self, cb):
+        """Run cb when cancelled (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+                return
+        cb()
+
+
+class _Flight:
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.cond = threading.Condition()
+        self.cancel = CancelToken()
+
+
+class SingleFlight:
+    """
+    Merge identical concurrent generations.
+    The first caller for a key starts one background generation; every caller
+    (including later ones, which get the tokens produced so far replayed)
+    iterates the same token stream. When the last subscriber leaves, the
+    generation is cancelled so the model stops working for nobody.
+    """
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def stream(self, key: str, gen_factory, on_complete=None, cancel: CancelToken = None):
+        """
+        Yield tokens for key.
+        gen_factory(cancel_token) -> token iterator, only called by the leader.
+        on_complete(full_text) runs once when the generation finishes normally.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight()
+                self._flights[key] = flight
+                thread = threading.Thread(
+                    target=self._generate, args=(key, flight, gen_factory, on_complete), daemon=True
+                )
+                thread.start()
+            with flight.cond:
+                flight.subscribers += 1
+
+        try:
+            yield from self._subscribe(flight, cancel)
+        finally:
+            self._leave(key, flight)
+
+    def _generate(self, key, flight, gen_factory, on_complete):
+        try:
+            for token in gen_factory(flight.cancel):
+                with flight.cond:
+                    flight.tokens.append(token)
+                    flight.cond.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+        if flight.error is None and not flight.cancel.cancelled and on_complete:
+            on_complete("".join(flight.tokens))
+
+    def _subscribe(self, flight, cancel):
+        pos = 0
+        while True:
+            with flight.cond:
+                while (pos >= len(flight.tokens) and not flight.done
+                       and not (cancel is not None and cancel.cancelled)):
+                    flight.cond.wait(self.POLL_INTERVAL)
+                if cancel is not None and cancel.cancelled:
+                    return
+                batch = flight.tokens[pos:]
+                pos = len(flight.tokens)
+                finished = flight.done
+            yield from batch
+            if finished and pos >= len(flight.tokens):
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+    def _leave(self, key, flight):
+        with self._lock:
+            with flight.cond:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.done
+            if abandoned and self._flights.get(key) is flight:
+                # nobody is listening anymore: the next caller starts a fresh generation
+                del self._flights[key]
+        if abandoned:
+            flight.cancel.cancel()
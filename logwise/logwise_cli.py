@@ -1,19 +1,48 @@
 # logwise_cli.py
 # -*- coding: utf-8 -*-
+import os
 import sys
 import select
-from .core import run_command, analyze_text, analyze_with_code
+
+import requests
+
+from . import metrics
+from .core import (
+    run_command_job, submit_job, attach_job, list_jobs, cancel_job, analyze_stream, analyze_file, analyze_events, analyze_error_events, analyze_with_code,
+    warm_up_in_background, CancelToken, TOP_K,
+)
+from .error_extractor import format_resources
+from .parallel import extract_error_events_parallel
+
+PIPE_CHUNK_SIZE = 1024 * 1024
 
 
 def print_help():
     print("""
 Usage:
-  python -m logwise run "<command>"   # Execute commands and analyze results
+  python -m logwise run "<command>"   # Execute commands and analyze results (Ctrl-C interrupts it)
+  python -m logwise run --detach "<command>"  # Only queue it on the runner, print the job id
+  python -m logwise job <id>          # Follow a runner job (output, then analysis)
+  python -m logwise jobs              # List the runner's jobs
+  python -m logwise cancel <id>       # Interrupt a runner job (Ctrl-C, then SIGKILL)
   cat file.log | python -m logwise    # Input the log pipeline to logwise
+  python -m logwise file <path>       # Analyze a (huge) log file from its end
+  python -m logwise file <path> -j N  # Scan the file with N processes (last error, like file mode)
+  python -m logwise batch <dir|glob>  # Analyze many log files, JSON Lines output
+  python -m logwise watch <file...>   # Follow growing log files, analyze new errors as they appear
+
+Options:
+  --no-cache                          # Skip the analysis cache and ask the LLM again
+  --metrics-json <file>               # Write per-stage latency histograms as JSON on exit
+  --top <K>                           # Pipe / file mode: analyze the K most severe distinct errors
+                                      # (deduplicated, ranked) instead of only the first one
 
 Example:
   python -m logwise run "ls /no_such_dir"
   python train.py 2>&1 | python -m logwise
+  python -m logwise batch "logs/**/*.log" -c 4 -o results.jsonl
+  python -m logwise file train.log --top 5
+  python -m logwise watch logs/train.log logs/eval.log -d 5
 """)
 
 def has_pipe_input() -> bool:
@@ -28,31 +57,222 @@ def has_pipe_input() -> bool:
         return False
 
 
+def run_analysis(analyze, *args, **kwargs):
+    """Run an analysis; Ctrl-C cancels the Ollama generation instead of leaving it running."""
+    cancel = CancelToken()
+    try:
+        analyze(*args, cancel=cancel, **kwargs)
+        print("\n\n[Done]")
+    except KeyboardInterrupt:
+        cancel.cancel()
+        print("\n\n[Cancelled]")
+
+
+def interrupt_job(job_id: str):
+    """Ctrl-C during `run`: cancel the command on the runner, which frees its shell at once."""
+    print("\n\n[Cancelling] Interrupting the command on the runner...")
+    try:
+        info = cancel_job(job_id)
+    except KeyboardInterrupt:
+        print(f"[Detached] The command keeps running on the runner: python -m logwise job {job_id}")
+        return
+    except Exception as e:
+        print(f"[Cancel failed] {e}. Follow it with: python -m logwise job {job_id}")
+        return
+    if info["cancelled"]:
+        print(f"[Cancelled] Command stopped ({info['signal']}), the runner shell is free again.")
+    else:
+        print("[Cancelled] The command had already finished.")
+
+
+def analyze_result(result, bypass_cache: bool):
+    """Print the runner's resource accounting of a finished command, then analyze it."""
+    exit_code, out, err, _ = result
+    usage = format_resources(result.resources)
+    if usage:
+        print(f"\n{usage}")
+    print("[Logwise] Analyzing...\n")
+    run_analysis(analyze_with_code, exit_code, out, err, bypass_cache=bypass_cache,
+                 resources=result.resources)  # core.analyze_with_code
+
+
+def runner_error(e: Exception, job_id: str = None) -> str:
+    """Message of a failed Runner request (cancel / jobs / run --detach), worded like run's."""
+    if isinstance(e, requests.exceptions.ConnectionError):
+        return ("[Logwise ERROR] cannot connect to  Runner Agent (C terminal).\n"
+                "please ensure your 'C terminal' already start runner.py")
+    response = getattr(e, "response", None)
+    if job_id and response is not None and response.status_code == 404:
+        return f"[Logwise ERROR] Runner job '{job_id}' not found (expired or runner restarted)."
+    return f"[Logwise CORE ERROR] Runner request failed: {e}"
+
+
+def flags_end(argv: list[str]) -> int:
+    """
+    End of the arguments searched for global flags. The command line of `run` is
+    passed through as it is, so with `run` only the flags before it count.
+    """
+    i = 1
+    while i < len(argv):
+        if argv[i] == "run":
+            return i
+        if argv[i] == "--metrics-json":
+            i += 2
+        elif argv[i] == "--top":
+            i += 2 if i + 1 < len(argv) and argv[i + 1].isdigit() else 1
+        elif argv[i].startswith("-"):
+            i += 1
+        else:
+            break   # another mode: its flags may follow (file train.log --top 5)
+    return len(argv)
+
+
 def main():
+    # Global flags
+    bypass_cache = "--no-cache" in sys.argv[:flags_end(sys.argv)]
+    if bypass_cache:
+        sys.argv.remove("--no-cache")
+
+    metrics_json = None
+    if "--metrics-json" in sys.argv[:flags_end(sys.argv)]:
+        i = sys.argv.index("--metrics-json")
+        metrics_json = sys.argv[i + 1] if i + 1 < len(sys.argv) else "logwise_metrics.json"
+        del sys.argv[i:i + 2]
+        metrics.enable()
+
+    top_k = None
+    if "--top" in sys.argv[:flags_end(sys.argv)]:
+        i = sys.argv.index("--top")
+        has_value = i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit()
+        top_k = int(sys.argv[i + 1]) if has_value else TOP_K
+        del sys.argv[i:i + 2 if has_value else i + 1]
+
+    try:
+        dispatch(bypass_cache, top_k)
+    finally:
+        if metrics_json:
+            metrics.dump_json(metrics_json)
+
+
+def dispatch(bypass_cache: bool, top_k: int = None):
     # Case 1: run 
     if len(sys.argv) > 1 and sys.argv[1] == "run":
+        # only right after `run`: the command itself may have a --detach option
+        detach = sys.argv[2:3] == ["--detach"]
+        if detach:
+            del sys.argv[2]
         cmd = " ".join(sys.argv[2:])
+        if detach:
+            try:
+                job_id = submit_job(cmd)
+            except Exception as e:
+                print(runner_error(e))
+                return
+            print(f"[Run] Job {job_id} queued. Follow it with: python -m logwise job {job_id}")
+            return
+        warm_up_in_background()  # load the model while the command runs
         print(f"\n[Run] Executing command: {cmd}\n")
         
-        exit_code, out, err, _ = run_command(cmd)          # core.run_command
-        if out:
-            print(out, end="")
-        if err:
-            print(err, end="")
+        # runner job: output is printed as it arrives (core.run_command_job)
+        job = []
+        try:
+            result = run_command_job(cmd, on_submit=job.append)
+        except KeyboardInterrupt:
+            if job:
+                interrupt_job(job[0])
+            return
             
-        print("[Logwise] Analyzing...\n")
-        analyze_with_code(exit_code, out, err)              # core.analyze_text
-        print("\n\n[Done]")
+        analyze_result(result, bypass_cache)
         return
 
-    # Case 2: pipe (echo ... | python -m logwise)
+    # Case 1b: job (follow a runner job) / jobs (list them)
+    if len(sys.argv) > 2 and sys.argv[1] == "job":
+        warm_up_in_background()
+        job_id = sys.argv[2]
+        print(f"\n[Job] Following job: {job_id}\n")
+        try:
+            result = attach_job(job_id)
+        except KeyboardInterrupt:
+            print(f"\n\n[Detached] python -m logwise job {job_id}")
+            return
+        analyze_result(result, bypass_cache)
+        return
+    if len(sys.argv) > 2 and sys.argv[1] == "cancel":
+        try:
+            info = cancel_job(sys.argv[2])
+        except requests.exceptions.RequestException as e:
+            print(runner_error(e, sys.argv[2]))
+            return
+        state = f"stopped ({info['signal']})" if info["cancelled"] else "not running"
+        print(f"[Cancel] Job {info['job_id']} {state}")
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "jobs":
+        try:
+            jobs = list_jobs()
+        except requests.exceptions.RequestException as e:
+            print(runner_error(e))
+            return
+        for job in jobs:
+            code = "" if job["exit_code"] is None else f" (exit {job['exit_code']})"
+            print(f"{job['job_id']}  {job['status']:<8}{code}  [{job['session']}] {job['command']}")
+        return
+
+    # Case 2: file (memory-mapped, scanned from the end)
+    if len(sys.argv) > 1 and sys.argv[1] == "file":
+        workers = None
+        for flag in ("-j", "--jobs"):
+            if flag in sys.argv[2:]:
+                # -j N, or -j alone (any non-number after it): one process per CPU
+                i = sys.argv.index(flag, 2)
+                has_value = i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit()
+                workers = int(sys.argv[i + 1]) if has_value else os.cpu_count()
+                del sys.argv[i:i + 2 if has_value else i + 1]
+        if len(sys.argv) < 3:
+            print_help()
+            return
+        warm_up_in_background()
+        path = sys.argv[2]
+        print(f"\n[File] Analyzing: {path}\n")
+        try:
+            if top_k and workers:
+                # every error of the file, ranges scanned in a process pool
+                events = extract_error_events_parallel(path, top_k, workers=workers)
+                run_analysis(analyze_error_events, events, bypass_cache=bypass_cache)
+            elif top_k:
+                # every error of the file, in one streaming pass
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    chunks = iter(lambda: f.read(PIPE_CHUNK_SIZE), "")
+                    run_analysis(analyze_events, chunks, top_k=top_k, bypass_cache=bypass_cache)
+            else:
+                run_analysis(analyze_file, path, bypass_cache=bypass_cache, workers=workers)
+        except OSError as e:
+            print(f"[Logwise ERROR] cannot read '{path}': {e}")
+        return
+
+    # Case 3: batch (many log files)
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from .batch import main as batch_main
+        warm_up_in_background()
+        sys.exit(batch_main(sys.argv[2:], bypass_cache=bypass_cache))
+
+    # Case 4: watch (follow growing log files)
+    if len(sys.argv) > 1 and sys.argv[1] == "watch":
+        from .watch import main as watch_main
+        warm_up_in_background()
+        sys.exit(watch_main(sys.argv[2:], top_k=top_k, bypass_cache=bypass_cache))
+
+    # Case 5: pipe (echo ... | python -m logwise)
     if has_pipe_input():
-        text = sys.stdin.read()
-        analyze_text(text)        
-        print("\n\n[Done]")
+        warm_up_in_background()  # load the model while stdin is read
+        # read stdin in chunks: memory stays flat even for multi-GB logs
+        chunks = iter(lambda: sys.stdin.read(PIPE_CHUNK_SIZE), "")
+        if top_k:
+            run_analysis(analyze_events, chunks, top_k=top_k, bypass_cache=bypass_cache)
+        else:
+            run_analysis(analyze_stream, chunks, bypass_cache=bypass_cache)
         return
 
-    # Case 3: show description
+    # Case 6: show description
     print_help()
 
 if __name__ == "__main__":
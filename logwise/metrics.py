@@ -0,0 +1,159 @@
+# logwise/metrics.py
+import bisect
+import json
+import os
+import threading
+import time
+
+# Off by default: timer()/observe() return immediately unless enabled
+# (LOGWISE_METRICS=1, or enable() from the CLI --metrics-json flag).
+_enabled = os.environ.get("LOGWISE_METRICS", "") not in ("", "0")
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+SIZE_BUCKETS = (1024, 16 * 1024, 256 * 1024, 1024 ** 2, 16 * 1024 ** 2, 256 * 1024 ** 2, 1024 ** 3)
+COUNT_BUCKETS = (1, 8, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+class Histogram:
+    """Prometheus-style histogram: cumulative buckets, sum and count."""
+
+    def __init__(self, name: str, help_text: str, buckets=TIME_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "avg": self.sum / self.count if self.count else None,
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+            }
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+# (help text, buckets) of every known metric
+METRICS = {
+    # core (CLI / WebUI side)
+    "logwise_run_command_seconds": ("Round trip of core.run_command to the Runner Agent", TIME_BUCKETS),
+    "logwise_extract_text_seconds": ("extract_error_from_text time", TIME_BUCKETS),
+    "logwise_extract_with_code_seconds": ("extract_error_with_code time", TIME_BUCKETS),
+    "logwise_extract_file_seconds": ("extract_error_from_file time", TIME_BUCKETS),
+    "logwise_extract_events_seconds": ("extract_error_events time (multi-error mode)", TIME_BUCKETS),
+    "logwise_prompt_compact_seconds": ("Snippet compaction time", TIME_BUCKETS),
+    "logwise_prompt_build_seconds": ("Prompt construction time", TIME_BUCKETS),
+    "logwise_llm_ttft_seconds": ("Ollama time to first token", TIME_BUCKETS),
+    "logwise_llm_total_seconds": ("Ollama total stream time", TIME_BUCKETS),
+    "logwise_llm_tokens": ("Tokens streamed per Ollama response", COUNT_BUCKETS),
+    # runner
+    "logwise_runner_lock_wait_seconds": ("Time /run waited for the shell lock", TIME_BUCKETS),
+    "logwise_runner_exec_seconds": ("Command execution time in the pexpect shell", TIME_BUCKETS),
+    "logwise_runner_buffer_bytes": ("Raw output buffer size per command", SIZE_BUCKETS),
+    "logwise_runner_ansi_cleanup_seconds": ("ANSI escape cleanup time", TIME_BUCKETS),
+    "logwise_runner_shell_recovery_seconds": ("Time to replace a dead or desynced shell", TIME_BUCKETS),
+}
+
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = on
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def histogram(name: str) -> Histogram:
+    h = _registry.get(name)
+    if h is None:
+        with _registry_lock:
+            h = _registry.get(name)
+            if h is None:
+                help_text, buckets = METRICS.get(name, (name, TIME_BUCKETS))
+                h = _registry[name] = Histogram(name, help_text, buckets)
+    return h
+
+
+def observe(name: str, value: float):
+    if _enabled:
+        histogram(name).observe(value)
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        histogram(self.name).observe(time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str):
+    """with timer("logwise_..._seconds"): ... -- no-op when metrics are disabled."""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def render_prometheus() -> str:
+    """All observed metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        hists = [_registry[k] for k in sorted(_registry)]
+    lines = []
+    for h in hists:
+        lines.extend(h.render())
+    return "\n".join(lines) + "\n"
+
+
+def to_dict() -> dict:
+    with _registry_lock:
+        hists = [_registry[k] for k in sorted(_registry)]
+    return {h.name: h.to_dict() for h in hists}
+
+
+def dump_json(path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_dict(), f, indent=2)
@@ -0,0 +1,135 @@
+# logwise/parallel.py
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .error_extractor import MultiErrorExtractor, extract_error_from_file, MAX_EVENT_CLUSTERS, TOP_K
+from .rules import get_cascade_engine
+
+CHUNK_SIZE = 32 * 1024 ** 2   # bytes per range scanned by one worker task
+
+
+def line_ranges(path: str, chunk_size: int = CHUNK_SIZE) -> list[tuple[int, int]]:
+    """Split a file into [start, end) byte ranges of ~chunk_size that end right after a newline."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    ranges, start = [], 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        while start < size:
+            end = start + chunk_size
+            if end < size:
+                nl = mm.find(b"\n", end - 1)
+                end = size if nl == -1 else nl + 1
+            else:
+                end = size
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _read_lines(path: str, start: int, end: int) -> list[str]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # ranges end after b"\n", so no UTF-8 sequence or line is cut in two
+    return data.decode("utf-8", errors="replace").splitlines()
+
+
+def _last_hits_range(args):
+    """(last 'Traceback' offset, last error keyword offset) in one range, -1 for none; None if it has neither."""
+    path, start, end = args
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    tb = data.rfind(b"Traceback")
+    kw = get_cascade_engine().last_offset_bytes(data)
+    if tb == -1 and kw == -1:
+        return None
+    return (start + tb if tb != -1 else -1), (start + kw if kw != -1 else -1)
+
+
+def _events_range(args):
+    """
+    Events of one range. The leading lines that could continue a traceback from
+    the previous range are left to the merge step (it knows whether one is open).
+    """
+    path, start, end, max_clusters = args
+    lines = _read_lines(path, start, end)
+    skip = MultiErrorExtractor.continuation_end(lines)
+    extractor = MultiErrorExtractor(max_clusters)
+    extractor.line_count = skip           # line numbers relative to the range start
+    extractor.feed_lines(lines[skip:])
+    return skip, len(lines), list(extractor.events.values()), extractor.open_traceback()
+
+
+def _map(func, tasks: list, workers: int):
+    """Results of func over tasks, in task order (serial for a single task)."""
+    if len(tasks) <= 1 or workers == 1:
+        return map(func, tasks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, tasks))
+
+
+def _first_result(func, tasks: list, workers: int):
+    """First non-None result of func over tasks in task order; later tasks are cancelled once it is known."""
+    if len(tasks) <= 1 or workers == 1:
+        return next((r for r in map(func, tasks) if r is not None), None)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(func, task) for task in tasks]
+        for future in futures:
+            result = future.result()
+            if result is not None:
+                return result
+        return None
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def scan_file_parallel(path: str, workers: int = None, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    (Parallel File Mode)
+    extract_error_from_file() with the middle of the file (between the head and
+    tail windows) scanned in line-aligned ranges in a process pool. Ranges are
+    taken from the end and the rest is cancelled at the first one with a
+    traceback or keyword, so the result is identical to the serial file mode
+    (the last error).
+    """
+    def middle_scan(mm, lo: int, hi: int) -> tuple[int, int]:
+        ranges = [(max(s, lo), min(e, hi)) for s, e in line_ranges(path, chunk_size) if s < hi and e > lo]
+        tasks = [(path, s, e) for s, e in reversed(ranges)]
+        return _first_result(_last_hits_range, tasks, workers) or (-1, -1)
+
+    return extract_error_from_file(path, middle_scan)
+
+
+def extract_error_events_parallel(path: str, top_k: int = TOP_K, workers: int = None,
+                                  chunk_size: int = CHUNK_SIZE, max_clusters: int = MAX_EVENT_CLUSTERS) -> list:
+    """
+    (Parallel Multi-Error Mode)
+    extract_error_events() over a whole file, with the line ranges scanned in a
+    process pool. Tracebacks crossing a range boundary are stitched: the lines a
+    range skipped are fed to the merged extractor, which still holds the open
+    traceback of the previous range. Same result as the serial scan as long as
+    there are at most max_clusters distinct events.
+    """
+    ranges = line_ranges(path, chunk_size)
+    tasks = [(path, s, e, max_clusters) for s, e in ranges]
+    merged = MultiErrorExtractor(max_clusters)
+    for (start, end), (skip, count, events, open_tb) in zip(ranges, _map(_events_range, tasks, workers)):
+        offset = merged.line_count
+        lines = _read_lines(path, start, end) if skip else None
+        merged.feed_lines(lines[:skip] if skip else [])
+        if merged.open_traceback() is not None:
+            # rare: a traceback started in the skipped lines goes on; scan the range serially
+            merged.feed_lines((lines or _read_lines(path, start, end))[skip:])
+            continue
+        for event in events:
+            event.first_line += offset
+            event.last_line += offset
+            merged.merge_event(event)
+        merged.line_count = offset + count
+        if open_tb is not None:
+            merged.resume_traceback(open_tb, line_shift=offset)
+    return merged.finish(top_k)
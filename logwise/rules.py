@@ -0,0 +1,259 @@
+# logwise/rules.py
+import json
+import os
+import re
+
+# Lines joined into one block per regex pass (bounds the lower-cased copy)
+SCAN_LINES = 4096
+
+# Sets of the original pipe-mode keyword list. The single-error extractors (pipe, stream,
+# file, parallel) detect with these only, so their answers do not change; the other sets
+# classify and rank events (match_rule, --top). Sets of a LOGWISE_RULES file are added to both.
+CASCADE_RULE_SETS = ["generic", "locale.zh_TW"]
+
+# Built-in rule sets: set name -> [(rule name, severity 1-5, keywords)]
+# Keywords are literal, case-insensitive substrings of a single line.
+DEFAULT_RULE_SETS = {
+    # keywords of the original extract_error_from_text cascade
+    "generic": [
+        ("generic.error", 2, ["error", "exception", "fail", "invalid"]),
+        ("generic.not_found", 2, ["not found", "no such file"]),
+        ("generic.denied", 2, ["denied"]),
+        ("generic.crash", 4, ["segmentation fault", "killed"]),
+        ("generic.oom", 4, ["oom"]),
+        ("generic.cuda", 3, ["cuda"]),
+        ("generic.nan", 2, ["nan"]),
+    ],
+    "locale.zh_TW": [
+        ("locale.zh_TW.error", 2, ["錯誤", "例外", "失敗", "無效"]),
+        ("locale.zh_TW.not_found", 2, ["找不到", "沒有此一檔案或目錄"]),
+        ("locale.zh_TW.denied", 2, ["無法存取", "拒絕"]),
+    ],
+    "locale.zh_CN": [
+        ("locale.zh_CN.error", 2, ["错误", "异常", "失败", "无效"]),
+        ("locale.zh_CN.not_found", 2, ["没有那个文件或目录", "找不到"]),
+        ("locale.zh_CN.denied", 2, ["无法访问", "权限不够"]),
+    ],
+    "locale.ja": [
+        ("locale.ja.error", 2, ["エラー", "例外", "失敗"]),
+        ("locale.ja.not_found", 2, ["そのようなファイルやディレクトリはありません", "見つかりません"]),
+        ("locale.ja.denied", 2, ["許可がありません"]),
+    ],
+    "python": [
+        ("python.traceback", 5, ["traceback (most recent call last)"]),
+        ("python.import", 4, ["modulenotfounderror", "importerror"]),
+        ("python.syntax", 4, ["syntaxerror", "indentationerror", "taberror"]),
+        ("python.recursion", 4, ["recursionerror"]),
+        ("python.memory", 5, ["memoryerror"]),
+        ("python.exception", 3, [
+            "nameerror", "typeerror", "valueerror", "keyerror", "indexerror", "attributeerror",
+            "zerodivisionerror", "assertionerror", "runtimeerror", "filenotfounderror",
+            "permissionerror", "oserror", "notimplementederror",
+        ]),
+    ],
+    "cuda": [
+        ("cuda.oom", 5, ["cuda out of memory", "cuda_error_out_of_memory", "cudnn_status_alloc_failed"]),
+        ("cuda.error", 4, ["cuda error", "device-side assert", "cudnn_status_", "cublas_status_",
+                           "nccl error", "illegal memory access"]),
+    ],
+    "shell": [
+        ("shell.not_found", 3, ["command not found"]),
+        ("shell.permission", 3, ["permission denied", "operation not permitted"]),
+        ("shell.no_file", 3, ["no such file or directory", "cannot access", "is a directory"]),
+        ("shell.syntax", 3, ["syntax error near unexpected token"]),
+        ("shell.core_dump", 4, ["core dumped", "bus error"]),
+    ],
+    "oom_killer": [
+        ("oom_killer.kill", 5, ["out of memory: killed process", "oom-killer", "oom_reaper",
+                                "memory cgroup out of memory"]),
+    ],
+    "pip": [
+        ("pip.resolve", 4, ["could not find a version that satisfies", "no matching distribution found",
+                            "resolutionimpossible", "pip's dependency resolver"]),
+        ("pip.build", 4, ["failed building wheel", "failed to build", "subprocess-exited-with-error"]),
+        ("pip.env", 3, ["externally-managed-environment"]),
+    ],
+}
+
+
+class Rule:
+    __slots__ = ("name", "rule_set", "severity", "keywords")
+
+    def __init__(self, name: str, rule_set: str, severity: int, keywords: list[str]):
+        self.name = name
+        self.rule_set = rule_set
+        self.severity = severity
+        self.keywords = [k.lower() for k in keywords]
+        for k in self.keywords:
+            if not k or "\n" in k:
+                raise ValueError(f"Rule '{name}': keywords must be non-empty single-line strings")
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, severity={self.severity})"
+
+
+def trie_pattern(keywords) -> str:
+    """
+    Literal keywords as one regex factored by common prefixes, e.g.
+    ["cuda", "cudnn", "core"] -> "c(?:ud(?:a|nn)|ore)". Still only literals and
+    alternation (linear time), but far fewer branches are tried per character.
+    """
+    trie = {}
+    for k in keywords:
+        node = trie
+        for ch in k:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        branches = []
+        for ch in sorted(node, key=lambda c: (c == "", c)):
+            if ch == "":
+                continue
+            branches.append(re.escape(ch) + build(node[ch]))
+        if "" in node:
+            # a keyword ends here; longer keywords through this node are subsumed
+            return ""
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+
+class RuleEngine:
+    """
+    All rules compiled into one alternation of escaped literals, matched on
+    lower-cased text (no quantifiers -> no backtracking, one pass over the input).
+    Detection uses the minimal keyword set (a keyword that contains another keyword
+    can never be the only hit), classification of a hit line picks the most
+    severe rule whose keyword occurs in it.
+    """
+
+    def __init__(self, rules: list[Rule]):
+        self.rules = sorted(rules, key=lambda r: -r.severity)
+        keywords = {k for r in self.rules for k in r.keywords}
+        minimal = sorted(k for k in keywords if not any(o != k and o in k for o in keywords))
+        self.pattern = re.compile(trie_pattern(minimal))
+        self.pattern_bytes = re.compile(trie_pattern(
+            k.encode("utf-8").decode("latin-1") for k in minimal).encode("latin-1"))  # one char per byte
+        self.max_keyword_bytes = max((len(k.encode("utf-8")) for k in minimal), default=0)
+
+    def classify(self, line: str) -> Rule:
+        """Most severe rule matching the line, or None."""
+        lower = line.lower()
+        for rule in self.rules:
+            for k in rule.keywords:
+                if k in lower:
+                    return rule
+        return None
+
+    def first_line(self, lines: list[str]) -> int:
+        """Index of the first line containing any keyword (-1 if none), one regex pass per SCAN_LINES block."""
+        for offset in range(0, len(lines), SCAN_LINES):
+            block = "\n".join(lines[offset:offset + SCAN_LINES]).lower()
+            match = self.pattern.search(block)
+            if match:
+                # lower() can change lengths of some characters but never the number of newlines
+                return offset + block.count("\n", 0, match.start())
+        return -1
+
+    def last_line(self, lines: list[str]) -> int:
+        """Index of the last line containing any keyword (-1 if none); walks backwards, stops at the first hit."""
+        search = self.pattern.search
+        for index in range(len(lines) - 1, -1, -1):
+            if search(lines[index].lower()):
+                return index
+        return -1
+
+    def scan(self, lines: list[str]) -> list[tuple[int, Rule]]:
+        """(line index, rule) for every line with a keyword, in one pass over the block."""
+        block = "\n".join(lines).lower()
+        hits, index, pos = [], 0, 0
+        for match in self.pattern.finditer(block):
+            index += block.count("\n", pos, match.start())
+            pos = match.start()
+            if not hits or hits[-1][0] != index:
+                hits.append((index, self.classify(lines[index])))
+        return hits
+
+    def last_offset_bytes(self, data: bytes) -> int:
+        """Offset of the last keyword in a UTF-8 byte window (-1 if none)."""
+        offset = -1
+        for match in self.pattern_bytes.finditer(data.lower()):
+            offset = match.start()
+        return offset
+
+
+def rules_from_sets(rule_sets: dict, enabled: list[str] = None) -> list[Rule]:
+    rules = []
+    for set_name, entries in rule_sets.items():
+        if enabled is not None and set_name not in enabled:
+            continue
+        for name, severity, keywords in entries:
+            rules.append(Rule(name, set_name, severity, keywords))
+    return rules
+
+
+def load_rules(path: str) -> tuple[dict, list[str]]:
+    """
+    Read a JSON rule config:
+      {"sets": {"mytool": [{"name": "mytool.fatal", "severity": 5, "keywords": ["FATAL"]}]},
+       "disable": ["locale.ja"]}
+    Returns (extra rule sets, disabled set names).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    sets = {}
+    for set_name, entries in config.get("sets", {}).items():
+        sets[set_name] = [(e["name"], int(e.get("severity", 3)), e["keywords"]) for e in entries]
+    return sets, list(config.get("disable", []))
+
+
+def build_engine(config_path: str = None, enabled: list[str] = None) -> RuleEngine:
+    """Built-in rule sets, plus / minus the sets of a JSON config file."""
+    rule_sets = dict(DEFAULT_RULE_SETS)
+    if config_path:
+        extra, disabled = load_rules(config_path)
+        rule_sets.update(extra)
+        for name in disabled:
+            rule_sets.pop(name, None)
+    return RuleEngine(rules_from_sets(rule_sets, enabled))
+
+
+_engine: RuleEngine = None
+_cascade_engine: RuleEngine = None
+
+
+def _enabled_sets() -> list[str]:
+    enabled = os.environ.get("LOGWISE_RULE_SETS")
+    return [s.strip() for s in enabled.split(",")] if enabled else None
+
+
+def get_engine() -> RuleEngine:
+    """Process-wide engine; LOGWISE_RULES points to an optional JSON config, LOGWISE_RULE_SETS limits the sets."""
+    global _engine
+    if _engine is None:
+        _engine = build_engine(os.environ.get("LOGWISE_RULES"), _enabled_sets())
+    return _engine
+
+
+def get_cascade_engine() -> RuleEngine:
+    """
+    Engine of the single-error extractors: CASCADE_RULE_SETS plus the sets of the
+    LOGWISE_RULES file (LOGWISE_RULE_SETS, if set, chooses the sets for both engines).
+    """
+    global _cascade_engine
+    if _cascade_engine is None:
+        config_path = os.environ.get("LOGWISE_RULES")
+        enabled = _enabled_sets()
+        if enabled is None:
+            enabled = CASCADE_RULE_SETS + (list(load_rules(config_path)[0]) if config_path else [])
+        _cascade_engine = build_engine(config_path, enabled)
+    return _cascade_engine
+
+
+def set_engine(engine: RuleEngine):
+    """Use engine for detection and classification (both engines)."""
+    global _engine, _cascade_engine
+    _engine = _cascade_engine = engine
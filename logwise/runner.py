@@ -1,24 +1,76 @@
 # runner.py
 import subprocess
+import json
 import os
+import queue
 import sys
 import re
+import shlex
+import signal
+import stat
+import tempfile
 import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
 import pexpect 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from logwise.core import warm_up_in_background
+from logwise.error_extractor import truncation_marker
+from logwise import metrics, transport
 
 # Build a Flask web server
 app = Flask(__name__)
+# Optional Unix domain socket (same-host clients: RUNNER_URL=unix://<path>), served next to TCP :9090
+RUNNER_SOCKET = os.environ.get("LOGWISE_RUNNER_SOCKET")
 
-shell: pexpect.spawn = None
 PROMPT = "!!!_SET_YOUR_SECRET_PROMPT_!!!"
 PROMPT_RE = re.compile(re.escape(PROMPT))
 
 # Used to filter out ANSI escape sequences like [?2004l
 ANSI_ESCAPE_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
 
-shell_lock = threading.Lock()
-CURRENT_CWD = os.getcwd()
+# Session pool: one stateful shell per session id (sent by core / WebUI)
+DEFAULT_SESSION = "default"
+MAX_SESSIONS = int(os.environ.get("LOGWISE_MAX_SESSIONS", "8"))
+SESSION_IDLE_TIMEOUT = float(os.environ.get("LOGWISE_SESSION_IDLE_TIMEOUT", "3600"))  # seconds
+REAP_INTERVAL = 60        # seconds between idle-session sweeps
+MAX_SESSION_ID = 128
+
+COMMAND_TIMEOUT = 1800    # seconds, then the command is cancelled like POST /cancel
+CANCEL_GRACE = 2          # seconds between Ctrl-C, SIGKILL of the command and SIGKILL of its shell
+# Shell supervision: dead / desynced shells are swapped for a pre-spawned standby shell
+STANDBY_SHELLS = int(os.environ.get("LOGWISE_STANDBY_SHELLS", "1"))
+PROBE_TIMEOUT = 2         # seconds a liveness probe (echo) may take
+STREAM_READ_TIMEOUT = 0.2 # seconds one read of the shell waits for new output while streaming
+HOLD_LIMIT = 64 * 1024    # held-back text beyond which an unfinished line is passed on anyway
+HOLD_KEEP = 8 * 1024      # what stays held back then (room for the 'echo $?' / 'pwd' lines)
+
+# Output capture: head + tail in memory, the full output spilled to disk when it is cut
+CAPTURE_HEAD_BYTES = int(os.environ.get("LOGWISE_CAPTURE_HEAD_KB", "64")) * 1024
+CAPTURE_TAIL_BYTES = int(os.environ.get("LOGWISE_CAPTURE_TAIL_KB", "256")) * 1024
+# per user and owner-only (0700, files 0600): spilled outputs are whatever the commands printed
+SPILL_DIR = os.environ.get("LOGWISE_SPILL_DIR") or os.path.join(tempfile.gettempdir(), f"logwise-runner-{os.getuid()}")
+SPILL_TTL = 24 * 3600     # seconds a spilled output stays fetchable
+SPILL_MAX_FILES = 64
+OUTPUT_RANGE_MAX = 1024 * 1024
+OUTPUT_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+# Async jobs: POST /jobs returns at once, JOB_WORKERS threads run the queued commands
+JOB_WORKERS = int(os.environ.get("LOGWISE_JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.environ.get("LOGWISE_JOB_QUEUE_SIZE", "64"))
+JOB_RETENTION = float(os.environ.get("LOGWISE_JOB_RETENTION", "3600"))  # seconds a finished job is kept
+JOB_MAX_FINISHED = 256
+JOB_OUTPUT_WINDOW = 1024 * 1024   # recent output (characters) kept per job for polling
+JOB_MAX_WAIT = 30                 # seconds one long poll may wait
+
+# Resource accounting (Linux /proc): peak RSS of a command's processes is sampled this often
+RSS_SAMPLE_INTERVAL = 0.2
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
 
 #Blacklist
 BLACKLIST_STARTSWITH = (
@@ -30,24 +82,29 @@ BLACKLIST_INTERACTIVE_REPLS = {
     "python", "python3", "node", "bash"
 }
 
-def initialize_shell():
+class SessionPoolFull(Exception):
+    pass
+
+
+def spawn_shell(cwd: str, label: str) -> pexpect.spawn:
     """
     start a bash shell
     """
-    global shell, CURRENT_CWD
-    print("[Runner] Starting a new, stateful pexpect shell...")
+    print(f"[Runner] Starting a new, stateful pexpect shell ({label})...")
     
     # Get the current venv and path so that the shell can inherit correctly.
     env = os.environ.copy()
-    CURRENT_CWD = os.getcwd()
     
     shell = pexpect.spawn(
         "/bin/bash", 
         encoding='utf-8', 
         env=env,
         # Let pexpect know our working directory
-        cwd=CURRENT_CWD,
-        echo=False 
+        cwd=cwd,
+        echo=False,
+        # a runner started in the background (nohup, '&') ignores SIGINT, and so would
+        # bash and every command: Ctrl-C (POST /cancel) has to reach them
+        preexec_fn=lambda: signal.signal(signal.SIGINT, signal.SIG_DFL),
     )
     
     # Set a simple and unique prompt.
@@ -57,21 +114,295 @@ def initialize_shell():
     _ = shell.before
     
     print("[Runner] Shell Ready (stty -echo, PS1 set)")
+    return shell
 
-@app.route("/run", methods=['POST'])
-def run_command_endpoint():
+
+class StandbyShells:
     """
-    recive WebUI' JSON command
-    in *this* enviroment excute
-    return (exit_code, stdout, stderr) result of JSON
+    Warm standby: `size` pre-spawned, already prompted shells. take() hands one out
+    (moved to the wanted cwd) in about a millisecond instead of spawning a shell,
+    then a background thread spawns its replacement.
     """
-    global CURRENT_CWD
-    
-    cmd = request.json.get("command")
-    if not cmd:
-        return jsonify({"error": "No command provided"}), 400
-        
-    # Blacklist Check
+
+    def __init__(self, size: int = STANDBY_SHELLS):
+        self.size = size
+        self.shells = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+
+    def take(self, cwd: str, label: str) -> pexpect.spawn:
+        shell = None
+        with self._lock:
+            while self.shells and shell is None:
+                candidate = self.shells.popleft()
+                if candidate.isalive():
+                    shell = candidate
+                else:
+                    candidate.close(force=True)
+        if shell is not None:
+            try:
+                # echo is off: pexpect's 50 ms delaybeforesend is not needed for the cd
+                delay, shell.delaybeforesend = shell.delaybeforesend, None
+                shell.sendline(f"cd -- {shlex.quote(cwd)}")
+                shell.delaybeforesend = delay
+                shell.expect(PROMPT_RE, timeout=PROBE_TIMEOUT)
+                print(f"[Runner] Standby shell handed to {label}")
+            except (pexpect.TIMEOUT, pexpect.EOF):
+                shell.close(force=True)
+                shell = None
+        if shell is None:
+            shell = spawn_shell(cwd, label)
+        # after the handoff: spawning the replacement must not slow it down
+        self.refill()
+        return shell
+
+    def refill(self):
+        """Spawn standby shells up to size in a background thread (one refill at a time)."""
+        with self._lock:
+            if self._refilling or len(self.shells) >= self.size:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, daemon=True).start()
+
+    def _refill(self):
+        try:
+            while True:
+                with self._lock:
+                    if len(self.shells) >= self.size:
+                        return
+                shell = spawn_shell(os.getcwd(), "standby")
+                with self._lock:
+                    self.shells.append(shell)
+        except Exception as e:
+            print(f"[Runner] Could not spawn a standby shell : {e}")
+        finally:
+            with self._lock:
+                self._refilling = False
+
+
+standby = StandbyShells()
+
+
+class ShellSession:
+    """
+    One stateful bash shell with its own cwd and lock: commands of a session
+    run one at a time (and keep their 'cd'), different sessions run in parallel.
+    """
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.shell: pexpect.spawn = None
+        self.lock = threading.Lock()
+        self.cwd = os.getcwd()
+        self.last_used = time.monotonic()
+        self.closed = False
+        self.running = None             # command being run
+        self.idle = threading.Event()   # set when no command is running
+        self.idle.set()
+        self.cancelled = None           # why the running command was cancelled ("cancelled" / "timeout")
+
+    def start(self):
+        """
+        start a bash shell (a warm standby one when there is one)
+        """
+        self.cwd = os.getcwd()
+        self.shell = standby.take(self.cwd, f"session '{self.id}'")
+
+    def recover(self, reason: str):
+        """
+        Replace a dead or desynced shell with a standby one in the last known cwd
+        (the old shell's variables and functions are lost). Caller holds self.lock.
+        """
+        start = time.perf_counter()
+        old, self.shell = self.shell, standby.take(self.cwd, f"session '{self.id}'")
+        if old is not None:
+            # closing a live shell waits for it to terminate: not on the request's time
+            threading.Thread(target=old.close, kwargs={"force": True}, daemon=True).start()
+        elapsed = time.perf_counter() - start
+        metrics.observe("logwise_runner_shell_recovery_seconds", elapsed)
+        print(f"[Runner] Session '{self.id}' recovered ({reason}) in {elapsed * 1000:.1f} ms, cwd {self.cwd}")
+
+    def probe(self, timeout: float = PROBE_TIMEOUT) -> bool:
+        """Liveness probe: the shell answers an echo with the marker and PROMPT within timeout."""
+        if self.shell is None or not self.shell.isalive():
+            return False
+        marker = f"__logwise_probe_{uuid.uuid4().hex}__"
+        try:
+            self.shell.sendline(f"echo {marker}")
+            self.shell.expect(re.escape(marker) + r"[\s\S]*?" + PROMPT_RE.pattern, timeout=timeout)
+            return True
+        except (pexpect.TIMEOUT, pexpect.EOF, OSError):
+            return False
+
+    def close(self):
+        self.closed = True
+        if self.shell is not None:
+            self.shell.close(force=True)
+            self.shell = None
+
+    def cancel(self, reason: str = "cancelled", grace: float = CANCEL_GRACE) -> str:
+        """
+        Stop the running command (called from another thread; the command's thread reads on
+        up to PROMPT and resyncs). Escalates every `grace` seconds:
+        (1) Ctrl-C on the terminal (SIGINT to its foreground process group, or to bash itself for a builtin loop)
+        (2) SIGKILL to the foreground process group
+        (3) SIGKILL to the shell (the session starts a new one)
+        Returns the signal that ended the command, None if nothing was running.
+        """
+        shell = self.shell
+        if shell is None or self.idle.is_set():
+            return None
+        self.cancelled = reason
+        print(f"[Runner] Cancelling '{self.running}' ({self.id}, {reason})")
+        shell.sendintr()
+        if self.idle.wait(grace):
+            return "SIGINT"
+        try:
+            pgid = os.tcgetpgrp(shell.child_fd)
+            if pgid != shell.pid:
+                os.killpg(pgid, signal.SIGKILL)
+                if self.idle.wait(grace):
+                    return "SIGKILL"
+        except OSError:
+            pass
+        print(f"[Runner] Shell of session '{self.id}' does not respond, killing it")
+        shell.kill(signal.SIGKILL)
+        self.idle.wait(grace)
+        return "SIGKILL (shell)"
+
+
+class SessionPool:
+    """
+    Shell sessions keyed by session id, created on first use.
+    - at most max_sessions shells: a new session evicts the least recently used idle one
+      (SessionPoolFull if every shell is running a command)
+    - sessions idle for idle_timeout seconds are closed by reap()
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> ShellSession:
+        evicted = None
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                if len(self.sessions) >= self.max_sessions:
+                    evicted = self._evict_idle()
+                session = self.sessions[session_id] = ShellSession(session_id)
+            session.last_used = time.monotonic()
+        if evicted:
+            evicted.close()
+        return session
+
+    @contextmanager
+    def use(self, session_id: str):
+        """Hold the session's lock (its shell started) while one command runs."""
+        lock_wait_start = time.perf_counter()
+        while True:
+            session = self.get(session_id)
+            session.lock.acquire()
+            if not session.closed:
+                break
+            session.lock.release()  # reaped while we waited: get a fresh one
+        metrics.observe("logwise_runner_lock_wait_seconds", time.perf_counter() - lock_wait_start)
+        try:
+            if session.shell is None:
+                session.start()
+            elif not session.shell.isalive():
+                session.recover("shell died")
+            yield session
+        finally:
+            session.last_used = time.monotonic()
+            session.lock.release()
+
+    def cwd(self, session_id: str) -> str:
+        session = self.sessions.get(session_id)
+        return session.cwd if session else os.getcwd()
+
+    def _detach(self, session: ShellSession, reason: str):
+        # caller holds self._lock and session.lock; the shell itself is closed after both are released
+        del self.sessions[session.id]
+        session.closed = True
+        print(f"[Runner] Session '{session.id}' closed ({reason})")
+
+    def _evict_idle(self) -> ShellSession:
+        for session in sorted(self.sessions.values(), key=lambda s: s.last_used):
+            if session.lock.acquire(blocking=False):
+                try:
+                    self._detach(session, "pool full")
+                finally:
+                    session.lock.release()
+                return session
+        raise SessionPoolFull(f"[Runner ERROR] All {self.max_sessions} shell sessions are busy, try again later.")
+
+    def reap(self, now: float = None) -> int:
+        """Close the sessions idle for longer than idle_timeout, recover dead idle shells; returns how many closed."""
+        now = now or time.monotonic()
+        reaped, dead = [], []
+        with self._lock:
+            for session in list(self.sessions.values()):
+                if not session.lock.acquire(blocking=False):
+                    continue
+                try:
+                    if now - session.last_used > self.idle_timeout:
+                        self._detach(session, "idle")
+                        reaped.append(session)
+                    elif session.shell is not None and not session.shell.isalive():
+                        dead.append(session)
+                finally:
+                    session.lock.release()
+        for session in reaped:
+            session.close()
+        for session in dead:
+            # died while idle (OOM killer, kill from outside): ready before the next command.
+            # Outside self._lock, a cold bash spawn must not stall get() of every other session
+            if not session.lock.acquire(blocking=False):
+                continue  # a command took it meanwhile: use() recovers it
+            try:
+                if not session.closed and session.shell is not None and not session.shell.isalive():
+                    session.recover("shell died while idle")
+            finally:
+                session.lock.release()
+        return len(reaped)
+
+    def start_reaper(self, interval: float = REAP_INTERVAL) -> threading.Thread:
+        def worker():
+            while True:
+                time.sleep(interval)
+                self.reap()
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [{"session": s.id, "cwd": s.cwd, "busy": s.lock.locked(),
+                     "idle_s": round(now - s.last_used, 1)} for s in self.sessions.values()]
+
+
+sessions = SessionPool()
+
+
+def initialize_shell(session_id: str = DEFAULT_SESSION) -> ShellSession:
+    """Start the shell of a session now (the default one at startup) instead of on its first command."""
+    with sessions.use(session_id) as session:
+        return session
+
+
+def session_id_from(data: dict) -> str:
+    session_id = data.get("session") or DEFAULT_SESSION
+    if not isinstance(session_id, str) or len(session_id) > MAX_SESSION_ID:
+        raise ValueError("Invalid session id")
+    return session_id
+
+
+def check_blacklist(cmd: str) -> str:
+    """Return the rejection message if the command must not run in the shared shell, else None."""
     cmd_norm = cmd.strip()
     cmd_norm_lower = cmd_norm.lower()
     cmd_parts = cmd_norm_lower.split()
@@ -79,135 +410,914 @@ def run_command_endpoint():
     
     # Check 1: Exact matches (e.g., 'exit')
     if cmd_norm_lower in BLACKLIST_EXACT:
-        err_msg = f"[Agent Security] Error: Command '{first_cmd}' is blacklisted as it will terminate the agent."
         print(f"[Runner] REJECTED: {cmd} (Reason: Exact match)")
-        return jsonify({
-            "exit_code": -1, "stdout": "", "stderr": err_msg, "cwd": CURRENT_CWD
-        })
+        return f"[Agent Security] Error: Command '{first_cmd}' is blacklisted as it will terminate the agent."
 
     # Check 2: StartsWith matches (e.g., 'sudo ...' or 'apt ...')
     if cmd_norm_lower.startswith(BLACKLIST_STARTSWITH):
-        err_msg = f"[Agent Security] Error: Command '{first_cmd}' (or similar) is blacklisted. It may be interactive (like sudo/apt) or non-terminating (like watch) and will freeze the agent."
         print(f"[Runner] REJECTED: {cmd} (Reason: StartsWith match)")
-        return jsonify({
-            "exit_code": -1, "stdout": "", "stderr": err_msg, "cwd": CURRENT_CWD
-        })
+        return f"[Agent Security] Error: Command '{first_cmd}' (or similar) is blacklisted. It may be interactive (like sudo/apt) or non-terminating (like watch) and will freeze the agent."
         
     # Check 3: Interactive REPLs (e.g., 'python' with no args)
     if len(cmd_parts) == 1 and first_cmd in BLACKLIST_INTERACTIVE_REPLS:
-        err_msg = f"[Agent Security] Error: Command '{first_cmd}' is blacklisted. Running it without arguments will start an interactive shell and freeze the agent."
         print(f"[Runner] REJECTED: {cmd} (Reason: Interactive REPL)")
-        return jsonify({
-            "exit_code": -1, "stdout": "", "stderr": err_msg, "cwd": CURRENT_CWD
+        return f"[Agent Security] Error: Command '{first_cmd}' is blacklisted. Running it without arguments will start an interactive shell and freeze the agent."
+    return None
+
+
+def parse_buffer(full_buffer_raw: str, last_cwd: str) -> tuple[int, str, str]:
+    """
+    Split the shell output of '<cmd>; echo $?; pwd' into (exit_code, output, cwd).
+    last_cwd is returned when the buffer cannot be parsed.
+    """
+    # 4. Clean up all ANSI characters (using MobaXterm or others)
+    with metrics.timer("logwise_runner_ansi_cleanup_seconds"):
+        full_buffer_cleaned = ANSI_ESCAPE_RE.sub('', full_buffer_raw)
+    
+    # 5. Split by row
+    lines = full_buffer_cleaned.splitlines()
+    
+    if not lines:
+        # The command outputs no results (e.g., 'cd' or 'mkdir' succeeds).
+        # 'echo $?' always outputs '0', theoretically lines will not be empty.
+        # But as a precaution, if it is empty, we assume it succeeded.
+        print("[Runner] Command produced no output, assuming silent success.")
+        # If even pwd fails... then upload back to the root directory.
+        return 0, "", last_cwd
+
+    try:
+        # The last line *must* be from 'pwd'
+        cwd = lines[-1].strip()
+        
+        # 6. second to last line *must* be the exit code (from 'echo $?')
+        last_line = lines[-2].strip()
+        match = re.search(r'(-?\d+)', last_line)
+        
+        if match:
+            exit_code = int(match.group(0))
+        else:
+            # If the last line isn't a number, there's a big problem.
+            raise ValueError(f"Exit code line was not a number: '{last_line}'")
+            
+        # 7. Output = everything except second to last line
+        output_lines = lines[:-2]
+        return exit_code, "\n".join(output_lines).strip(), cwd
+
+    except Exception as e:
+        print(f"[Runner] CRITICAL: Failed to parse exit code from buffer. Error: {e}")
+        print(f"[Runner] Raw buffer: '{full_buffer_raw}'")
+        print(f"[Runner] Cleaned buffer: '{full_buffer_cleaned}'")
+        return -1, full_buffer_cleaned, last_cwd # failure
+
+
+class OutputCapture:
+    """
+    Bounded capture of one command's (ANSI-cleaned) output.
+    - the first head_bytes and the last tail_bytes are kept in memory
+    - once the output outgrows them, all of it is also written to a spill file
+      in SPILL_DIR; its id (GET /output/<id>) is in the response, and text()
+      marks the cut between head and tail
+    """
+
+    def __init__(self, head_bytes: int = CAPTURE_HEAD_BYTES, tail_bytes: int = CAPTURE_TAIL_BYTES,
+                 spill_dir: str = SPILL_DIR):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.spill_dir = spill_dir
+        self.head = bytearray()
+        self.tail = deque()
+        self.tail_len = 0
+        self.total = 0
+        self.spill = None
+        self.output_id = None
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.head) + self.tail_bytes
+
+    def write(self, text: str):
+        data = text.encode("utf-8")
+        self.total += len(data)
+        if self.spill is not None:
+            self.spill.write(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        self.tail.append(data)
+        self.tail_len += len(data)
+        if self.tail_len > self.tail_bytes:
+            if self.spill is None and self.spill_dir:
+                self._open_spill()  # before anything is dropped: the file gets all of it
+            while self.tail_len - len(self.tail[0]) >= self.tail_bytes:
+                self.tail_len -= len(self.tail.popleft())
+
+    def _open_spill(self):
+        try:
+            private_dir(self.spill_dir)
+            self.output_id = uuid.uuid4().hex
+            fd = os.open(spill_path(self.output_id), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            self.spill = os.fdopen(fd, "wb")
+            self.spill.write(bytes(self.head))
+            for data in self.tail:
+                self.spill.write(data)
+        except OSError as e:
+            print(f"[Runner] cannot spill output to {self.spill_dir}: {e}")
+            self.spill = self.output_id = None
+            self.spill_dir = None
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+            prune_spill_files()
+
+    def text(self) -> str:
+        """Whole output, or head + truncation marker + tail; stripped."""
+        tail = b"".join(self.tail)
+        if not self.truncated:
+            return (bytes(self.head) + tail).decode("utf-8", "replace").strip()
+        tail = tail[-self.tail_bytes:]
+        # cut at line boundaries, so the marker has a line of its own
+        head = bytes(self.head)
+        head = head[:head.rfind(b"\n") + 1] or head
+        tail = tail[tail.find(b"\n") + 1:] or tail
+        omitted = self.total - len(head) - len(tail)  # after the cuts: what is really hidden
+        return (head.decode("utf-8", "ignore") + truncation_marker(omitted, self.output_id) + "\n"
+                + tail.decode("utf-8", "ignore")).strip()
+
+
+def private_dir(path: str):
+    """
+    Create path as a 0700 directory, or check that the existing one is ours and not
+    writable by others (a shared /tmp name can be created first by another user).
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise PermissionError(f"{path} is not a directory owned by this user and private to it")
+
+
+def spill_path(output_id: str) -> str:
+    return os.path.join(SPILL_DIR, output_id + ".log")
+
+
+def prune_spill_files(now: float = None):
+    """Drop spill files older than SPILL_TTL, and the oldest beyond SPILL_MAX_FILES."""
+    now = now or time.time()
+    try:
+        names = [n for n in os.listdir(SPILL_DIR) if n.endswith(".log")]
+    except OSError:
+        return
+    files = []
+    for name in names:
+        path = os.path.join(SPILL_DIR, name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        if now - mtime > SPILL_TTL:
+            _remove(path)
+        else:
+            files.append((mtime, path))
+    files.sort()
+    for _, path in files[:max(len(files) - SPILL_MAX_FILES, 0)]:
+        _remove(path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def reply(obj) -> Response:
+    """JSON response, or msgpack for clients that ask for it (Accept: application/msgpack)."""
+    body, mimetype = transport.encode(obj, request.accept_mimetypes)
+    return Response(body, mimetype=mimetype)
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """Compress large bodies the client accepts with LOGWISE_RUNNER_COMPRESS (not streamed NDJSON)."""
+    if response.is_streamed or response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+    data, encoding = transport.compress(response.get_data(), request.accept_encodings)
+    if encoding:
+        response.set_data(data)
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def serve_unix_socket(path: str):
+    """Serve the app on a Unix domain socket (owner-only: it runs shell commands) in a thread."""
+    from werkzeug.serving import make_server
+    server = make_server(f"unix://{path}", 0, app, threaded=True)
+    os.chmod(path, 0o600)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@app.route("/run", methods=['POST'])
+def run_command_endpoint():
+    """
+    recive WebUI' JSON command
+    in *this* enviroment excute
+    return (exit_code, stdout, stderr) result of JSON
+    """
+    cmd = request.json.get("command")
+    if not cmd:
+        return reply({"error": "No command provided"}), 400
+    try:
+        session_id = session_id_from(request.json)
+    except ValueError as e:
+        return reply({"error": str(e)}), 400
+        
+    # Blacklist Check
+    err_msg = check_blacklist(cmd)
+    if err_msg:
+        return reply({
+            "exit_code": -1, "stdout": "", "stderr": err_msg, "cwd": sessions.cwd(session_id)
         })
         
-    with shell_lock:
-        print(f"[Runner] command received : {cmd}")
-    
+    try:
+        with sessions.use(session_id) as session:
+            return _run_in_session(session, cmd)
+    except SessionPoolFull as e:
+        return reply({
+            "exit_code": -1, "stdout": "", "stderr": str(e), "cwd": os.getcwd()
+        }), 503
+
+
+def _run_in_session(session: ShellSession, cmd: str):
+    capture = OutputCapture()
+    for frame in run_in_session(session, cmd, capture):
+        pass  # output frames: already in capture
+    result = run_result(frame, capture)
+    return reply(result), (500 if frame.get("error") else 200)
+
+
+def run_result(frame: dict, capture: "OutputCapture") -> dict:
+    """The /run JSON from the last frame of run_in_session() and the captured output."""
+    if frame.get("error"):
+        # keep what the command printed before it failed / was killed
+        stderr = (capture.text().strip() + "\n" + frame["error"]).strip()
+        return {"exit_code": -1, "stdout": "", "stderr": stderr, "cwd": frame["cwd"],
+                "cancelled": frame.get("cancelled")}
+
+    output = capture.text()
+    exit_code = frame["exit_code"]
+    return {
+        "exit_code": exit_code,
+        # Success: output in stdout / Failure: output in stderr
+        "stdout": output if exit_code == 0 else "",
+        "stderr": "" if exit_code == 0 else output,
+        "cwd": frame["cwd"],
+        "truncated": frame["truncated"],
+        "output_bytes": frame["output_bytes"],
+        "output_id": frame["output_id"],
+        "resources": frame["resources"],
+        "cancelled": frame["cancelled"],
+    }
+
+
+def read_until_prompt(shell: pexpect.spawn, timeout: float = COMMAND_TIMEOUT, on_read=None):
+    """
+    Yield the shell output as it is read, up to PROMPT (raises pexpect.TIMEOUT).
+    Whatever follows PROMPT is left in shell.buffer, as expect() would.
+    on_read() is called after every read attempt (at least every STREAM_READ_TIMEOUT).
+    """
+    pending = shell.buffer
+    shell.buffer = ""
+    deadline = time.monotonic() + timeout
+    while True:
+        idx = pending.find(PROMPT)
+        if idx != -1:
+            shell.buffer = pending[idx + len(PROMPT):]
+            if idx:
+                yield pending[:idx]
+            return
+        # a PROMPT cut in two by a read: keep its start until the next read completes it
+        keep = next((k for k in range(min(len(PROMPT) - 1, len(pending)), 0, -1)
+                     if PROMPT.startswith(pending[-k:])), 0)
+        if len(pending) > keep:
+            yield pending[:len(pending) - keep]
+            pending = pending[len(pending) - keep:]
+        if time.monotonic() > deadline:
+            raise pexpect.TIMEOUT(f"no prompt after {timeout} seconds")
         try:
-            # 1. send command to pexpect shell
-            full_cmd = f"{cmd}; echo $?; pwd"
-            shell.sendline(full_cmd)
-            
-            # 2. wait shell response our setting PROMPT
-            shell.expect(PROMPT_RE, timeout=1800) 
-            
-            # 3. get "all" output
-            full_buffer_raw = shell.before.strip()
+            pending += shell.read_nonblocking(shell.maxread, STREAM_READ_TIMEOUT)
+        except pexpect.TIMEOUT:
+            pass
+        if on_read:
+            on_read()
 
-            # 4. Clean up all ANSI characters (using MobaXterm or others)
-            full_buffer_cleaned = ANSI_ESCAPE_RE.sub('', full_buffer_raw)
-            
-            # 5. Split by row
-            lines = full_buffer_cleaned.splitlines()
-            
-            exit_code = -1
-            output = ""
-            cwd = ""
-            
-            if not lines:
-                # The command outputs no results (e.g., 'cd' or 'mkdir' succeeds).
-                # 'echo $?' always outputs '0', theoretically lines will not be empty.
-                # But as a precaution, if it is empty, we assume it succeeded.
-                print("[Runner] Command produced no output, assuming silent success.")
-                exit_code = 0 
-                output = ""
-                # If even pwd fails... then upload back to the root directory.
-                cwd = CURRENT_CWD
-            
-            else:
-                try:
-                    # The last line *must* be from 'pwd'
-                    cwd = lines[-1].strip()
-                    
-                    CURRENT_CWD = cwd
-                    # 6. second to last line *must* be the exit code (from 'echo $?')
-                    last_line = lines[-2].strip()
-                    match = re.search(r'(-?\d+)', last_line)
-                    
-                    if match:
-                        exit_code = int(match.group(0))
-                    else:
-                        # If the last line isn't a number, there's a big problem.
-                        raise ValueError(f"Exit code line was not a number: '{last_line}'")
-                        
-                    # 7. Output = everything except second to last line
-                    output_lines = lines[:-2]
-                    output = "\n".join(output_lines).strip()
-
-                except Exception as e:
-                    print(f"[Runner] CRITICAL: Failed to parse exit code from buffer. Error: {e}")
-                    print(f"[Runner] Raw buffer: '{full_buffer_raw}'")
-                    print(f"[Runner] Cleaned buffer: '{full_buffer_cleaned}'")
-                    exit_code = -1 # failure
-                    output = full_buffer_cleaned
-                    cwd = CURRENT_CWD
-            
-            print(f"[Runner] Excuted! (Exit Code: {exit_code})")
-            
-            if exit_code == 0:
-                # return the successful results
-                return jsonify({
-                    "exit_code": 0,
-                    "stdout": output, # return cleaned output
-                    "stderr": "",
-                    "cwd": cwd
-                })
-            else:
-                # Failure: Output in stderr
-                return jsonify({
-                    "exit_code": exit_code,
-                    "stdout": "",
-                    "stderr": output,  # return cleaned output
-                    "cwd": cwd
-                })
-            
+
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _proc_cpu(pid: int) -> list[float]:
+    """[utime, stime, cutime, cstime] of a process in seconds (/proc/<pid>/stat)."""
+    stat = _read(f"/proc/{pid}/stat")
+    if stat is None:
+        return None
+    fields = stat[stat.rindex(")") + 2:].split()
+    return [int(t) / CLK_TCK for t in fields[11:15]]
+
+
+def _descendants(pid: int) -> list[int]:
+    found, todo = [], [pid]
+    while todo:
+        parent = todo.pop()
+        for tid in os.listdir(f"/proc/{parent}/task") if os.path.isdir(f"/proc/{parent}/task") else []:
+            children = _read(f"/proc/{parent}/task/{tid}/children") or ""
+            for child in children.split():
+                found.append(int(child))
+                todo.append(int(child))
+    return found
+
+
+def _tree_rss(pid: int) -> int:
+    """Resident bytes of all processes below pid (the running command)."""
+    total = 0
+    for child in _descendants(pid):
+        statm = _read(f"/proc/{child}/statm")
+        if statm:
+            total += int(statm.split()[1]) * PAGE_SIZE
+    return total
+
+
+def _oom_kill_files() -> list[str]:
+    """Where the kernel counts OOM kills: the runner's cgroup (v2 / v1), else system-wide."""
+    files = []
+    for line in (_read("/proc/self/cgroup") or "").splitlines():
+        _, controllers, path = line.split(":", 2)
+        if controllers == "":
+            files.append(f"/sys/fs/cgroup{path}/memory.events")
+        elif "memory" in controllers.split(","):
+            files.append(f"/sys/fs/cgroup/memory{path}/memory.oom_control")
+    return files + ["/proc/vmstat"]
+
+
+def _oom_kills() -> int:
+    for path in OOM_KILL_FILES:
+        for line in (_read(path) or "").splitlines():
+            if line.startswith("oom_kill "):
+                return int(line.split()[1])
+    return None
+
+
+OOM_KILL_FILES = _oom_kill_files()
+
+
+class ResourceProbe:
+    """
+    Resources used by one command of a session shell (Linux /proc; elsewhere only
+    wall time and the signal are known).
+    - user / sys CPU: growth of the shell's own and waited-for children's CPU time
+    - peak RSS: sum of the RSS of the shell's descendants, sampled while the command runs
+    - oom_kill: the kernel OOM killer ran (in the runner's cgroup) during the command
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.start = time.monotonic()
+        self.cpu = _proc_cpu(pid)
+        self.oom_kills = _oom_kills()
+        self.peak_rss = 0
+        self.last_sample = 0.0
+
+    def sample(self):
+        now = time.monotonic()
+        if self.cpu is None or now - self.last_sample < RSS_SAMPLE_INTERVAL:
+            return
+        self.last_sample = now
+        try:
+            self.peak_rss = max(self.peak_rss, _tree_rss(self.pid))
+        except (OSError, ValueError):
+            pass
+
+    def finish(self, exit_code: int) -> dict:
+        usage = {"wall_s": round(time.monotonic() - self.start, 3),
+                 "user_s": None, "sys_s": None, "max_rss_kb": None}
+        cpu = _proc_cpu(self.pid)
+        if self.cpu is not None and cpu is not None:
+            usage["user_s"] = round(cpu[0] + cpu[2] - self.cpu[0] - self.cpu[2], 2)
+            usage["sys_s"] = round(cpu[1] + cpu[3] - self.cpu[1] - self.cpu[3], 2)
+            usage["max_rss_kb"] = self.peak_rss // 1024
+        # bash reports a command killed by signal N as exit code 128 + N
+        usage["signal"] = None
+        if 128 < exit_code < 128 + 65:
+            try:
+                usage["signal"] = signal.Signals(exit_code - 128).name
+            except ValueError:
+                usage["signal"] = f"signal {exit_code - 128}"
+        oom_kills = _oom_kills()
+        usage["oom_kill"] = None if oom_kills is None or self.oom_kills is None else oom_kills > self.oom_kills
+        return usage
+
+
+def run_in_session(session: ShellSession, cmd: str, capture: "OutputCapture"):
+    """
+    Run one command in a session's shell (caller holds session.lock); yields frames
+      {"output": "..."}   ANSI-stripped lines as soon as they are read (also written to capture)
+      {"done": True, "exit_code", "cwd", "truncated", "output_bytes", "output_id", "resources", "cancelled"}
+                          last frame ({"done": True, "exit_code": -1, "cwd", "error"} if the run failed);
+                          "cancelled" is None, or why the command was interrupted ("cancelled" / "timeout")
+    The last two lines of the buffer (from 'echo $?' and 'pwd') are held back until
+    PROMPT shows which lines they are, so they are never sent as output.
+    Memory stays bounded: one read, HOLD_LIMIT of held-back text and the capture.
+    """
+    print(f"[Runner] command received ({session.id}) : {cmd}")
+    session.running, session.cancelled = cmd, None
+    session.idle.clear()
+    watchdog = threading.Timer(COMMAND_TIMEOUT, session.cancel, kwargs={"reason": "timeout"})
+    watchdog.daemon = True
+    watchdog.start()
+    try:
+        done = yield from _run_frames(session, cmd, capture)
+    finally:
+        watchdog.cancel()
+        session.running = None
+        session.idle.set()
+    yield done
+
+
+def _run_frames(session: ShellSession, cmd: str, capture: "OutputCapture"):
+    """run_in_session() without its last frame, which is returned."""
+    # 1. send command to pexpect shell
+    probe = ResourceProbe(session.shell.pid)
+    session.shell.sendline(f"{cmd}; echo $?; pwd")
+    # 2. read the shell output until our PROMPT (a cancelled command gets 3 * CANCEL_GRACE more)
+    reader = read_until_prompt(session.shell, COMMAND_TIMEOUT + 3 * CANCEL_GRACE + 5, on_read=probe.sample)
+    held = ""   # text not sent yet: the last 2 complete lines + the line being written
+    sent = False
+    try:
+        with metrics.timer("logwise_runner_exec_seconds"):
+            for piece in reader:
+                held += piece
+                lines = held.split("\n")
+                if len(lines) > 3:
+                    held = "\n".join(lines[-3:])
+                    out = "\n".join(lines[:-3])
+                elif len(held) > HOLD_LIMIT:
+                    # one endless line (progress bars): 'echo $?' / 'pwd' fit in the last HOLD_KEEP
+                    out, held = held[:-HOLD_KEEP], held[-HOLD_KEEP:]
+                else:
+                    continue
+                # 3. Clean up all ANSI characters
+                with metrics.timer("logwise_runner_ansi_cleanup_seconds"):
+                    output = ANSI_ESCAPE_RE.sub('', out)
+                output = "\n".join(output.splitlines())
+                if not sent:
+                    output = output.lstrip()  # leading blank lines, as the whole output is stripped
+                if output:
+                    sent = True
+                    capture.write(output + "\n")
+                    yield {"output": output + "\n"}
+    except pexpect.TIMEOUT:
+        print(f"[Runner] Command '{cmd}' execution timed out")
+        capture.close()
+        return {"done": True, "exit_code": -1, "cwd": session.cwd,
+                "error": f"[Runner ERROR] Command '{cmd}' timed out after {COMMAND_TIMEOUT} seconds."}
+    except GeneratorExit:
+        # client went away: let the command finish so the next one finds the shell at its prompt
+        print(f"[Runner] Stream client disconnected, draining '{cmd}'")
+        capture.close()
+        try:
+            for piece in reader:
+                # keep only the trailing lines: they carry 'echo $?' / 'pwd'
+                held = "\n".join((held + piece).split("\n")[-3:])[-HOLD_KEEP:]
         except pexpect.TIMEOUT:
-            print(f"[Runner] Command '{cmd}' execution timed out")
-            return jsonify({
-                "exit_code": -1,
-                "stdout": "",
-                "stderr": f"[Runner ERROR] Command '{cmd}' timed out after 1800 seconds.",
-                "cwd": CURRENT_CWD
-            }), 500
+            pass
+        else:
+            # the command may have cd'ed: /sessions, replies and recover() use session.cwd
+            exit_code, _, cwd = parse_buffer(held.strip(), session.cwd)
+            if exit_code != -1:
+                session.cwd = cwd
+        raise
+    except Exception as e:
+        print(f"[Runner] Pexpect failed to execute : {e}")
+        capture.close()
+        error = str(e)
+        if not session.shell.isalive():
+            # the command ended the shell ('exit', 'exec ...') or cancel() killed it
+            if session.cancelled:
+                error = f"[Runner ERROR] Command '{cmd}' was {session.cancelled}; its shell did not respond and was killed."
+            else:
+                error = f"[Runner ERROR] The shell exited during '{cmd}'; a new shell was started in {session.cwd}."
+            session.recover("shell exited")
+        return {"done": True, "exit_code": -1, "cwd": session.cwd, "error": error,
+                "cancelled": session.cancelled}
+
+    # 4. exit code / cwd from the held-back lines (resynced when the command was cancelled)
+    if session.cancelled:
+        exit_code, output, cwd = resync_after_cancel(session, held)
+    else:
+        exit_code, output, cwd = parse_buffer(held.strip(), session.cwd)
+    if exit_code == -1 and not session.probe():
+        # no exit code trailer (bash only reports 0-255) and no answer to a probe: desynced
+        session.recover("desynced")
+    resources = probe.finish(exit_code)
+    session.cwd = cwd
+    if output:
+        capture.write(output + "\n")
+        yield {"output": output + "\n"}
+    capture.close()
+    metrics.observe("logwise_runner_buffer_bytes", capture.total)
+    print(f"[Runner] Excuted! (Exit Code: {exit_code})")
+    return {"done": True, "exit_code": exit_code, "cwd": cwd, "truncated": capture.truncated,
+            "output_bytes": capture.total, "output_id": capture.output_id, "resources": resources,
+            "cancelled": session.cancelled}
+
+
+def resync_after_cancel(session: ShellSession, held: str) -> tuple[int, str, str]:
+    """
+    (exit_code, output, cwd) of an interrupted command. Ctrl-C usually aborts the whole
+    '<cmd>; echo $?; pwd' line, so ask the shell again; if the command handled the
+    signal and the line went on, its exit code and cwd are the last held lines.
+    """
+    session.shell.sendline("echo $?; pwd")
+    text = "".join(read_until_prompt(session.shell, 10 * CANCEL_GRACE))
+    status, _, cwd = parse_buffer(text.strip(), session.cwd)
+    lines = ANSI_ESCAPE_RE.sub('', held).strip().splitlines()
+    if len(lines) >= 2 and lines[-1].strip() == cwd and re.fullmatch(r"-?\d+", lines[-2].strip()):
+        return int(lines[-2]), "\n".join(lines[:-2]).strip(), cwd
+    return status, "\n".join(lines).strip(), cwd
+
+
+class Job:
+    """One submitted command: its status, recent output (for polling) and, once done, the /run result."""
+
+    def __init__(self, command: str, session_id: str):
+        self.id = uuid.uuid4().hex
+        self.command = command
+        self.session_id = session_id
+        self.status = "queued"          # queued -> running -> done
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.session = None             # its ShellSession once it runs
+        self.cancel_requested = False
+        # output window: the last JOB_OUTPUT_WINDOW characters, offsets count from the start of the output
+        self.chunks = deque()
+        self.start_offset = 0
+        self.end_offset = 0
+        self.changed = threading.Condition()
+
+    def append(self, text: str):
+        with self.changed:
+            self.chunks.append(text)
+            self.end_offset += len(text)
+            while self.end_offset - self.start_offset - len(self.chunks[0]) >= JOB_OUTPUT_WINDOW:
+                self.start_offset += len(self.chunks.popleft())
+            self.changed.notify_all()
+
+    def finish(self, result: dict):
+        with self.changed:
+            self.result = result
+            self.status = "done"
+            self.finished = time.time()
+            self.changed.notify_all()
+
+    def output_since(self, offset: int, wait: float = 0) -> dict:
+        """Output from offset on; waits up to wait seconds for some if there is none yet (long poll)."""
+        with self.changed:
+            if wait > 0:
+                self.changed.wait_for(lambda: self.end_offset > offset or self.status == "done", timeout=wait)
+            start = max(offset, self.start_offset)
+            parts, pos = [], self.start_offset
+            for chunk in self.chunks:
+                if pos + len(chunk) > start:
+                    parts.append(chunk[max(start - pos, 0):])
+                pos += len(chunk)
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "done": self.status == "done",
+                "offset": start,
+                "skipped": start - offset,   # older than the window: see output_id in the result
+                "next_offset": self.end_offset,
+                "data": "".join(parts),
+            }
+
+    def info(self) -> dict:
+        return {
+            "job_id": self.id,
+            "command": self.command,
+            "session": self.session_id,
+            "status": self.status,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "exit_code": self.result["exit_code"] if self.result else None,
+            "output_chars": self.end_offset,
+        }
+
+
+class JobManager:
+    """
+    Async jobs: submit() queues a command and returns at once; `workers` threads
+    run the queue (bounded: queue.Full when it holds queue_size jobs). Finished
+    jobs are kept for `retention` seconds (at most JOB_MAX_FINISHED of them).
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_SIZE,
+                 retention: float = JOB_RETENTION):
+        self.workers = workers
+        self.retention = retention
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, command: str, session_id: str) -> Job:
+        self.prune()
+        self._start_workers()
+        job = Job(command, session_id)
+        with self._lock:
+            self.queue.put_nowait(job)  # queue.Full: caller answers 503
+            self.jobs[job.id] = job
+        print(f"[Runner] Job {job.id} queued ({session_id}) : {command}")
+        return job
+
+    def add_finished(self, command: str, session_id: str, result: dict) -> Job:
+        """A job that is answered without running (e.g. a blacklisted command)."""
+        job = Job(command, session_id)
+        job.finish(result)
+        with self._lock:
+            self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Job:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job: Job) -> str:
+        """
+        Cancel a job: a queued one is finished without running, a running one is
+        interrupted (ShellSession.cancel). Returns the signal used, "queued", or None if it was done.
+        """
+        with self._lock:
+            if job.status == "done":
+                return None
+            job.cancel_requested = True
+            if job.status == "queued":
+                job.finish({"exit_code": -1, "stdout": "", "stderr": "[Runner] Job cancelled before it started.",
+                            "cwd": sessions.cwd(job.session_id), "cancelled": "cancelled"})
+                return "queued"
+            session = job.session
+        return session.cancel() if session else "queued"
+
+    def list(self) -> list[dict]:
+        self.prune()
+        with self._lock:
+            return [job.info() for job in self.jobs.values()]
+
+    def prune(self, now: float = None):
+        now = now or time.time()
+        with self._lock:
+            finished = [j for j in self.jobs.values() if j.status == "done"]
+            for job in finished:
+                if now - job.finished > self.retention:
+                    del self.jobs[job.id]
+            finished = [j for j in finished if j.id in self.jobs]
+            for job in sorted(finished, key=lambda j: j.finished)[:max(len(finished) - JOB_MAX_FINISHED, 0)]:
+                del self.jobs[job.id]
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._run(job)
+            finally:
+                self.queue.task_done()
+
+    def _run(self, job: Job):
+        with self._lock:
+            if job.status == "done":
+                return      # cancelled while queued
+            job.status = "running"
+            job.started = time.time()
+        try:
+            with sessions.use(job.session_id) as session:
+                job.session = session
+                if job.cancel_requested:
+                    job.finish({"exit_code": -1, "stdout": "", "stderr": "[Runner] Job cancelled before it started.",
+                                "cwd": session.cwd, "cancelled": "cancelled"})
+                    return
+                capture = OutputCapture()
+                for frame in run_in_session(session, job.command, capture):
+                    if not frame.get("done"):
+                        job.append(frame["output"])
+                result = run_result(frame, capture)
+        except SessionPoolFull as e:
+            result = {"exit_code": -1, "stdout": "", "stderr": str(e), "cwd": os.getcwd()}
         except Exception as e:
-            print(f"[Runner] Pexpect failed to execute : {e}")
-            return jsonify({
-              "error": str(e),
-              "cwd": CURRENT_CWD
-            }), 500
+            print(f"[Runner] Job {job.id} failed : {e}")
+            result = {"exit_code": -1, "stdout": "", "stderr": f"[Runner ERROR] {e}", "cwd": os.getcwd()}
+        job.finish(result)
+        print(f"[Runner] Job {job.id} done (Exit Code: {result['exit_code']})")
+
+
+jobs = JobManager()
+
+
+def _frame(obj: dict) -> str:
+    return json.dumps(obj, ensure_ascii=False) + "\n"
+
+
+def stream_command(cmd: str, session_id: str = DEFAULT_SESSION):
+    """
+    Generator behind /run/stream: the frames of run_in_session() as NDJSON
+    (one JSON object per line, like Ollama's API).
+    """
+    try:
+        with sessions.use(session_id) as session:
+            for frame in run_in_session(session, cmd, OutputCapture()):
+                yield _frame(frame)
+    except SessionPoolFull as e:
+        yield _frame({"done": True, "exit_code": -1, "cwd": os.getcwd(), "error": str(e)})
+
+
+@app.route("/run/stream", methods=['POST'])
+def run_stream_endpoint():
+    """
+    Streaming variant of /run: output is sent while the command runs
+    (chunked NDJSON, see stream_command), memory stays bounded on both sides.
+    """
+    cmd = request.json.get("command")
+    if not cmd:
+        return reply({"error": "No command provided"}), 400
+    try:
+        session_id = session_id_from(request.json)
+    except ValueError as e:
+        return reply({"error": str(e)}), 400
+
+    err_msg = check_blacklist(cmd)
+    if err_msg:
+        return Response(_frame({"done": True, "exit_code": -1, "cwd": sessions.cwd(session_id), "error": err_msg}),
+                        mimetype="application/x-ndjson")
+    return Response(stream_command(cmd, session_id), mimetype="application/x-ndjson")
+
+@app.route("/jobs", methods=['POST'])
+def submit_job_endpoint():
+    """
+    Queue a command ({"command", "session"}) and return its job id at once (202).
+    Follow it with GET /jobs/<id>/output?offset=N&wait=S, then GET /jobs/<id>/result.
+    """
+    cmd = request.json.get("command")
+    if not cmd:
+        return reply({"error": "No command provided"}), 400
+    try:
+        session_id = session_id_from(request.json)
+    except ValueError as e:
+        return reply({"error": str(e)}), 400
+
+    err_msg = check_blacklist(cmd)
+    if err_msg:
+        job = jobs.add_finished(cmd, session_id, {
+            "exit_code": -1, "stdout": "", "stderr": err_msg, "cwd": sessions.cwd(session_id)
+        })
+        return reply({"job_id": job.id, "status": job.status}), 202
+    try:
+        job = jobs.submit(cmd, session_id)
+    except queue.Full:
+        return reply({"error": f"[Runner ERROR] Job queue is full ({jobs.queue.maxsize} jobs), try again later."}), 503
+    return reply({"job_id": job.id, "status": job.status}), 202
+
+@app.route("/jobs", methods=['GET'])
+def list_jobs_endpoint():
+    """Queued, running and recently finished jobs."""
+    return reply({"jobs": jobs.list(), "queued": jobs.queue.qsize(), "workers": jobs.workers})
+
+@app.route("/jobs/<job_id>", methods=['GET'])
+def job_status_endpoint(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return reply({"error": f"Unknown or expired job id '{job_id}'"}), 404
+    return reply(job.info())
+
+@app.route("/jobs/<job_id>/result", methods=['GET'])
+def job_result_endpoint(job_id):
+    """The /run JSON of a finished job (202 with its status while it is not done)."""
+    job = jobs.get(job_id)
+    if job is None:
+        return reply({"error": f"Unknown or expired job id '{job_id}'"}), 404
+    if job.status != "done":
+        return reply({"job_id": job.id, "status": job.status}), 202
+    return reply({"job_id": job.id, "status": job.status, **job.result})
+
+@app.route("/jobs/<job_id>/output", methods=['GET'])
+def job_output_endpoint(job_id):
+    """Output since ?offset= (characters); ?wait=S long-polls up to S seconds for new output."""
+    job = jobs.get(job_id)
+    if job is None:
+        return reply({"error": f"Unknown or expired job id '{job_id}'"}), 404
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    wait = min(max(request.args.get("wait", 0, type=float), 0), JOB_MAX_WAIT)
+    return reply(job.output_since(offset, wait))
+
+@app.route("/jobs/<job_id>/cancel", methods=['POST'])
+def cancel_job_endpoint(job_id):
+    """Cancel a queued or running job; its result (partial output) follows at /jobs/<id>/result."""
+    job = jobs.get(job_id)
+    if job is None:
+        return reply({"error": f"Unknown or expired job id '{job_id}'"}), 404
+    signal_used = jobs.cancel(job)
+    return reply({"job_id": job.id, "status": job.status, "cancelled": signal_used is not None,
+                  "signal": signal_used})
+
+@app.route("/cancel", methods=['POST'])
+def cancel_endpoint():
+    """
+    Interrupt the command running in a session ({"session": id}): Ctrl-C, then SIGKILL.
+    The request that runs it returns at once with the partial output and "cancelled".
+    """
+    try:
+        session_id = session_id_from(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return reply({"error": str(e)}), 400
+    session = sessions.sessions.get(session_id)
+    signal_used = session.cancel() if session else None
+    return reply({"session": session_id, "cancelled": signal_used is not None, "signal": signal_used})
+
+@app.route("/output/<output_id>", methods=['GET'])
+def output_endpoint(output_id):
+    """
+    A byte range of a truncated command's full output (?offset=0&length=1048576).
+    Returns the text, the file size and next_offset for the following request.
+    """
+    if not OUTPUT_ID_RE.fullmatch(output_id):
+        return reply({"error": "Invalid output id"}), 400
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    length = min(max(request.args.get("length", OUTPUT_RANGE_MAX, type=int), 0), OUTPUT_RANGE_MAX)
+    try:
+        with open(spill_path(output_id), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(offset)
+            data = f.read(length)
+    except FileNotFoundError:
+        return reply({"error": f"Unknown or expired output id '{output_id}'"}), 404
+    return reply({
+        "output_id": output_id,
+        "offset": offset,
+        "next_offset": offset + len(data),
+        "size": size,
+        "eof": offset + len(data) >= size,
+        "data": data.decode("utf-8", "replace"),
+    })
+
+@app.route("/sessions", methods=['GET'])
+def sessions_endpoint():
+    """Open shell sessions (id, cwd, busy, idle seconds)."""
+    return reply({"max_sessions": sessions.max_sessions, "sessions": sessions.stats()})
+
+@app.route("/metrics", methods=['GET'])
+def metrics_endpoint():
+    """
+    Prometheus text format of the runner's stage timings
+    (lock wait, execution, buffer size, ANSI cleanup). Enable with LOGWISE_METRICS=1.
+    """
+    if not metrics.is_enabled():
+        return Response("# metrics disabled, start the runner with LOGWISE_METRICS=1\n",
+                        status=404, mimetype="text/plain")
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     print("==================================================")
     print(" Logwise Runner Agent Starting...")
     print("==================================================")
     print(f" Monitor : http://127.0.0.1:9090")
+    if RUNNER_SOCKET:
+        print(f" Socket : unix://{RUNNER_SOCKET}")
     print(f" CWD : {os.getcwd()}")
     print(f" Current Python: {sys.prefix}")
     print("==================================================")
-    # start pexpect shell
+    # start pexpect shell (default session), close idle sessions in the background
     initialize_shell()
+    sessions.start_reaper()
+    # load the LLM in the background so the first analysis is not a cold start
+    warm_up_in_background()
     
     print("Please keep this terminal open.")
     print("go to Terminal B to open the WebUI and execute commands.")
+    if RUNNER_SOCKET:
+        serve_unix_socket(RUNNER_SOCKET)
     app.run(port=9090, host="127.0.0.1", threaded=True)
\ No newline at end of file
@@ -0,0 +1,53 @@
+# logwise/scheduler.py
+import itertools
+import queue
+import threading
+import time
+
+
+class AnalysisScheduler:
+    """
+    Bounded-concurrency priority scheduler for LLM analyses.
+    - concurrency: number of analyses sent to Ollama at the same time
+    - max_pending: queue size; submit() blocks when it is full (backpressure)
+    - priority: lower value runs first, FIFO within the same priority
+    handler(item) runs on a worker thread; on_result(item, result, error, queue_s)
+    is called for every finished item (serialized by a lock).
+    """
+
+    def __init__(self, handler, on_result, concurrency: int = 2, max_pending: int = 64):
+        self.handler = handler
+        self.on_result = on_result
+        self._queue = queue.PriorityQueue(maxsize=max_pending)
+        self._seq = itertools.count()
+        self._result_lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, daemon=True) for _ in range(max(1, concurrency))
+        ]
+        for t in self._workers:
+            t.start()
+
+    def submit(self, item, priority: int = 1):
+        """Queue an item; blocks while max_pending items are already waiting."""
+        self._queue.put((priority, next(self._seq), time.perf_counter(), item))
+
+    def close(self):
+        """Stop accepting work and wait until every queued item has been handled."""
+        for _ in self._workers:
+            self._queue.put((float("inf"), next(self._seq), 0.0, None))
+        for t in self._workers:
+            t.join()
+
+    def _work(self):
+        while True:
+            priority, _, queued_at, item = self._queue.get()
+            if priority == float("inf"):
+                return
+            queue_s = time.perf_counter() - queued_at
+            result, error = None, None
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                error = e
+            with self._result_lock:
+                self.on_result(item, result, error, queue_s)
@@ -0,0 +1,139 @@
+# logwise/transport.py
+"""
+Wire format between core and the Runner (same host):
+- Unix domain socket transport for requests (RUNNER_URL=unix:///path/to/runner.sock)
+- large bodies compressed with zstd (Python 3.14 compression.zstd, backports.zstd
+  or zstandard on the runner; urllib3 decodes it with the first two)
+- msgpack bodies instead of JSON (if msgpack is installed on both sides)
+"""
+import gzip
+import importlib
+import json
+import os
+import socket
+
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import NewConnectionError
+from urllib3.util import make_headers
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK = "application/msgpack"
+COMPRESS_MIN_BYTES = 16 * 1024   # smaller bodies are sent as they are
+GZIP_LEVEL = 1                   # fast levels: the link is local, CPU time is what counts
+ZSTD_LEVEL = 3
+# Encodings the runner may use, in order of preference (e.g. "zstd,gzip"). None by default:
+# over loopback / a Unix socket even zstd costs more time than the smaller body saves
+# (benchmarks/bench_transport.py); it pays off for clients on another host.
+RUNNER_ENCODINGS = [e.strip() for e in os.environ.get("LOGWISE_RUNNER_COMPRESS", "").split(",") if e.strip()]
+UNIX_PREFIX = "unix://"
+UNIX_BASE_URL = "http+unix://runner"  # what requests sees for a Runner behind a Unix socket
+
+
+def _zstd_compress():
+    """zstd compress(data) function of the first zstd module installed, or None."""
+    for name in ("compression.zstd", "backports.zstd"):
+        try:
+            module = importlib.import_module(name)
+            return lambda data: module.compress(data, ZSTD_LEVEL)
+        except ImportError:
+            pass
+    try:
+        import zstandard
+        return lambda data: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    except ImportError:
+        return None
+
+
+COMPRESSORS = {"gzip": lambda data: gzip.compress(data, GZIP_LEVEL)}
+if _zstd_compress():
+    COMPRESSORS["zstd"] = _zstd_compress()
+
+
+# ---------- client side ----------
+def request_headers() -> dict:
+    """Accept-Encoding / Accept a client sends: every encoding urllib3 can decode here, msgpack if installed."""
+    headers = {"Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"]}
+    if msgpack:
+        headers["Accept"] = f"{MSGPACK}, application/json;q=0.9"
+    return headers
+
+
+def decode(response):
+    """Body of a Runner response, msgpack or JSON (Content-Encoding is already undone by urllib3)."""
+    if msgpack and response.headers.get("Content-Type", "").startswith(MSGPACK):
+        return msgpack.unpackb(response.content, raw=False)
+    return response.json()
+
+
+class UnixHTTPConnection(HTTPConnection):
+    def __init__(self, *args, socket_path: str = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise NewConnectionError(self, f"Failed to connect to {self.socket_path}: {e}") from e
+        return sock
+
+
+class UnixHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = UnixHTTPConnection
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """requests adapter sending every request (any URL) to one Unix domain socket, with keep-alive."""
+
+    def __init__(self, socket_path: str, pool_maxsize: int = 16):
+        super().__init__(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.socket_path = socket_path
+        self.pool = UnixHTTPConnectionPool("localhost", maxsize=pool_maxsize, socket_path=socket_path)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self.pool
+
+    def get_connection(self, url, proxies=None):
+        return self.pool
+
+    def close(self):
+        super().close()
+        self.pool.close()
+
+
+def split_unix_url(url: str) -> tuple[str, str]:
+    """'unix:///run/logwise.sock' -> ('/run/logwise.sock', 'http+unix://runner/run'); (None, url) otherwise."""
+    if not url.startswith(UNIX_PREFIX):
+        return None, url
+    return url[len(UNIX_PREFIX):], UNIX_BASE_URL + "/run"
+
+
+# ---------- runner side ----------
+def encode(obj, accept_mimetypes) -> tuple[bytes, str]:
+    """(body, mimetype): msgpack if the client prefers it and it is installed, else JSON."""
+    if msgpack and accept_mimetypes.best_match(["application/json", MSGPACK]) == MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True), MSGPACK
+    return json.dumps(obj).encode("utf-8"), "application/json"
+
+
+def compress(data: bytes, accept_encodings, encodings: list[str] = None) -> tuple[bytes, str]:
+    """
+    (body, Content-Encoding or None): the first of encodings (default RUNNER_ENCODINGS)
+    the client accepts and the runner can produce, for bodies of COMPRESS_MIN_BYTES or more.
+    """
+    if len(data) < COMPRESS_MIN_BYTES:
+        return data, None
+    for encoding in RUNNER_ENCODINGS if encodings is None else encodings:
+        if encoding in COMPRESSORS and accept_encodings[encoding]:
+            return COMPRESSORS[encoding](data), encoding
+    return data, None
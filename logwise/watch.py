@@ -0,0 +1,193 @@
+# logwise/watch.py
+import argparse
+import codecs
+import os
+import sys
+import time
+
+from .core import get_client, CancelToken
+from .error_extractor import MultiErrorExtractor, TOP_K
+
+POLL_INTERVAL = 1.0      # seconds between checks of the watched files
+DEBOUNCE = 2.0           # quiet seconds after the last new output before analyzing a burst
+MAX_BURST = 30.0         # analyze anyway if a burst keeps growing this long
+READ_BLOCK = 1024 * 1024
+
+
+class FileFollower:
+    """
+    Follow a growing file by offset (like tail -F, polling os.stat).
+    - rotation (file renamed / recreated: new inode): the old file is read to its end,
+      then the new one is followed from its start
+    - truncation (size < offset): restart from offset 0
+    - missing file: wait until it appears
+    Only newly appended bytes are read, in READ_BLOCK pieces.
+    """
+
+    def __init__(self, path: str, from_start: bool = False):
+        self.path = path
+        self.file = None
+        self.inode = None
+        self.offset = 0
+        self.decoder = None
+        self._open(from_start)
+
+    def _open(self, from_start: bool) -> bool:
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return False
+        st = os.fstat(f.fileno())
+        self.file = f
+        self.inode = (st.st_dev, st.st_ino)
+        self.offset = 0 if from_start else st.st_size
+        f.seek(self.offset)
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        return True
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def poll(self):
+        """Yield ("data", text) for new output and ("rotated" | "truncated" | "created", None) events, in order."""
+        if self.file is None:
+            if self._open(from_start=True):
+                yield "created", None
+            else:
+                return
+
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            st = None
+
+        if st is None or (st.st_dev, st.st_ino) != self.inode:
+            # rotated / deleted: drain what was appended to the old file
+            yield from self._read()
+            if st is not None:
+                self.close()
+                if self._open(from_start=True):
+                    yield "rotated", None
+                    yield from self._read()
+            return
+
+        if st.st_size < self.offset:
+            self.file.seek(0)
+            self.offset = 0
+            self.decoder.reset()
+            yield "truncated", None
+        if st.st_size > self.offset:
+            yield from self._read()
+
+    def _read(self):
+        while True:
+            data = self.file.read(READ_BLOCK)
+            if not data:
+                return
+            self.offset += len(data)
+            text = self.decoder.decode(data)
+            if text:
+                yield "data", text
+
+
+class WatchedLog:
+    """One followed file plus its incremental extractor and debounce state."""
+
+    def __init__(self, path: str, from_start: bool = False):
+        self.path = path
+        self.follower = FileFollower(path, from_start)
+        self.extractor = MultiErrorExtractor()
+        self.last_data = 0.0      # when output last arrived
+        self.burst_start = None   # when the first error of the pending burst was seen
+
+    def poll(self, now: float) -> list[str]:
+        """Read new output; returns the file events (rotation / truncation) seen."""
+        notes = []
+        for kind, text in self.follower.poll():
+            if kind == "data":
+                self.extractor.feed(text)
+                self.last_data = now
+            else:
+                notes.append(kind)
+                if kind != "created":
+                    # new file content: the old one ends here (its open traceback and
+                    # last line become events); line numbers restart, pending events stay
+                    self.extractor.flush()
+                    pending = self.extractor.events
+                    self.extractor = MultiErrorExtractor()
+                    self.extractor.events = pending
+        if self.extractor.pending and self.burst_start is None:
+            self.burst_start = now
+        return notes
+
+    def ready(self, now: float, debounce: float = DEBOUNCE, max_burst: float = MAX_BURST) -> bool:
+        """A burst is analyzed once the file has been quiet for debounce seconds (or after max_burst)."""
+        if self.burst_start is None:
+            return False
+        return now - self.last_data >= debounce or now - self.burst_start >= max_burst
+
+    def take(self, top_k: int) -> list:
+        self.burst_start = None
+        return self.extractor.drain(top_k)
+
+
+def watch(paths: list[str], top_k: int = TOP_K, interval: float = POLL_INTERVAL, debounce: float = DEBOUNCE,
+          from_start: bool = False, bypass_cache: bool = False, client=None, stop=None):
+    """
+    Follow the files and analyze each burst of new errors once (debounced), until
+    Ctrl-C (or stop.cancelled). Memory is bounded per file: one read block, one
+    open traceback and MAX_EVENT_CLUSTERS pending events.
+    """
+    client = client or get_client()
+    logs = [WatchedLog(p, from_start) for p in paths]
+    for log in logs:
+        state = "following" if log.follower.file else "waiting for the file"
+        print(f"[Watch] {log.path} ({state})")
+
+    try:
+        while not (stop and stop.cancelled):
+            now = time.monotonic()
+            for log in logs:
+                for note in log.poll(now):
+                    print(f"\n[Watch] {log.path}: file {note}")
+                if not log.ready(now, debounce):
+                    continue
+                events = log.take(top_k)
+                if not events:
+                    continue
+                count = sum(e.count for e in events)
+                print(f"\n[Watch] {log.path}: {len(events)} distinct error(s) ({count} occurrences)\n")
+                cancel = CancelToken()
+                try:
+                    client.analyze_error_events(events, bypass_cache=bypass_cache, cancel=cancel)
+                except KeyboardInterrupt:
+                    cancel.cancel()
+                    raise
+                print("\n")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n[Watch] stopped")
+    finally:
+        for log in logs:
+            log.follower.close()
+
+
+def main(argv=None, top_k: int = None, bypass_cache: bool = False) -> int:
+    parser = argparse.ArgumentParser(prog="python -m logwise watch",
+                                     description="Follow growing log files and analyze new errors.")
+    parser.add_argument("files", nargs="+", help="log files to follow (may not exist yet)")
+    parser.add_argument("-n", "--interval", type=float, default=POLL_INTERVAL, help="poll interval in seconds")
+    parser.add_argument("-d", "--debounce", type=float, default=DEBOUNCE,
+                        help="quiet seconds before a burst of errors is analyzed")
+    parser.add_argument("--from-start", action="store_true", help="also analyze what the files already contain")
+    args = parser.parse_args(argv)
+
+    watch(args.files, top_k=top_k or TOP_K, interval=args.interval, debounce=args.debounce,
+          from_start=args.from_start, bypass_cache=bypass_cache)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,40 @@
 # logwise/webui/app.py
 import sys, os
+import uuid
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
 import streamlit as st
 import streamlit.components.v1 as components
-from logwise.core import run_command, analyze_text, analyze_with_code
-from logwise.error_extractor import extract_error_from_text
+from logwise.core import LogwiseClient
+from logwise.error_extractor import extract_error_from_text, format_resources
+from logwise.webui.run_task import RunTask
+from logwise.webui.history import HistoryStore, PAGE_SIZE, make_preview
 
 st.set_page_config(layout="wide")
 
+POLL_INTERVAL = 0.25  # seconds between redraws of a running command / analysis
+
+
+@st.cache_resource
+def shared_client() -> LogwiseClient:
+    """One pooled client (keep-alive connections, analysis cache) for every browser session and rerun."""
+    return LogwiseClient()
+
+
+@st.cache_resource
+def history_store() -> HistoryStore:
+    """The SQLite terminal history (LOGWISE_HISTORY_DB), shared by every browser session."""
+    return HistoryStore()
+
+
+client = shared_client()
+# Keep the model resident in Ollama (no-op if warmed up recently)
+client.warm_up_in_background()
+
+# One Runner shell per browser session: tabs of other users do not wait for (or cd) ours
+if "runner_session" not in st.session_state:
+    st.session_state.runner_session = f"webui-{uuid.uuid4().hex}"
+
 # Store CWD and instruction history
 if "cwd" not in st.session_state:
     # update the default CWD after the first command is executed.
@@ -33,12 +59,87 @@ pinned_command = "Custom Command..."
 if "selected_option" not in st.session_state:
     st.session_state.selected_option = pinned_command
     
-# Initialize the terminal history log
-if "terminal_history" not in st.session_state:
-    st.session_state.terminal_history = []
+# Terminal history: rows of the history store, keyed by ?history=<id> in the URL,
+# so reloading (or bookmarking) the page brings it back, also after a restart
+if "history_id" not in st.session_state:
+    st.session_state.history_id = st.query_params.get("history") or uuid.uuid4().hex[:12]
+    st.query_params["history"] = st.session_state.history_id
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1        # pages of PAGE_SIZE entries shown, newest first
+if "full_outputs" not in st.session_state:
+    st.session_state.full_outputs = set()     # entry ids whose whole output is shown
+
+# Command + analysis running in the background (webui/run_task.RunTask), None when idle
+if "run_task" not in st.session_state:
+    st.session_state.run_task = None
     
 st.title("Logwise WebUI")
 
+
+def finish_run_task(task: RunTask):
+    """Move a finished task into the session state shown by the next full rerun."""
+    st.session_state.run_task = None
+    snap = task.snapshot()
+    result = task.result
+    if result is None:
+        st.session_state.last_output = snap["error"] or snap["output"]
+        st.session_state.last_resources = None
+        st.session_state.last_analysis = None
+        history_store().add(st.session_state.history_id, task.prompt, st.session_state.last_output)
+        return
+    exit_code, out, err, new_cwd = result
+    raw_output = (out or "") + (err or "")
+    st.session_state.cwd = new_cwd
+    st.session_state.last_output = raw_output
+    st.session_state.last_resources = format_resources(result.resources)
+    status = None
+    if task.stop_info is not None:
+        # stopped while the command ran: keep its partial output, no analysis
+        info = task.stop_info
+        status = f"[Stopped: {info['signal']}]" if info.get("cancelled") else "[Finished before Stop]"
+        st.session_state.last_analysis = None
+    else:
+        analysis = snap["analysis"]
+        if snap["stopped"]:
+            analysis += "\n\n[Analysis stopped]"
+        if snap["error"]:
+            analysis += f"\n\n{snap['error']}"
+        st.session_state.last_analysis = analysis
+    # Append command and output to the log (compressed in SQLite, not in the session)
+    history_store().add(st.session_state.history_id, task.prompt, raw_output, status)
+
+
+@st.fragment(run_every=POLL_INTERVAL)
+def show_run_task():
+    """
+    Live view of the background task: only this fragment reruns while the command and
+    the LLM stream, the form and the history stay usable. A full rerun once it is done.
+    """
+    task = st.session_state.run_task
+    if task is None:
+        return
+    snap = task.snapshot()
+    if task.done:
+        finish_run_task(task)
+        st.rerun()
+
+    phase = "Running" if snap["status"] == "running" else "Analyzing"
+    st.caption(f"{phase}: `{task.cmd}` ({snap['elapsed_s']:.1f}s)")
+    st.write("Command output:")
+    st.code(snap["output"] or "(waiting for output...)", language="bash")
+    if snap["status"] == "analyzing":
+        st.write("Ollama Analysis:")
+        if snap["analysis"].startswith("[No error detected]"):
+            st.success(snap["analysis"])
+        else:
+            st.write(snap["analysis"] or "...")
+
+    # Stop: interrupts the command on the runner (Ctrl-C, then SIGKILL) and keeps
+    # its partial output, or stops the LLM generation
+    if st.button("Stop", key="stop_cmd", disabled=snap["stopped"],
+                 help="Interrupt the running command (Ctrl-C, then SIGKILL) or the analysis"):
+        task.stop()
+
 tab1, tab2 = st.tabs(["Run command", "Analyze log text"])
 
 
@@ -133,10 +234,12 @@ with tab1:
                 )
                 
             submitted = st.form_submit_button("Run(Ctrl+Enter to submit)")
-        
+
         # "Run" or "Ctrl+Enter"
         # This block now ONLY runs when the form is submitted
-        if submitted:
+        if submitted and st.session_state.run_task is not None:
+            st.warning("A command is still running. Wait for it or press Stop.")
+        elif submitted:
             
             # Determine the correct command to run based on selection
             if st.session_state.selected_option == pinned_command:
@@ -163,40 +266,29 @@ with tab1:
                     if len(st.session_state.history) > 10:
                         st.session_state.history = st.session_state.history[-10:]
                 
-                # 3) Run command        
-                exit_code, out, err, new_cwd = run_command(cmd_to_run)
-                raw_output = (out or "") + (err or "")
-                
-                # We save the CWD before setting the new one for the log
-                current_prompt = f"({st.session_state.cwd}) $ {cmd_to_run}"
-                
-                st.session_state.cwd = new_cwd
-                st.session_state.last_output = raw_output
-                
-                # 4) Run and Save Analysis
-                analysis_chunks = []
-                def cb(chunk: str):
-                    analysis_chunks.append(chunk)
-    
-                analyze_with_code(exit_code, out, err, callback=cb)
-                st.session_state.last_analysis = "".join(analysis_chunks)
-                
-                # Append command and output to the log
-                history_entry = f"{current_prompt}\n{raw_output}\n{'-'*40}"
-                st.session_state.terminal_history.append(history_entry)
-                # Keep the log from getting too big
-                if len(st.session_state.terminal_history) > 50:
-                    st.session_state.terminal_history = st.session_state.terminal_history[-50:]
-                
+                # 3) Run command + analysis in the background: this script returns at once
+                #    and show_run_task() draws the output and the LLM tokens as they arrive
+                st.session_state.run_task = RunTask(
+                    client, cmd_to_run, st.session_state.runner_session,
+                    prompt=f"({st.session_state.cwd}) $ {cmd_to_run}",
+                ).start()
+                st.session_state.last_output = None
+                st.session_state.last_analysis = None
+
                 if st.session_state.selected_option == pinned_command:
                      st.session_state.focus_custom_cmd = True
-                st.rerun()
-                         
-            
+
+        if st.session_state.run_task is not None:
+            # polls only while a task exists: its final full rerun stops the timer
+            show_run_task()
+
         # Blocks displaying "Temporary" results
         if st.session_state.last_output is not None:
             st.write("Command output:")
-            st.code(st.session_state.last_output, language="bash")
+            # head + tail of a long output; the whole one is in the history (Show full output)
+            st.code(make_preview(st.session_state.last_output), language="bash")
+            if st.session_state.get("last_resources"):
+                st.caption(st.session_state.last_resources)
             
             # clean state
             st.session_state.last_output = None 
@@ -213,42 +305,40 @@ with tab1:
             st.session_state.last_analysis = None
             
     with col2:
-        # Display the terminal history
+        # Display the terminal history: newest first, one page at a time, long
+        # outputs as head + tail previews (only these pages are read from SQLite)
         st.subheader("Session Terminal History")
-        
-        if st.session_state.terminal_history:
-            # Join all entries. Newest is at the bottom.
-            full_log = "\n".join(st.session_state.terminal_history)
-            
-            st.text_area(
-                "Session Log", # This label MUST match the JS selector
-                value=full_log,
-                height=500, # Make it tall
-                disabled=True
-            )
-            
-            # [NEW] JS Hack to auto-scroll the log area to the bottom
-            components.html(
-                """
-                <script>
-                function scrollLogToBottom() {
-                    const parentDoc = window.parent.document;
-                    // Find the text_area by its label
-                    const logArea = parentDoc.querySelector('textarea[aria-label="Session Log"]');
-                    
-                    if (logArea) {
-                        // Scroll to the bottom
-                        logArea.scrollTop = logArea.scrollHeight;
-                    } else {
-                        // If element not found, retry shortly
-                        window.setTimeout(scrollLogToBottom, 50);
-                    }
-                }
-                scrollLogToBottom();
-                </script>
-                """,
-                height=0
-            )
+        store = history_store()
+        history_id = st.session_state.history_id
+
+        entries, before = [], None
+        for _ in range(st.session_state.history_pages):
+            page = store.page(history_id, before)
+            entries += page
+            if len(page) < PAGE_SIZE:
+                break
+            before = page[-1]["id"]
+
+        if entries:
+            st.caption(f"Newest first. Reopen this page (?history={history_id}) to get it back after a restart.")
+            with st.container(height=500):
+                for entry in entries:
+                    show_full = entry["id"] in st.session_state.full_outputs
+                    output = (store.full_output(entry["id"]) if show_full else None) or entry["preview"]
+                    status = f"\n{entry['status']}" if entry["status"] else ""
+                    st.code(f"{entry['prompt']}\n{output}{status}", language="bash")
+                    if show_full:
+                        if st.button("Hide full output", key=f"hide_output_{entry['id']}"):
+                            st.session_state.full_outputs.discard(entry["id"])
+                            st.rerun()
+                    elif entry["truncated"]:
+                        if st.button(f"Show full output ({entry['output_chars']:,} chars)", key=f"full_output_{entry['id']}"):
+                            st.session_state.full_outputs.add(entry["id"])
+                            st.rerun()
+                if store.has_older(history_id, entries[-1]["id"]):
+                    if st.button("Load older entries", key="history_older"):
+                        st.session_state.history_pages += 1
+                        st.rerun()
         else:
             st.caption("No commands run yet in this session.")
 
@@ -275,4 +365,4 @@ with tab2:
                 output_chunks.append(chunk)
                 output_area.write("".join(output_chunks))
 
-        analyze_text(log_text, callback=cb)
\ No newline at end of file
+        client.analyze_text(log_text, callback=cb)
\ No newline at end of file
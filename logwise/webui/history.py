@@ -0,0 +1,119 @@
+# logwise/webui/history.py
+"""
+Persistent terminal history of the WebUI: one SQLite row per command, the output
+zlib-compressed in a BLOB plus a short preview. Pages are read newest first by id
+(an index range scan), so drawing the history costs the same with 10 or 100000
+entries; a full output is only decompressed when it is asked for.
+"""
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+HISTORY_DB = os.environ.get("LOGWISE_HISTORY_DB") or os.path.join(os.path.expanduser("~"), ".logwise", "webui_history.sqlite3")
+HISTORY_MAX_ENTRIES = int(os.environ.get("LOGWISE_HISTORY_MAX_ENTRIES", "10000"))  # per history, oldest dropped
+PAGE_SIZE = 20
+PREVIEW_HEAD_CHARS = 1000   # on-screen preview of a long output: head + tail
+PREVIEW_TAIL_CHARS = 3000   # (errors are usually at the end)
+ZLIB_LEVEL = 6
+TRIM_EVERY = 100            # inserts of one history between two trims to max_entries
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    history TEXT NOT NULL,
+    created REAL NOT NULL,
+    prompt TEXT NOT NULL,
+    status TEXT,
+    preview TEXT NOT NULL,
+    truncated INTEGER NOT NULL,
+    output_chars INTEGER NOT NULL,
+    output BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_history_id ON entries (history, id);
+"""
+
+
+def make_preview(output: str, head: int = PREVIEW_HEAD_CHARS, tail: int = PREVIEW_TAIL_CHARS) -> str:
+    """Output as it is, or its head and tail around an '[... N chars omitted ...]' line."""
+    if len(output) <= head + tail:
+        return output
+    omitted = len(output) - head - tail
+    return f"{output[:head]}\n[... {omitted} chars omitted (Show full output) ...]\n{output[-tail:]}"
+
+
+class HistoryStore:
+    """
+    Terminal history entries of many histories (one per browser tab / bookmark) in
+    one SQLite file. Thread-safe: Streamlit sessions share one store (one connection
+    behind a lock, WAL journal so readers of other processes are not blocked).
+    """
+
+    def __init__(self, path: str = HISTORY_DB, max_entries: int = HISTORY_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._inserts = {}    # history -> inserts through this store
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def add(self, history: str, prompt: str, output: str, status: str = None) -> int:
+        """Store one command; returns its entry id. Drops the oldest beyond max_entries."""
+        output = output or ""
+        blob = zlib.compress(output.encode("utf-8"), ZLIB_LEVEL)
+        preview = make_preview(output)
+        with self._lock, self._db:
+            entry_id = self._db.execute(
+                "INSERT INTO entries (history, created, prompt, status, preview, truncated, output_chars, output) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (history, time.time(), prompt, status, preview, preview != output, len(output), blob),
+            ).lastrowid
+            inserts = self._inserts[history] = self._inserts.get(history, 0) + 1
+            if self.max_entries and inserts % TRIM_EVERY == 1:
+                # amortized, per history: on its first insert (also after a restart),
+                # then every TRIM_EVERY inserts, instead of counting its rows each time
+                self._db.execute(
+                    "DELETE FROM entries WHERE history = ? AND id <= "
+                    "(SELECT id FROM entries WHERE history = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (history, history, self.max_entries),
+                )
+        return entry_id
+
+    def page(self, history: str, before_id: int = None, limit: int = PAGE_SIZE) -> list[dict]:
+        """
+        Up to limit entries older than before_id (None: the newest), newest first,
+        without their outputs: {"id", "created", "prompt", "status", "preview", "output_chars", "truncated"}.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, created, prompt, status, preview, truncated, output_chars FROM entries "
+                "WHERE history = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (history, before_id if before_id is not None else 2 ** 63 - 1, limit),
+            ).fetchall()
+        return [{**dict(row), "truncated": bool(row["truncated"])} for row in rows]
+
+    def has_older(self, history: str, before_id: int) -> bool:
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM entries WHERE history = ? AND id < ? LIMIT 1", (history, before_id),
+            ).fetchone() is not None
+
+    def full_output(self, entry_id: int) -> str:
+        """The whole output of an entry (decompressed on demand), None if it is gone."""
+        with self._lock:
+            row = self._db.execute("SELECT output FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return None if row is None else zlib.decompress(row["output"]).decode("utf-8")
+
+    def clear(self, history: str) -> int:
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM entries WHERE history = ?", (history,)).rowcount
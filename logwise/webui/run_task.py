@@ -0,0 +1,112 @@
+# logwise/webui/run_task.py
+"""
+Background worker of the WebUI Run tab: runs one command as a Runner job, then
+analyzes it, in a thread tied to the browser session. The Streamlit script only
+polls snapshot() to draw the output and the LLM tokens as they arrive, so a
+rerun never waits for the command or the generation.
+"""
+import threading
+import time
+
+from ..core import CommandResult, CancelToken, LogwiseClient
+
+LIVE_OUTPUT_CHARS = 20000  # tail of the running command's output kept for the live view
+
+
+class RunTask:
+    """
+    One command + analysis. status: "running" (command), "analyzing" (LLM), "done".
+    Written by the worker thread only; read through snapshot() from the script.
+    """
+
+    def __init__(self, client: LogwiseClient, cmd: str, session_id: str, prompt: str):
+        self.client = client
+        self.cmd = cmd
+        self.session_id = session_id
+        self.prompt = prompt          # "(cwd) $ cmd" line of the terminal history
+        self.status = "running"
+        self.job_id = None
+        self.output = ""              # live tail (LIVE_OUTPUT_CHARS)
+        self.result: CommandResult = None
+        self.analysis = []            # LLM chunks so far
+        self.error = None
+        self.stop_requested = False
+        self.stop_info = None         # cancel_job() answer if the command was stopped
+        self.started = time.monotonic()
+        self.cancel = CancelToken()   # stops the LLM generation
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._work, daemon=True)
+
+    def start(self) -> "RunTask":
+        self.thread.start()
+        return self
+
+    @property
+    def done(self) -> bool:
+        return self.status == "done"
+
+    def snapshot(self) -> dict:
+        """Consistent copy of the task's state for one render."""
+        with self._lock:
+            return {"status": self.status, "job_id": self.job_id, "output": self.output,
+                    "analysis": "".join(self.analysis), "error": self.error,
+                    "stopped": self.stop_requested, "elapsed_s": time.monotonic() - self.started}
+
+    def stop(self):
+        """
+        Stop button: interrupt the command on the runner (Ctrl-C, then SIGKILL; its
+        partial output is kept and not analyzed), or cancel the LLM generation.
+        """
+        with self._lock:
+            if self.done or self.stop_requested:
+                return
+            self.stop_requested = True
+            job_id = self.job_id if self.status == "running" else None
+        if job_id:
+            self._cancel_job(job_id)
+        self.cancel.cancel()
+
+    # ---------- worker thread ----------
+    def _cancel_job(self, job_id: str):
+        try:
+            info = self.client.cancel_job(job_id)
+        except Exception as e:
+            info = {"cancelled": None, "signal": None, "error": str(e)}
+        with self._lock:
+            self.stop_info = info
+
+    def _on_submit(self, job_id: str):
+        with self._lock:
+            self.job_id = job_id
+            stop = self.stop_requested
+        if stop:
+            # Stop was clicked before the runner had queued the job
+            self._cancel_job(job_id)
+
+    def _on_output(self, text: str):
+        with self._lock:
+            self.output = (self.output + text)[-LIVE_OUTPUT_CHARS:]
+
+    def _on_token(self, chunk: str):
+        with self._lock:
+            self.analysis.append(chunk)
+
+    def _work(self):
+        try:
+            result = self.client.run_command_job(
+                self.cmd, callback=self._on_output, session_id=self.session_id, on_submit=self._on_submit,
+            )
+            with self._lock:
+                self.result = result
+                if self.stop_requested:
+                    return
+                self.status = "analyzing"
+            exit_code, out, err, _ = result
+            self.client.analyze_with_code(exit_code, out, err, callback=self._on_token,
+                                          cancel=self.cancel, resources=result.resources)
+        except Exception as e:
+            with self._lock:
+                self.error = f"[Logwise WebUI ERROR] {e}"
+        finally:
+            with self._lock:
+                self.status = "done"
@@ -0,0 +1,44 @@
+import os
+import time
+
+from logwise import cache
+from logwise.cache import AnalysisCache
+
+DAY = 24 * 3600
+
+
+def test_disk_ttl_counts_from_creation_even_when_the_entry_is_used(tmp_path):
+    store = AnalysisCache(cache_dir=str(tmp_path), ttl=DAY)
+    store.put("k", "answer")
+    path = tmp_path / "k.json"
+    created = time.time() - DAY + 60
+    os.utime(path, (created, created))
+
+    assert AnalysisCache(cache_dir=str(tmp_path), ttl=DAY).get("k") == "answer"
+    st = os.stat(path)
+    assert abs(st.st_mtime - created) < 1e-3 and st.st_atime > created + 1   # a hit only marks the last use
+
+    os.utime(path, (time.time(), time.time() - DAY - 60))
+    assert AnalysisCache(cache_dir=str(tmp_path), ttl=DAY).get("k") is None
+    assert not path.exists()
+
+
+def test_disk_size_eviction_drops_the_least_recently_used(tmp_path):
+    store = AnalysisCache(max_entries=0, cache_dir=str(tmp_path), max_bytes=3 * 1000)
+    now = time.time()
+    for i, key in enumerate("abc"):
+        store.put(key, "x" * 900)
+        os.utime(tmp_path / f"{key}.json", (now - 100 + i, now - 100 + i))
+    assert store.get("a") == "x" * 900   # a: now the most recently used
+
+    store.put("d", "x" * 900)             # over max_bytes: swept at once
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json", "d.json"]
+
+
+def test_disk_sweeps_are_throttled(tmp_path, monkeypatch):
+    store = AnalysisCache(cache_dir=str(tmp_path))
+    sweeps = []
+    monkeypatch.setattr(store, "_disk_evict", lambda: sweeps.append(1))
+    for i in range(cache.DISK_EVICT_EVERY + 1):
+        store.put(f"k{i}", "answer")
+    assert len(sweeps) == 2
@@ -0,0 +1,90 @@
+# tests/test_error_extractor.py
+import mmap
+import random
+
+from logwise import error_extractor
+from logwise.error_extractor import (
+    HEAD_LINES, TAIL_LINES, _file_windows, extract_error_from_file, extract_error_from_stream, extract_error_from_text,
+)
+from logwise.parallel import scan_file_parallel
+
+TRACEBACK = [
+    "Traceback (most recent call last):",
+    '  File "train.py", line 3, in <module>',
+    "    print(1/0)",
+    "ZeroDivisionError: division by zero",
+]
+
+
+def ok_lines(n: int, start: int = 0) -> list[str]:
+    return [f"step {i} ok" for i in range(start, start + n)]
+
+
+def test_traceback_outside_head_and_tail_reports_exception_line():
+    # the header is not a keyword of the single-error cascade: its exception line is reported
+    text = "\n".join(ok_lines(100) + TRACEBACK + ok_lines(500, 100)) + "\n"
+    assert extract_error_from_text(text) == "ZeroDivisionError: division by zero"
+    assert extract_error_from_stream(iter([text[:777], text[777:]])) == "ZeroDivisionError: division by zero"
+
+
+def test_keywords_of_the_classification_sets_do_not_change_detection():
+    text = "\n".join(ok_lines(10) + ["Warning: cudnn_status_not_supported, using fallback"] + ok_lines(10, 10))
+    assert extract_error_from_text(text) == "[No error detected] Command executed successfully."
+
+
+def progress_log(rng: random.Random, max_lines: int = 900) -> str:
+    """Random log lines, some of them tqdm-like: one "\\n" line of many "\\r" updates."""
+    lines = []
+    for i in range(rng.randint(1, max_lines)):
+        kind = rng.random()
+        if kind < 0.05:
+            lines.append("".join(f"\r{p}%|###| {p}/100" for p in range(rng.randint(2, 80))))
+        elif kind < 0.06:
+            lines.extend(TRACEBACK)
+        elif kind < 0.07:
+            lines.append(f"ERROR step {i} failed")
+        elif kind < 0.08:
+            lines.append("")
+        else:
+            lines.append(f"step {i} ok")
+    return "\n".join(lines) + "\n"
+
+
+def file_windows(path) -> tuple:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return _file_windows(mm, len(mm))
+
+
+def test_file_windows_match_text_scope_with_progress_bars(tmp_path):
+    rng = random.Random(11)
+    path = tmp_path / "train.log"
+    for _ in range(200):
+        text = progress_log(rng)
+        path.write_bytes(text.encode("utf-8"))
+        lines = [l for l in text.strip().splitlines() if l.strip()]
+        head, tail, _, _, head_rest, tail_rest = file_windows(path)
+        assert head == lines[:HEAD_LINES]
+        assert tail == lines[-TAIL_LINES:]
+        assert len(head) <= HEAD_LINES and len(tail) <= TAIL_LINES
+
+
+def test_traceback_behind_a_progress_bar_is_outside_the_head_window(tmp_path):
+    # one "\n" line: 70 "\r" updates, then a traceback; it is past the 60-line head window
+    bar = "".join(f"\r{p}%|###| {p}/100" for p in range(70))
+    text = "\n".join([bar + "\r" + "\r".join(TRACEBACK)] + ok_lines(1000)) + "\n"
+    path = tmp_path / "train.log"
+    path.write_text(text, encoding="utf-8")
+    assert extract_error_from_text(text) == "ZeroDivisionError: division by zero"
+    assert extract_error_from_file(str(path)) == "ZeroDivisionError: division by zero"
+
+
+def test_parallel_file_mode_matches_serial_file_mode(tmp_path, monkeypatch):
+    # small serial scan windows and parallel ranges, so both cut the middle in many places
+    monkeypatch.setattr(error_extractor, "FILE_SCAN_WINDOW", 997)
+    rng = random.Random(15)
+    path = tmp_path / "train.log"
+    for i in range(300):
+        path.write_bytes(progress_log(rng, 3000).encode("utf-8"))
+        serial = extract_error_from_file(str(path))
+        chunk_size = rng.choice([64, 1000, 4096])
+        assert scan_file_parallel(str(path), workers=2 if i % 50 == 0 else 1, chunk_size=chunk_size) == serial
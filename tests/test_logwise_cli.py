@@ -0,0 +1,75 @@
+import sys
+
+import pytest
+import requests
+
+from logwise import logwise_cli
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = {}
+
+    def submit_job(cmd):
+        calls["submit"] = cmd
+        return "job-1"
+
+    def run_command_job(cmd, on_submit):
+        calls["run"] = cmd
+
+    def analyze_result(result, bypass_cache):
+        calls["bypass_cache"] = bypass_cache
+
+    monkeypatch.setattr(logwise_cli, "warm_up_in_background", lambda: None)
+    monkeypatch.setattr(logwise_cli, "submit_job", submit_job)
+    monkeypatch.setattr(logwise_cli, "run_command_job", run_command_job)
+    monkeypatch.setattr(logwise_cli, "analyze_result", analyze_result)
+    return calls
+
+
+def cli(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["logwise", *args])
+    logwise_cli.main()
+
+
+def test_flags_inside_the_run_command_are_passed_through(monkeypatch, calls):
+    cli(monkeypatch, "run", "grep", "--top", "3", "--no-cache", "--detach", "--metrics-json", "x.json")
+    assert calls == {"run": "grep --top 3 --no-cache --detach --metrics-json x.json", "bypass_cache": False}
+
+
+def test_flags_before_run_are_global(monkeypatch, calls):
+    cli(monkeypatch, "--no-cache", "run", "ls", "--no-cache")
+    assert calls == {"run": "ls --no-cache", "bypass_cache": True}
+
+
+def test_detach_only_right_after_run(monkeypatch, calls):
+    cli(monkeypatch, "run", "--detach", "docker", "run", "--detach", "img")
+    assert calls == {"submit": "docker run --detach img"}
+
+
+def raise_(exc):
+    def call(*args):
+        raise exc
+    return call
+
+
+def not_found():
+    response = requests.Response()
+    response.status_code = 404
+    return requests.exceptions.HTTPError("404 Client Error", response=response)
+
+
+def test_cancel_reports_runner_errors(monkeypatch, capsys):
+    monkeypatch.setattr(logwise_cli, "cancel_job", raise_(not_found()))
+    cli(monkeypatch, "cancel", "abc")
+    assert "Runner job 'abc' not found" in capsys.readouterr().out
+
+    monkeypatch.setattr(logwise_cli, "cancel_job", raise_(requests.exceptions.ConnectionError()))
+    cli(monkeypatch, "cancel", "abc")
+    assert "cannot connect to  Runner Agent" in capsys.readouterr().out
+
+
+def test_jobs_reports_runner_errors(monkeypatch, capsys):
+    monkeypatch.setattr(logwise_cli, "list_jobs", raise_(requests.exceptions.ConnectionError()))
+    cli(monkeypatch, "jobs")
+    assert "cannot connect to  Runner Agent" in capsys.readouterr().out
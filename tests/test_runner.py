@@ -0,0 +1,41 @@
+import threading
+
+from logwise.runner import SessionPool
+
+
+class DeadShell:
+    def isalive(self):
+        return False
+
+
+class FakeSession:
+    def __init__(self, session_id, pool, last_used):
+        self.id = session_id
+        self.pool = pool
+        self.lock = threading.Lock()
+        self.last_used = last_used
+        self.closed = False
+        self.shell = DeadShell()
+        self.recovered_with_pool_lock = None
+
+    def recover(self, reason):
+        self.recovered_with_pool_lock = self.pool._lock.locked()
+        self.shell = None
+
+    def close(self):
+        self.closed = True
+
+
+def test_reap_recovers_dead_idle_shells_without_the_pool_lock():
+    pool = SessionPool(idle_timeout=60)
+    dead = pool.sessions["dead"] = FakeSession("dead", pool, last_used=100)
+    idle = pool.sessions["idle"] = FakeSession("idle", pool, last_used=0)
+    busy = pool.sessions["busy"] = FakeSession("busy", pool, last_used=100)
+    busy.lock.acquire()
+
+    assert pool.reap(now=120) == 1
+
+    assert dead.recovered_with_pool_lock is False
+    assert idle.closed and "idle" not in pool.sessions
+    assert busy.recovered_with_pool_lock is None
+    assert sorted(pool.sessions) == ["busy", "dead"]
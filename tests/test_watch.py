@@ -0,0 +1,45 @@
+import os
+
+from logwise.watch import WatchedLog
+
+HEAD = "step 1\nTraceback (most recent call last):\n  File \"train.py\", line 3, in <module>\n    main()\n"
+
+
+def test_rotation_mid_traceback_keeps_the_traceback(tmp_path):
+    path = tmp_path / "train.log"
+    path.write_text("")
+    log = WatchedLog(str(path))
+    with open(path, "a") as f:
+        f.write(HEAD + "ValueError: bad value")   # the process died before the newline
+    assert log.poll(1.0) == []
+
+    os.rename(path, tmp_path / "train.log.1")
+    path.write_text("step 1\n")
+    assert log.poll(2.0) == ["rotated"]
+
+    events = log.take(5)
+    assert [e.rule for e in events] == ["python.traceback"]
+    assert events[0].text.splitlines()[0] == "Traceback (most recent call last):"
+    assert events[0].text.splitlines()[-1] == "ValueError: bad value"
+    assert events[0].first_line == 2
+
+
+def test_truncation_mid_traceback_keeps_the_traceback(tmp_path):
+    path = tmp_path / "train.log"
+    path.write_text("")
+    log = WatchedLog(str(path))
+    with open(path, "a") as f:
+        f.write(HEAD)
+    log.poll(1.0)
+
+    path.write_text("")
+    assert log.poll(2.0) == ["truncated"]
+    with open(path, "a") as f:
+        f.write("RuntimeError: after restart\n")
+    log.poll(3.0)
+
+    events = log.take(5)
+    assert len(events) == 2
+    traceback = next(e for e in events if e.rule == "python.traceback")
+    assert traceback.text.splitlines()[-1] == "    main()"
+    assert "RuntimeError" not in traceback.text